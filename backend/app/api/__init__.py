@@ -8,6 +8,8 @@ from app.api.problems import router as problems_router
 from app.api.submissions import router as submissions_router
 from app.api.operation_logs import router as operation_logs_router
 from app.api.tags import router as tags_router
+from app.api.judge_sync import router as judge_sync_router
+from app.api.events import router as events_router
 
 # 创建主路由
 api_router = APIRouter(prefix="/api")
@@ -22,6 +24,8 @@ api_router.include_router(problems_router)
 api_router.include_router(submissions_router)
 api_router.include_router(operation_logs_router)
 api_router.include_router(tags_router)
+api_router.include_router(judge_sync_router)
+api_router.include_router(events_router)
 
 # 导出API路由
 __all__ = ["api_router"] 
\ No newline at end of file
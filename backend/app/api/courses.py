@@ -1,11 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import List, Optional, Dict, Any
 
 from app.models import User, Course, Class, get_db, OperationLog
 from app.utils.auth import get_current_active_user, get_teacher_user, get_admin_user
 from app.schemas.course import CourseCreate, CourseUpdate, CourseResponse
 from app.services import CourseService, UserService
+from app.services.gradebook_service import GradebookService
+from app.services.export_service import ExportService
 
 router = APIRouter(prefix="/courses", tags=["课程"])
 
@@ -108,4 +111,71 @@ async def delete_course(
     if not success:
         raise HTTPException(status_code=400, detail="课程有关联的练习，请先删除这些练习")
     
-    return {"message": "课程删除成功"} 
\ No newline at end of file
+    return {"message": "课程删除成功"}
+
+@router.get("/{course_id}/gradebook", response_model=Dict[str, Any])
+async def get_course_gradebook(
+    course_id: int,
+    class_id: Optional[int] = None,
+    include_problems: bool = True,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_teacher_user)
+):
+    """
+    获取课程成绩册（教师或管理员）
+    返回课程全部练习的学生成绩矩阵，如果提供了class_id，则只包含该班级的学生
+    include_problems为False时只返回各练习的总分
+    """
+    course = db.query(Course).filter(Course.id == course_id).first()
+    if not course:
+        raise HTTPException(status_code=404, detail="课程不存在")
+    
+    # 检查权限
+    if current_user.role != "admin" and course.teacher_id != current_user.id:
+        raise HTTPException(status_code=403, detail="只能查看自己课程的成绩册")
+    
+    try:
+        return GradebookService.get_gradebook(db, course, class_id, include_problems)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@router.get("/{course_id}/gradebook/export")
+async def export_course_gradebook(
+    course_id: int,
+    class_id: Optional[int] = None,
+    format: str = Query("csv", description="导出格式：csv或xlsx"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_teacher_user)
+):
+    """导出课程成绩册（教师或管理员），每名学生一行、每个练习一列"""
+    try:
+        ExportService.check_format(format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    course = db.query(Course).filter(Course.id == course_id).first()
+    if not course:
+        raise HTTPException(status_code=404, detail="课程不存在")
+    
+    # 检查权限
+    if current_user.role != "admin" and course.teacher_id != current_user.id:
+        raise HTTPException(status_code=403, detail="只能导出自己课程的成绩册")
+    
+    classes = course.classes
+    if class_id:
+        classes = [cls for cls in classes if cls.id == class_id]
+        if not classes:
+            raise HTTPException(status_code=404, detail="未找到指定班级或该班级未关联此课程")
+    
+    exercises = GradebookService.get_course_exercises(db, course_id)
+    header = ["名次", "学号", "姓名", "班级"] + [exercise["name"] for exercise in exercises] + ["总分"]
+    rows = ExportService.course_gradebook([exercise["id"] for exercise in exercises], [cls.id for cls in classes])
+    
+    CourseService.log_operation(db, current_user.id, "导出成绩册", course.name)
+    
+    filename = ExportService.filename(f"{course.name}_成绩册", format)
+    return StreamingResponse(
+        ExportService.render(header, rows, format, title="成绩册"),
+        media_type=ExportService.media_type(format),
+        headers={"Content-Disposition": ExportService.content_disposition(filename)}
+    )
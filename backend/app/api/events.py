@@ -0,0 +1,67 @@
+import json
+import asyncio
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+
+from app.models.database import SessionLocal
+from app.services.event_service import event_broker, USER_CHANNEL, EXERCISE_CHANNEL
+from app.services.exercise_service import ExerciseService
+from app.utils.auth import get_user_from_token
+
+router = APIRouter(prefix="/events", tags=["事件推送"])
+
+# 心跳间隔（秒），保持代理连接不被空闲超时断开
+KEEPALIVE_INTERVAL = 5
+
+
+@router.get("/stream")
+async def event_stream(
+    request: Request,
+    token: str = Query(..., description="访问令牌（EventSource无法设置请求头）"),
+    exercise_id: Optional[int] = Query(None, description="同时订阅该练习的成绩变化")
+):
+    """
+    Server-Sent Events推送通道
+
+    始终推送当前用户自己提交的评测结果（verdict事件）；
+    指定exercise_id时同时推送该练习的成绩与名次变化（score事件），客户端收到后无需再轮询排名和统计
+    """
+    # 只在建立连接时使用数据库，长连接期间不占用数据库连接
+    db = SessionLocal()
+    try:
+        user = get_user_from_token(db, token)
+        if user is None:
+            raise HTTPException(status_code=401, detail="无效的认证凭据")
+        if exercise_id is not None and user.role == "student" \
+                and not ExerciseService.check_student_permission(db, user.id, exercise_id):
+            raise HTTPException(status_code=403, detail="无权订阅该练习")
+        user_id = user.id
+    finally:
+        db.close()
+
+    channels = [USER_CHANNEL.format(user_id=user_id)]
+    if exercise_id is not None:
+        channels.append(EXERCISE_CHANNEL.format(exercise_id=exercise_id))
+
+    async def stream():
+        queue = event_broker.subscribe(*channels)
+        try:
+            yield f"event: ready\ndata: {json.dumps({'channels': len(channels)})}\n\n"
+            while not await request.is_disconnected():
+                try:
+                    data = await asyncio.wait_for(queue.get(), timeout=KEEPALIVE_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                event_type = json.loads(data).get("type", "message")
+                yield f"event: {event_type}\ndata: {data}\n\n"
+        finally:
+            event_broker.unsubscribe(queue, *channels)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -1,4 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query, Body
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from typing import List, Optional, Dict, Any
 from datetime import datetime, timedelta, timezone
@@ -8,6 +10,7 @@ from app.models.exercise import exercise_problem
 from app.utils.auth import get_current_active_user, get_current_user, get_teacher_user, get_admin_user
 from app.schemas.exercise import ExerciseCreate, ExerciseUpdate, ExerciseResponse, ExerciseDetailResponse
 from app.services import ExerciseService
+from app.services.export_service import ExportService
 
 router = APIRouter(prefix="/exercises", tags=["练习"])
 
@@ -313,102 +316,12 @@ async def get_exercise_active_students(
                     detail="未找到指定班级或该班级未关联此课程"
                 )
                 
-        # 获取所有相关学生
-        students = []
-        for cls in classes:
-            students.extend(cls.students)
-            
-        # 去重
-        students = list({student.id: student for student in students}.values())
-        
-        # 获取所有学生在所有题目上的提交记录及活动状态
-        active_students = []
-        
-        # 获取当前时间（统一使用naive datetime没有时区信息）
-        now = datetime.now().replace(tzinfo=None)
-        
-        for student in students:
-            # 获取该学生在该练习中的所有提交记录
-            submissions = db.query(Submission).filter(
-                Submission.user_id == student.id,
-                Submission.exercise_id == exercise_id
-            ).order_by(Submission.submitted_at.desc()).all()
-            
-            # 计算完成题目数量
-            completed_problems = set()
-            for sub in submissions:
-                if sub.status == "Accepted":
-                    completed_problems.add(sub.problem_id)
-            
-            # 判断活动时间 - 同时考虑提交记录和操作日志
-            last_active = None
-            latest_activity = "尚未活动"
-            last_active_time_ago = "未知"
-            
-            # 获取学生的最近操作日志（包括心跳检测）
-            recent_logs = db.query(OperationLog).filter(
-                OperationLog.user_id == student.id
-            ).order_by(OperationLog.created_at.desc()).limit(10).all()
-            
-            # 获取最后活动时间 - 从提交记录和操作日志中找出最近的时间
-            # 确保所有时间对象都是naive datetime（没有时区信息）
-            submission_times = []
-            for sub in submissions:
-                if sub.submitted_at:
-                    # 移除时区信息
-                    if hasattr(sub.submitted_at, 'tzinfo') and sub.submitted_at.tzinfo is not None:
-                        submission_times.append(sub.submitted_at.replace(tzinfo=None))
-                    else:
-                        submission_times.append(sub.submitted_at)
-                        
-            log_times = []
-            for log in recent_logs:
-                if log.created_at:
-                    # 移除时区信息
-                    if hasattr(log.created_at, 'tzinfo') and log.created_at.tzinfo is not None:
-                        log_times.append(log.created_at.replace(tzinfo=None))
-                    else:
-                        log_times.append(log.created_at)
-            
-            # 合并所有时间并找出最近的一个
-            all_times = submission_times + log_times
-            if all_times:
-                last_active = max(all_times)
-                latest_activity = last_active.strftime("%Y-%m-%d %H:%M:%S")
-                
-                # 计算距离现在的时间 (两个时间都是naive datetime)
-                time_diff = now - last_active
-                if time_diff.days > 0:
-                    last_active_time_ago = f"{time_diff.days}天前"
-                elif time_diff.seconds > 3600:
-                    last_active_time_ago = f"{time_diff.seconds // 3600}小时前"
-                elif time_diff.seconds > 60:
-                    last_active_time_ago = f"{time_diff.seconds // 60}分钟前"
-                else:
-                    last_active_time_ago = f"{time_diff.seconds}秒前"
-            
-            # 创建学生活动记录
-            student_data = {
-                "student_id": student.id,
-                "username": student.username,
-                "real_name": student.real_name or student.username,
-                "class_names": [cls.name for cls in student.classes],
-                "is_online": student.is_online,  # 使用数据库中的在线状态
-                "latest_activity": latest_activity,
-                "last_active_time_ago": last_active_time_ago,
-                "completed_problems_count": len(completed_problems),
-                "total_problems_count": len(problems)
-            }
-            
-            active_students.append(student_data)
-            
-        # 按活跃时间和在线状态排序
-        # 使用字符串进行排序，避免时区问题
-        active_students.sort(key=lambda x: (
-            not x["is_online"],
-            x["latest_activity"] == "尚未活动", 
-            x["latest_activity"]
-        ), reverse=True)
+        # 一次批量查询得到全部学生的最后活动时间和通过题数，结果短时间缓存，
+        # 同时打开的多个教师页面共享同一次查询
+        from app.services.active_students_service import ActiveStudentsService
+        active_students = await ActiveStudentsService.get(
+            db, exercise_id, [cls.id for cls in classes], str(class_id or "all"), len(problems)
+        )
         
         return active_students
         
@@ -422,6 +335,137 @@ async def get_exercise_active_students(
             detail=f"获取活跃学生数据失败: {str(e)}"
         )
 
+@router.get("/{exercise_id}/leaderboard", response_model=Dict[str, Any])
+async def get_exercise_leaderboard(
+    exercise_id: int,
+    class_id: Optional[int] = None,
+    offset: int = Query(0, ge=0, description="从第几名开始返回"),
+    limit: int = Query(50, ge=1, le=500, description="返回人数"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    练习总分排行榜（各题最高分之和，同分时先达到者在前）
+    数据来自Redis有序集合，名次和分页查询不随学生人数线性增长
+    """
+    from app.services.leaderboard_service import LeaderboardService, ALL_SCOPE
+
+    exercise = db.query(Exercise).filter(Exercise.id == exercise_id).first()
+    if not exercise:
+        raise HTTPException(status_code=404, detail="练习不存在")
+
+    try:
+        LeaderboardService.ensure_built(db, exercise_id)
+        key = LeaderboardService.board_key(exercise_id, None, class_id or ALL_SCOPE)
+        page, total = LeaderboardService.page(key, offset, limit)
+        users = {
+            user.id: user
+            for user in db.query(User).filter(User.id.in_([user_id for user_id, _ in page]))
+        } if page else {}
+
+        rankings = []
+        for index, (user_id, score) in enumerate(page):
+            user = users.get(user_id)
+            if not user:
+                continue
+            rankings.append({
+                "rank": offset + index + 1,
+                "user_id": user_id,
+                "username": user.username,
+                "real_name": user.real_name or user.username,
+                "total_score": score
+            })
+
+        return {
+            "exercise_name": exercise.name,
+            "rankings": rankings,
+            "total": total,
+            "current_user_rank": LeaderboardService.rank(key, current_user.id)
+        }
+    except Exception as e:
+        print(f"获取练习排行榜出错: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"获取排行榜失败: {str(e)}"
+        )
+
+@router.get("/{exercise_id}/analytics", response_model=Dict[str, Any])
+async def get_exercise_analytics(
+    exercise_id: int,
+    refresh: bool = Query(False, description="忽略缓存重新计算"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_teacher_user)
+):
+    """
+    获取练习的题目分析（教师或管理员）
+    包括各题通过率、通过所需提交次数分布、得分分布、解题用时分位数和难度，以及练习整体统计
+    """
+    from app.services.analytics_service import AnalyticsService
+    
+    result = await run_in_threadpool(AnalyticsService.get, db, exercise_id, refresh)
+    if result is None:
+        raise HTTPException(status_code=404, detail="练习不存在")
+    return result
+
+@router.get("/{exercise_id}/timeline", response_model=Dict[str, Any])
+async def get_exercise_timeline(
+    exercise_id: int,
+    minutes: int = Query(90, ge=1, le=24 * 60, description="时间范围（分钟）"),
+    bucket_minutes: int = Query(1, ge=1, le=60, description="每个时间桶的长度（分钟）"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_teacher_user)
+):
+    """
+    获取练习的提交时间线（教师或管理员）
+    返回每个时间桶的提交数、提交人数和各评测状态的数量，以及当前卡住的学生数
+    """
+    from app.services.timeline_service import TimelineService
+    
+    if not db.query(Exercise.id).filter(Exercise.id == exercise_id).first():
+        raise HTTPException(status_code=404, detail="练习不存在")
+    return TimelineService.get_timeline(db, exercise_id, minutes, bucket_minutes)
+
+@router.get("/{exercise_id}/statistics/export")
+async def export_exercise_statistics(
+    exercise_id: int,
+    class_id: Optional[int] = None,
+    format: str = Query("csv", description="导出格式：csv或xlsx"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_teacher_user)
+):
+    """
+    导出练习的答题统计（教师或管理员）
+    每名学生一行、每道题一列，按总分排名；数据边查询边发送，不在内存中构造完整结果
+    """
+    try:
+        ExportService.check_format(format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    exercise = db.query(Exercise).filter(Exercise.id == exercise_id).first()
+    if not exercise:
+        raise HTTPException(status_code=404, detail="练习不存在")
+    if not exercise.course:
+        raise HTTPException(status_code=404, detail="练习未关联课程")
+    
+    classes = exercise.course.classes
+    if class_id:
+        classes = [cls for cls in classes if cls.id == class_id]
+        if not classes:
+            raise HTTPException(status_code=404, detail="未找到指定班级或该班级未关联此课程")
+    
+    header, problem_ids = ExportService.exercise_statistics_header(db, exercise)
+    rows = ExportService.exercise_statistics(exercise_id, problem_ids, [cls.id for cls in classes])
+    
+    ExerciseService.log_operation(db, current_user.id, "导出答题统计", exercise.name)
+    
+    filename = ExportService.filename(f"{exercise.name}_答题统计", format)
+    return StreamingResponse(
+        ExportService.render(header, rows, format, title="答题统计"),
+        media_type=ExportService.media_type(format),
+        headers={"Content-Disposition": ExportService.content_disposition(filename)}
+    )
+
 @router.get("/{exercise_id}/statistics", response_model=Dict[str, Any])
 async def get_exercise_statistics(
     exercise_id: int,
@@ -464,6 +508,8 @@ async def get_exercise_statistics(
                 detail="练习未关联课程"
             )
         
+        problem_ids = [p.id for p in problems]
+        
         # 根据用户角色处理不同的逻辑
         if current_user.role == 'student':
             # 学生只能查看自己的答题情况
@@ -477,30 +523,8 @@ async def get_exercise_statistics(
                 "rank": 1  # 学生只看自己，默认排名为1
             }
             
-            # 获取该学生在该练习中的所有提交记录
-            submissions = db.query(Submission).filter(
-                Submission.user_id == current_user.id,
-                Submission.exercise_id == exercise_id
-            ).all()
-            
-            # 为每个题目找到最高分的提交
-            for problem in problems:
-                problem_submissions = [s for s in submissions if s.problem_id == problem.id]
-                if problem_submissions:
-                    # 取最高分的提交
-                    best_submission = max(problem_submissions, key=lambda s: s.total_score or 0)
-                    student_stats["problem_scores"][problem.id] = {
-                        "score": best_submission.total_score or 0,
-                        "submission_id": best_submission.id,
-                        "status": best_submission.status
-                    }
-                    student_stats["total_score"] += best_submission.total_score or 0
-                else:
-                    student_stats["problem_scores"][problem.id] = {
-                        "score": None,
-                        "submission_id": None,
-                        "status": "未提交"
-                    }
+            matrix = ExerciseService.get_score_matrix(db, exercise_id, problem_ids, [current_user.id])
+            ExerciseService.fill_problem_scores(student_stats, problem_ids, matrix.get(current_user.id, {}))
             
             # 构造返回数据（只包含学生自己的数据）
             return {
@@ -530,69 +554,37 @@ async def get_exercise_statistics(
                         detail="未找到指定班级或该班级未关联此课程"
                     )
                     
-            # 获取所有相关学生
-            students = []
-            for cls in classes:
-                students.extend(cls.students)
-                
-            # 去重
-            students = list({student.id: student for student in students}.values())
-            
-            # 获取所有学生在所有题目上的提交记录
-            statistics = []
+            # 一条查询获取所有相关学生（已去重），再批量查询他们所在的班级
+            students = ExerciseService.get_class_students(db, [cls.id for cls in classes])
+            class_names = ExerciseService.get_student_class_names(db, [student.id for student in students])
             
-            # 如果需要包含管理员和教师的答题情况
+            # 特殊用户（管理员和课程教师）
+            special_users = []
             if include_special_users:
-                # 获取管理员
-                admins = db.query(User).filter(User.role == 'admin').all()
-                
-                # 获取课程关联的教师
+                special_users = db.query(User).filter(User.role == 'admin').all()
                 teacher = course.teacher
-                
-                # 合并特殊用户（管理员和教师）
-                special_users = []
-                if admins:
-                    special_users.extend(admins)
                 if teacher and teacher not in special_users:
                     special_users.append(teacher)
-                    
-                # 获取特殊用户的答题情况
-                for user in special_users:
-                    user_stats = {
-                        "user_id": user.id,
-                        "username": user.username,
-                        "real_name": user.real_name or user.username,
-                        "role": user.role,
-                        "total_score": 0,
-                        "problem_scores": {}
-                    }
-                    
-                    # 获取该用户在该练习中的所有提交记录
-                    submissions = db.query(Submission).filter(
-                        Submission.user_id == user.id,
-                        Submission.exercise_id == exercise_id
-                    ).all()
-                    
-                    # 为每个题目找到最高分的提交
-                    for problem in problems:
-                        problem_submissions = [s for s in submissions if s.problem_id == problem.id]
-                        if problem_submissions:
-                            # 取最高分的提交
-                            best_submission = max(problem_submissions, key=lambda s: s.total_score or 0)
-                            user_stats["problem_scores"][problem.id] = {
-                                "score": best_submission.total_score or 0,
-                                "submission_id": best_submission.id,
-                                "status": best_submission.status
-                            }
-                            user_stats["total_score"] += best_submission.total_score or 0
-                        else:
-                            user_stats["problem_scores"][problem.id] = {
-                                "score": None,
-                                "submission_id": None,
-                                "status": "未提交"
-                            }
-                    
-                    statistics.append(user_stats)
+            
+            # 一条查询读取全部用户在全部题目上的最佳成绩
+            matrix = ExerciseService.get_score_matrix(
+                db, exercise_id, problem_ids,
+                [user.id for user in special_users] + [student.id for student in students]
+            )
+            
+            statistics = []
+            
+            # 特殊用户的答题情况
+            for user in special_users:
+                user_stats = {
+                    "user_id": user.id,
+                    "username": user.username,
+                    "real_name": user.real_name or user.username,
+                    "role": user.role,
+                    "total_score": 0,
+                    "problem_scores": {}
+                }
+                statistics.append(ExerciseService.fill_problem_scores(user_stats, problem_ids, matrix.get(user.id, {})))
             
             # 添加学生统计数据
             for student in students:
@@ -600,37 +592,11 @@ async def get_exercise_statistics(
                     "student_id": student.id,
                     "username": student.username,
                     "real_name": student.real_name or student.username,
-                    "class_names": [cls.name for cls in student.classes],
+                    "class_names": class_names.get(student.id, []),
                     "total_score": 0,
                     "problem_scores": {}
                 }
-                
-                # 获取该学生在该练习中的所有提交记录
-                submissions = db.query(Submission).filter(
-                    Submission.user_id == student.id,
-                    Submission.exercise_id == exercise_id
-                ).all()
-                
-                # 为每个题目找到最高分的提交
-                for problem in problems:
-                    problem_submissions = [s for s in submissions if s.problem_id == problem.id]
-                    if problem_submissions:
-                        # 取最高分的提交
-                        best_submission = max(problem_submissions, key=lambda s: s.total_score or 0)
-                        student_stats["problem_scores"][problem.id] = {
-                            "score": best_submission.total_score or 0,
-                            "submission_id": best_submission.id,
-                            "status": best_submission.status
-                        }
-                        student_stats["total_score"] += best_submission.total_score or 0
-                    else:
-                        student_stats["problem_scores"][problem.id] = {
-                            "score": None,
-                            "submission_id": None,
-                            "status": "未提交"
-                        }
-                
-                statistics.append(student_stats)
+                statistics.append(ExerciseService.fill_problem_scores(student_stats, problem_ids, matrix.get(student.id, {})))
             
             # 按总分排序
             statistics.sort(key=lambda x: x["total_score"], reverse=True)
@@ -0,0 +1,48 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from starlette.concurrency import run_in_threadpool
+from typing import List, Optional
+from pydantic import BaseModel
+import logging
+
+from app.models.user import User
+from app.utils.auth import get_admin_user
+from app.services.judge_sync_service import JudgeSyncService
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/judge-sync", tags=["评测数据同步"])
+
+
+class JudgeSyncRequest(BaseModel):
+    """同步请求，不指定题目时同步整个题库"""
+    data_paths: Optional[List[str]] = None
+
+
+@router.get("/status")
+async def get_judge_sync_status(
+    stale_limit: int = Query(50, ge=0, le=1000, description="每个节点最多列出的过期题目数"),
+    current_user: User = Depends(get_admin_user)
+):
+    """
+    各评测节点的测试数据新鲜度（仅管理员）
+    """
+    try:
+        return await run_in_threadpool(JudgeSyncService.status, stale_limit)
+    except Exception as e:
+        logger.error(f"获取评测数据同步状态失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"获取同步状态失败: {str(e)}")
+
+
+@router.post("")
+async def sync_judge_testdata(
+    request: JudgeSyncRequest = JudgeSyncRequest(),
+    current_user: User = Depends(get_admin_user)
+):
+    """
+    把有变化的测试数据增量同步到所有评测节点（仅管理员）
+    """
+    try:
+        return await run_in_threadpool(JudgeSyncService.sync_all, request.data_paths)
+    except Exception as e:
+        logger.error(f"同步评测数据失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"同步评测数据失败: {str(e)}")
@@ -1,14 +1,21 @@
-from fastapi import APIRouter, HTTPException, Response, Depends, Query
+from fastapi import APIRouter, HTTPException, Response, Request, Depends, Query, UploadFile, File, Form
+from starlette.concurrency import run_in_threadpool
 from fastapi.responses import StreamingResponse
 from typing import List, Optional
 from urllib.parse import unquote
 import os
+import uuid
+import zipfile
+import hashlib
 from app.schemas.problem import (
     ProblemCategory, ProblemInfo, ProblemDelete, ProblemDetail, 
     CustomProblemCreate, CustomProblemResponse,
     FavoriteResponse, FavoriteStatusResponse
 )
-from app.services.problem_service import ProblemService
+from app.services.problem_service import ProblemService, problem_html_cache
+from app.services.tag_index_service import tag_bitmap_index
+from app.services.search_service import problem_search_index
+from app.services.problem_resolver_service import problem_path_resolver
 from app.models import get_db, Problem, User, Submission
 from sqlalchemy.orm import Session
 from app.utils.auth import get_teacher_user, get_admin_user, get_current_user
@@ -46,31 +53,21 @@ async def get_problems_by_category(
         problems = ProblemService.get_problems_by_category(category_path)
         
         # 解析tag_ids参数
+        parsed_tag_ids = None
         if tag_ids:
             try:
                 parsed_tag_ids = [int(x.strip()) for x in tag_ids.split(',') if x.strip()]
-                if parsed_tag_ids:
-                    # 多标签交集过滤
-                    problems = ProblemService.filter_problems_by_tags_intersection(db, problems, parsed_tag_ids)
             except ValueError:
                 raise HTTPException(status_code=400, detail="tag_ids参数格式无效，应为逗号分隔的整数")
-        # 如果指定了标签ID，则过滤出包含该标签的试题
-        elif tag_id is not None:
-            tag_problems = ProblemService.get_problems_by_tag(db, tag_id)
-            # 获取数据路径列表，用于过滤
-            tag_problem_paths = [p.data_path for p in tag_problems if p.data_path]
-            # 过滤问题列表
-            problems = [p for p in problems if p.data_path in tag_problem_paths]
-        
-        # 如果指定了标签类型ID，则过滤出包含该类型标签的试题
-        elif tag_type_id is not None:
-            type_problems = ProblemService.get_problems_by_tag_type(db, tag_type_id)
-            # 获取数据路径列表，用于过滤
-            type_problem_paths = [p.data_path for p in type_problems if p.data_path]
-            # 过滤问题列表
-            problems = [p for p in problems if p.data_path in type_problem_paths]
+        
+        # 按标签位图索引过滤（tag_ids取交集 > tag_id > tag_type_id取并集）
+        problems = tag_bitmap_index.filter_problems(
+            db, problems, tag_id=tag_id, tag_ids=parsed_tag_ids, tag_type_id=tag_type_id
+        )
         
         return problems
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"获取分类{category_path}下的试题失败: {str(e)}")
         raise HTTPException(status_code=500, detail=f"获取试题失败: {str(e)}")
@@ -93,31 +90,29 @@ async def delete_problem(problem_path: str, db: Session = Depends(get_db), curre
         # URL解码路径
         decoded_path = unquote(problem_path)
         
-        # 查找对应的数据库记录
-        problem = db.query(Problem).filter(Problem.data_path == decoded_path).first()
-        
-        # 如果直接匹配失败，尝试模糊匹配
-        if not problem:
-            path_parts = decoded_path.split('/')
-            if len(path_parts) > 1:
-                last_part = path_parts[-1]
-                problems = db.query(Problem).filter(Problem.data_path.endswith(last_part)).all()
-                for p in problems:
-                    if p.data_path and (decoded_path.endswith(p.data_path) or p.data_path.endswith(decoded_path)):
-                        problem = p
-                        break
+        # 通过规范化路径查找对应的数据库记录
+        problem = problem_path_resolver.resolve(db, decoded_path)
         
         if not problem:
             # 如果数据库中没有记录，只删除文件系统
             result = ProblemService.delete_problem(decoded_path)
+            problem_search_index.remove_problem(decoded_path)
+            problem_html_cache.invalidate(decoded_path)
             return {"message": result, "problem_path": decoded_path}
         
         problem_id = problem.id
+        problem_data_path = problem.data_path
         
         # 删除相关的数据库记录（按依赖关系顺序）
         
-        # 1. 删除提交记录
+        # 1. 删除提交记录及其汇总数据
         from app.models import Submission
+        from app.services.submission_summary_service import SubmissionSummaryService
+        from app.services.code_blob_service import CodeBlobService
+        from app.services.case_result_service import CaseResultService
+        SubmissionSummaryService.forget_problem(db, problem_id)
+        CodeBlobService.release(db, Submission.problem_id == problem_id)
+        CaseResultService.forget(db, Submission.problem_id == problem_id)
         db.query(Submission).filter(Submission.problem_id == problem_id).delete()
         
         # 2. 删除练习-题目关联
@@ -133,9 +128,13 @@ async def delete_problem(problem_path: str, db: Session = Depends(get_db), curre
         
         # 提交所有数据库更改
         db.commit()
+        tag_bitmap_index.drop_problem(problem_data_path)
+        problem_path_resolver.forget(problem_data_path)
         
         # 5. 删除文件系统中的题目文件
         result = ProblemService.delete_problem(decoded_path)
+        problem_search_index.remove_problem(problem_data_path)
+        problem_html_cache.invalidate(problem_data_path)
         
         return {"message": result, "problem_path": decoded_path}
     except FileNotFoundError as e:
@@ -191,12 +190,93 @@ async def get_all_problems_data(
 
 
 
+@router.get("/search")
+async def search_problems(
+    q: str = Query(..., min_length=1, description="检索关键词"),
+    tag_id: Optional[int] = Query(None, description="按标签ID过滤"),
+    tag_ids: Optional[str] = Query(None, description="按多个标签ID过滤（逗号分隔），取交集"),
+    tag_type_id: Optional[int] = Query(None, description="按标签类型ID过滤"),
+    limit: int = Query(20, ge=1, le=200, description="返回记录数量限制"),
+    offset: int = Query(0, ge=0, description="偏移量，用于分页"),
+    db: Session = Depends(get_db)
+):
+    """按名称、分类和题面内容全文检索题目，可与标签过滤组合"""
+    parsed_tag_ids = None
+    if tag_ids:
+        try:
+            parsed_tag_ids = [int(x.strip()) for x in tag_ids.split(',') if x.strip()]
+        except ValueError:
+            raise HTTPException(status_code=400, detail="tag_ids参数格式无效，应为逗号分隔的整数")
+    
+    try:
+        return problem_search_index.search(
+            db, q,
+            tag_id=tag_id,
+            tag_ids=parsed_tag_ids,
+            tag_type_id=tag_type_id,
+            limit=limit,
+            offset=offset
+        )
+    except Exception as e:
+        logger.error(f"检索题目失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"检索题目失败: {str(e)}")
+
+def _is_not_modified(request: Request, etag: str, last_modified: str) -> bool:
+    """根据If-None-Match/If-Modified-Since判断客户端缓存是否仍然有效"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        candidates = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in candidates or etag in candidates or etag[2:] in candidates
+    return request.headers.get("if-modified-since") == last_modified
+
+
+def _accepts_encoding(accept_encoding: str, encoding: str) -> bool:
+    """按Accept-Encoding判断客户端是否接受某种编码（q=0表示拒绝，*匹配未单独列出的编码）"""
+    qualities = {}
+    for item in accept_encoding.split(","):
+        token, *params = [part.strip() for part in item.split(";")]
+        if not token:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[token.lower()] = quality
+    quality = qualities.get(encoding, qualities.get("*", 0.0))
+    return quality > 0
+
+
 @router.get("/html/{problem_path:path}")
-async def get_problem_html_content(problem_path: str):
-    """根据题目路径获取HTML内容"""
+async def get_problem_html_content(problem_path: str, request: Request):
+    """根据题目路径获取HTML内容（带ETag/Last-Modified，按需返回预压缩内容）"""
     try:
-        html_content = ProblemService.get_problem_html_content(problem_path)
-        return Response(content=html_content, media_type="text/html")
+        entry = problem_html_cache.get(problem_path)
+        if entry is None:
+            return Response(content="<p>题目内容不可用</p>", media_type="text/html")
+        
+        headers = {
+            "ETag": entry.etag,
+            "Last-Modified": entry.last_modified,
+            "Cache-Control": "no-cache",
+            "Vary": "Accept-Encoding"
+        }
+        if _is_not_modified(request, entry.etag, entry.last_modified):
+            return Response(status_code=304, headers=headers)
+        
+        accept_encoding = request.headers.get("accept-encoding", "")
+        body = entry.body
+        if entry.br_body is not None and _accepts_encoding(accept_encoding, "br"):
+            body = entry.br_body
+            headers["Content-Encoding"] = "br"
+        elif _accepts_encoding(accept_encoding, "gzip"):
+            body = entry.gzip_body
+            headers["Content-Encoding"] = "gzip"
+        
+        return Response(content=body, media_type="text/html; charset=utf-8", headers=headers)
     except Exception as e:
         logger.error(f"获取题目HTML内容失败: {str(e)}")
         return Response(content="<p>题目内容加载失败</p>", media_type="text/html")
@@ -215,13 +295,22 @@ async def get_problem_testcases(problem_path: str):
 @router.get("/{problem_id}", response_model=ProblemDetail)
 async def get_problem_detail(
     problem_id: int, 
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db)
 ):
-    """获取题目详情，包括HTML内容"""
+    """获取题目详情，包括HTML内容（带ETag，重复访问返回304）"""
     try:
         problem_detail = ProblemService.get_problem_detail(db, problem_id)
         if not problem_detail:
             raise HTTPException(status_code=404, detail=f"题目不存在: ID {problem_id}")
+        
+        etag = 'W/"%s"' % hashlib.sha1(problem_detail.json().encode("utf-8")).hexdigest()
+        if etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+            return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+        
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = "no-cache"
         return problem_detail
     except HTTPException:
         raise
@@ -263,6 +352,72 @@ async def create_custom_problem(
         logger.error(f"创建自定义题目API失败: {str(e)}")
         raise HTTPException(status_code=500, detail=f"创建题目失败: {str(e)}") 
 
+@router.post("/reconcile")
+async def reconcile_problems(
+    dry_run: bool = Query(False, description="只报告差异，不写入数据库"),
+    current_user: User = Depends(get_admin_user),
+    db: Session = Depends(get_db)
+):
+    """
+    题库与数据库对账（仅管理员）
+
+    批量补齐和更新problems表中的题目记录，并报告两个方向的孤立数据
+    """
+    from app.services.problem_reconcile_service import ProblemReconcileService
+    try:
+        return ProblemReconcileService.reconcile(db, dry_run=dry_run)
+    except Exception as e:
+        logger.error(f"题库对账失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"题库对账失败: {str(e)}")
+
+@router.post("/import-zip")
+async def import_problems_zip(
+    file: UploadFile = File(...),
+    category: str = Form("导入题库"),
+    overwrite: bool = Form(False),
+    current_user: User = Depends(get_teacher_user),  # 需要教师或管理员权限
+    db: Session = Depends(get_db)
+):
+    """
+    从zip压缩包批量导入题目
+
+    压缩包分块写入磁盘，不整体读入内存；解压、校验、生成输出在线程池中执行，不阻塞事件循环
+    """
+    from app.services.problem_import_service import ProblemImportService, IMPORT_STAGING_ROOT, MAX_UPLOAD_SIZE
+
+    if not file.filename or not file.filename.lower().endswith(".zip"):
+        raise HTTPException(status_code=400, detail="只支持zip格式的压缩包")
+
+    os.makedirs(IMPORT_STAGING_ROOT, exist_ok=True)
+    zip_path = os.path.join(IMPORT_STAGING_ROOT, f"{uuid.uuid4().hex}.zip")
+    try:
+        size = 0
+        with open(zip_path, "wb") as f:
+            while True:
+                chunk = await file.read(1024 * 1024)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > MAX_UPLOAD_SIZE:
+                    raise HTTPException(status_code=413, detail="压缩包大小超过限制")
+                f.write(chunk)
+
+        logger.info(f"用户 {current_user.username} 上传题目压缩包: {file.filename} ({size} 字节)")
+        return await run_in_threadpool(
+            ProblemImportService.import_zip, db, zip_path, category, overwrite, current_user.id,
+            file.filename.replace("\\", "/").rsplit("/", 1)[-1]
+        )
+    except HTTPException:
+        raise
+    except (ValueError, zipfile.BadZipFile) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"导入题目失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"导入题目失败: {str(e)}")
+    finally:
+        if os.path.exists(zip_path):
+            os.remove(zip_path)
+
 @router.get("/reference-answer/{problem_path:path}")
 async def get_problem_reference_answer(problem_path: str, db: Session = Depends(get_db)):
     """获取题目的参考代码"""
@@ -271,7 +426,7 @@ async def get_problem_reference_answer(problem_path: str, db: Session = Depends(
         decoded_path = unquote(problem_path)
         
         # 从数据库查找题目
-        problem = db.query(Problem).filter(Problem.data_path == decoded_path).first()
+        problem = problem_path_resolver.resolve(db, decoded_path)
         
         if not problem:
             raise HTTPException(status_code=404, detail="题目不存在")
@@ -1,146 +1,52 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from typing import List, Optional, Dict, Any
-from sqlalchemy.orm import Session
+import hashlib
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from typing import List, Optional, Dict, Any, Tuple
+from sqlalchemy.orm import Session, joinedload, undefer
 from datetime import datetime, timezone
-from sqlalchemy import desc, func
+from sqlalchemy import desc, tuple_
 from sqlalchemy.sql import and_
 
 from app.models.database import get_db
-from app.models import Submission, User, Exercise, Problem, student_class, Class, Course
-from app.models.course import course_class
+from app.models import Submission, User, Exercise, Problem, Course
 from app.models.class_model import class_course
 from app.schemas.submission import SubmissionCreate, SubmissionResponse, SubmissionDetail, ProblemRankingResponse
-from app.schemas.submission import UserSubmissionResponse
+from app.schemas.submission import UserSubmissionResponse, SubmissionPage, TestRunRequest, TestRunResponse
 from app.services.judge_service import JudgeService
-from app.utils.auth import get_current_user
+from app.services.export_service import ExportService
+from app.services.submission_history_service import SubmissionHistoryService
+from app.services.case_result_service import CaseResultService
+from app.services.judge_runner_service import JudgeBusyError
+from app.utils.auth import get_current_user, get_teacher_user
+from app.utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, decode_cursor, next_cursor
 
 router = APIRouter(prefix="/submissions", tags=["submissions"])
 
+# 单个测试用例默认返回的字节数，以及一次请求（含Range分段）最多返回的字节数
+TEST_CASE_PREVIEW_BYTES = 64 * 1024
+TEST_CASE_MAX_BYTES = 1024 * 1024
+
 # 注意：这个路由必须放在 /{submission_id} 路由之前，否则会导致路径冲突
-@router.get("/my-submissions", response_model=List[UserSubmissionResponse])
+@router.get("/my-submissions", response_model=SubmissionPage)
 async def get_my_submissions(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
-    limit: int = Query(100, description="返回记录数量限制"),
-    offset: int = Query(0, description="偏移量，用于分页"),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE, description="每页条数"),
+    cursor: Optional[str] = Query(None, description="上一页返回的next_cursor，不传则从第一条开始"),
     sort: str = Query("desc", description="排序方式：asc（升序）或desc（降序）")
 ):
     """
     获取当前登录用户的所有答题记录，包括题目、练习、课程、班级名称
-    只返回每题最后一次提交
+    只返回每题最后一次提交，按提交时间游标分页；next_cursor为空表示已经是最后一页
     """
     try:
-        # 使用子查询获取每个题目的最新提交ID
-        latest_submissions = (
-            db.query(
-                Submission.problem_id, 
-                func.max(Submission.id).label("latest_id")
-            )
-            .filter(Submission.user_id == current_user.id)
-            .group_by(Submission.problem_id)
-            .subquery()
-        )
-        
-        # 基本查询构建 - 获取用户答题记录并关联相关信息
-        query = (
-            db.query(
-                Submission,
-                Problem.name.label("problem_name"),
-                Problem.chinese_name.label("problem_chinese_name"),
-                Exercise.name.label("exercise_name"),
-                Exercise.course_id,
-                Course.name.label("course_name"),
-            )
-            .join(latest_submissions, Submission.id == latest_submissions.c.latest_id)
-            .join(Problem, Submission.problem_id == Problem.id)
-            .outerjoin(Exercise, Submission.exercise_id == Exercise.id)
-            .outerjoin(Course, Exercise.course_id == Course.id)
-            # 不需要再过滤用户ID，因为子查询已经过滤
-        )
-        
-        # 按提交时间排序
-        if sort.lower() == "asc":
-            query = query.order_by(Submission.submitted_at.asc())
-        else:
-            query = query.order_by(Submission.submitted_at.desc())
-        
-        # 分页
-        results = query.offset(offset).limit(limit).all()
-        
-        # 查询用户所在班级（用于补充班级信息）
-        user_classes = {}
-        try:
-            if current_user.role == "student":
-                classes = (
-                    db.query(Class)
-                    .join(student_class, Class.id == student_class.c.class_id)
-                    .filter(student_class.c.student_id == current_user.id)
-                    .all()
-                )
-                user_classes = {cls.id: cls.name for cls in classes}
-        except Exception as e:
-            print(f"获取用户班级信息失败: {str(e)}")
-            user_classes = {}
-        
-        # 组装响应数据
-        response_data = []
-        
-        for row in results:
-            submission, problem_name, problem_chinese_name, exercise_name, course_id, course_name = row
-            
-            # 查询关联的班级信息
-            class_names = []
-            class_id = None
-            
-            # 简化班级信息获取逻辑
-            if current_user.role == "student" and user_classes:
-                # 学生用户：直接使用用户所在的班级
-                class_names = list(user_classes.values())
-                class_id = list(user_classes.keys())[0] if user_classes else None
-            elif submission.exercise_id:
-                # 非学生用户或没有班级信息时：尝试从练习获取班级
-                try:
-                    exercise_classes = (
-                        db.query(Class)
-                        .join(course_class, Class.id == course_class.c.class_id)
-                        .join(Exercise, Exercise.course_id == course_class.c.course_id)
-                        .filter(Exercise.id == submission.exercise_id)
-                        .all()
-                    )
-                    class_names = [cls.name for cls in exercise_classes]
-                    class_id = exercise_classes[0].id if exercise_classes else None
-                except Exception as e:
-                    print(f"查询练习关联班级出错: {str(e)}")
-                    class_names = []
-                    class_id = None
-            
-            # 组装响应数据
-            submission_data = {
-                "id": submission.id,
-                "user_id": submission.user_id,
-                "problem_id": submission.problem_id,
-                "exercise_id": submission.exercise_id,
-                "language": submission.language,
-                "status": submission.status,
-                "code_check_score": submission.code_check_score,
-                "runtime_score": submission.runtime_score,
-                "total_score": submission.total_score,
-                "submitted_at": submission.submitted_at,
-                "problem_name": problem_name or f"题目 {submission.problem_id}",
-                "problem_chinese_name": problem_chinese_name,
-                "exercise_name": exercise_name or "-",
-                "course_id": course_id,
-                "course_name": course_name or "-",
-                "class_names": ", ".join(class_names) if class_names else "-",
-                "class_id": class_id,
-                # 添加必需的用户字段
-                "username": current_user.username,
-                "real_name": current_user.real_name
-            }
-            
-            response_data.append(submission_data)
-        
-        return response_data
+        after = decode_cursor(cursor, 2)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    try:
+        return SubmissionHistoryService.get_page(db, current_user, after, limit, sort.lower() == "asc")
     except Exception as e:
         print(f"获取答题记录出错: {str(e)}")
         raise HTTPException(status_code=500, detail=f"获取答题记录失败: {str(e)}")
@@ -210,6 +116,33 @@ async def submit_code(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"提交失败: {str(e)}")
 
+@router.post("/test-run", response_model=TestRunResponse)
+async def test_run(
+    request: TestRunRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    自测运行：用自定义输入运行代码，并与参考答案的输出对比（不产生提交记录）
+    """
+    problem = db.query(Problem).filter(Problem.id == request.problem_id).first()
+    if not problem:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="题目不存在"
+        )
+    
+    try:
+        return await run_in_threadpool(
+            JudgeService.test_run, problem, request.code, request.input, request.language
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except JudgeBusyError as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"运行失败: {str(e)}")
+
 @router.get("/{submission_id}", response_model=SubmissionDetail)
 async def get_submission(
     submission_id: int,
@@ -219,8 +152,13 @@ async def get_submission(
     """
     获取提交记录详情
     """
-    # 查询提交记录
-    submission = db.query(Submission).filter(Submission.id == submission_id).first()
+    # 查询提交记录（result列和代码默认不加载，详情页需要）
+    submission = (
+        db.query(Submission)
+        .options(undefer(Submission.result), undefer(Submission.legacy_code), joinedload(Submission.code_blob))
+        .filter(Submission.id == submission_id)
+        .first()
+    )
     
     # 检查记录是否存在
     if not submission:
@@ -233,114 +171,270 @@ async def get_submission(
             detail="没有权限查看其他用户的提交记录"
         )
     
-    # 获取测试用例数据
+    # 各测试点的详情保存在单独的表中，合并回result.runtime.details
+    result = CaseResultService.attach_details(db, submission.result, submission.id)
+    
+    # 只返回测试用例的元数据，用例内容通过 /{submission_id}/test-cases/{number} 按需读取
     try:
         problem = db.query(Problem).filter(Problem.id == submission.problem_id).first()
         if problem and problem.data_path:
-            test_cases = JudgeService.get_test_cases(problem.data_path)
+            test_cases = JudgeService.get_test_case_meta(problem.data_path)
             submission.test_cases = test_cases
+            submission.test_case_count = len(test_cases)
     except Exception as e:
         print(f"获取测试用例数据失败: {e}")
         submission.test_cases = None
     
+    # 返回前从会话中移除，避免合并后的result被当作修改写回数据库
+    db.expunge(submission)
+    submission.result = result
     return submission
 
-@router.get("/", response_model=List[UserSubmissionResponse])
+def _parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    解析单段 Range 请求头（bytes=start-end / bytes=start- / bytes=-suffix），返回闭区间
+
+    Raises:
+        ValueError: 格式不支持或范围无法满足
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        raise ValueError(header)
+    first, _, last = spec.strip().partition("-")
+    if first:
+        start = int(first)
+        end = int(last) if last else size - 1
+    else:
+        suffix = int(last)
+        if suffix <= 0:
+            raise ValueError(header)
+        start = max(size - suffix, 0)
+        end = size - 1
+    if start >= size or end < start:
+        raise ValueError(header)
+    return start, min(end, size - 1)
+
+@router.get("/{submission_id}/test-cases/{number}")
+async def get_submission_test_case(
+    submission_id: int,
+    number: int,
+    request: Request,
+    kind: str = Query("input", description="input：输入数据，output：期望输出，actual：本次提交的实际输出"),
+    max_bytes: int = Query(TEST_CASE_PREVIEW_BYTES, ge=1, le=TEST_CASE_MAX_BYTES, description="最多返回的字节数"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    读取提交所属题目的单个测试用例内容，或本次提交在该测试点上的完整实际输出
+
+    返回原始字节（text/plain，charset为文件的编码），超过max_bytes时截断并在
+    X-Truncated 中标明；支持 Range 请求（206 Partial Content）分段读取大文件，
+    每段同样不超过max_bytes。ETag 为内容的MD5。
+    """
+    if kind not in ("input", "output", "actual"):
+        raise HTTPException(status_code=400, detail=f"不支持的数据类型: {kind}")
+
+    submission = db.query(Submission).filter(Submission.id == submission_id).first()
+    if not submission:
+        raise HTTPException(status_code=404, detail="提交记录不存在")
+    if current_user.role == "student" and submission.user_id != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="没有权限查看其他用户的提交记录"
+        )
+
+    if kind == "actual":
+        actual = CaseResultService.get_actual_output(db, submission.id, number)
+        case = None
+        if actual is not None:
+            data = actual.encode("utf-8")
+            case = {"data": data, "size": len(data), "md5": hashlib.md5(data).hexdigest(), "encoding": "utf-8"}
+    else:
+        problem = db.query(Problem).filter(Problem.id == submission.problem_id).first()
+        if not problem or not problem.data_path:
+            raise HTTPException(status_code=404, detail="题目没有测试数据")
+        case = await run_in_threadpool(JudgeService.get_test_case_data, problem.data_path, number, kind)
+    if case is None:
+        raise HTTPException(status_code=404, detail=f"测试用例 {number} 不存在")
+
+    size = case["size"]
+    headers = {"Accept-Ranges": "bytes", "X-Total-Length": str(size)}
+    if case["md5"]:
+        headers["ETag"] = f'"{case["md5"]}"'
+        if request.headers.get("if-none-match") == headers["ETag"]:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    media_type = f"text/plain; charset={case['encoding']}"
+
+    range_header = request.headers.get("range")
+    if range_header:
+        try:
+            start, end = _parse_range(range_header, size)
+        except ValueError:
+            return Response(
+                status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+                headers={"Content-Range": f"bytes */{size}", "Accept-Ranges": "bytes"}
+            )
+        end = min(end, start + max_bytes - 1)
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        return Response(
+            content=bytes(case["data"][start:end + 1]),
+            status_code=status.HTTP_206_PARTIAL_CONTENT,
+            media_type=media_type,
+            headers=headers
+        )
+
+    headers["X-Truncated"] = "true" if size > max_bytes else "false"
+    return Response(content=bytes(case["data"][:max_bytes]), media_type=media_type, headers=headers)
+
+@router.get("/", response_model=SubmissionPage)
 async def get_submissions(
     user_id: Optional[int] = None,
     problem_id: Optional[int] = None,
     exercise_id: Optional[int] = None,
+    cursor: Optional[str] = Query(None, description="上一页返回的next_cursor，不传则从最新的提交开始"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="每页条数"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
     获取提交记录列表
-    可以按用户ID、问题ID或练习ID筛选
-    返回完整的关联数据，包括题目、练习、课程、班级名称
+    可以按用户ID、问题ID或练习ID筛选，按提交时间从新到旧分页返回
+    返回关联的题目、练习、课程名称和用户信息；next_cursor为空表示已经是最后一页
     """
+    # 检查权限（学生只能查看自己的提交）
+    if current_user.role == "student" and user_id is not None and user_id != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="没有权限查看其他用户的提交记录"
+        )
+    
     try:
-        # 简化查询，先验证基本数据
-        submissions_query = db.query(Submission)
+        after = decode_cursor(cursor, 2)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-        # 应用筛选条件
-        if user_id is not None:
-            # 检查权限（学生只能查看自己的提交）
-            if current_user.role == "student" and user_id != current_user.id:
-                raise HTTPException(
-                    status_code=status.HTTP_403_FORBIDDEN,
-                    detail="没有权限查看其他用户的提交记录"
-                )
-                submissions_query = submissions_query.filter(Submission.user_id == user_id)
+    try:
+        # 一条查询关联用户、题目、练习和课程，只取列表需要的列
+        query = (
+            db.query(
+                Submission.id,
+                Submission.user_id,
+                Submission.problem_id,
+                Submission.exercise_id,
+                Submission.language,
+                Submission.status,
+                Submission.code_check_score,
+                Submission.runtime_score,
+                Submission.total_score,
+                Submission.submitted_at,
+                Problem.name.label("problem_name"),
+                Problem.chinese_name.label("problem_chinese_name"),
+                Exercise.name.label("exercise_name"),
+                Exercise.course_id,
+                Course.name.label("course_name"),
+                User.username,
+                User.real_name,
+            )
+            .outerjoin(User, User.id == Submission.user_id)
+            .outerjoin(Problem, Problem.id == Submission.problem_id)
+            .outerjoin(Exercise, Exercise.id == Submission.exercise_id)
+            .outerjoin(Course, Course.id == Exercise.course_id)
+        )
+        
+        # 应用筛选条件（学生只显示自己的提交）
+        if current_user.role == "student":
+            query = query.filter(Submission.user_id == current_user.id)
+        elif user_id is not None:
+            query = query.filter(Submission.user_id == user_id)
         
         if problem_id is not None:
-                submissions_query = submissions_query.filter(Submission.problem_id == problem_id)
+            query = query.filter(Submission.problem_id == problem_id)
         
         if exercise_id is not None:
-                submissions_query = submissions_query.filter(Submission.exercise_id == exercise_id)
+            query = query.filter(Submission.exercise_id == exercise_id)
         
-        # 对于学生，只显示自己的提交
-        if current_user.role == "student":
-                submissions_query = submissions_query.filter(Submission.user_id == current_user.id)
+        # 按(提交时间, ID)降序的键集分页，翻页代价与页码无关
+        if after is not None:
+            query = query.filter(tuple_(Submission.submitted_at, Submission.id) < tuple_(after[0], after[1]))
         
-    # 按提交时间降序排序
-        submissions = submissions_query.order_by(Submission.submitted_at.desc()).all()
-    
-        # 组装响应数据
-        response_data = []
+        rows = query.order_by(Submission.submitted_at.desc(), Submission.id.desc()).limit(limit + 1).all()
+        cursor_next = next_cursor(rows, limit, lambda row: (row.submitted_at, row.id))
         
-        for submission in submissions:
-            # 获取用户信息
-            user = db.query(User).filter(User.id == submission.user_id).first()
-            
-            # 获取题目信息
-            problem = db.query(Problem).filter(Problem.id == submission.problem_id).first()
-            
-            # 获取练习信息
-            exercise = None
-            course = None
-            if submission.exercise_id:
-                exercise = db.query(Exercise).filter(Exercise.id == submission.exercise_id).first()
-                if exercise and exercise.course_id:
-                    course = db.query(Course).filter(Course.id == exercise.course_id).first()
-            
-            # 组装响应数据
-            submission_data = {
-                "id": submission.id,
-                "user_id": submission.user_id,
-                "problem_id": submission.problem_id,
-                "exercise_id": submission.exercise_id,
-                "language": submission.language,
-                "status": submission.status,
-                "code_check_score": submission.code_check_score,
-                "runtime_score": submission.runtime_score,
-                "total_score": submission.total_score,
-                "submitted_at": submission.submitted_at,
-                # 添加关联数据
-                "problem_name": problem.name if problem else f"题目 {submission.problem_id}",
-                "problem_chinese_name": problem.chinese_name if problem else None,
-                "exercise_name": exercise.name if exercise else None,
-                "course_id": exercise.course_id if exercise else None,
-                "course_name": course.name if course else None,
-                "username": user.username if user else f"用户{submission.user_id}",
-                "real_name": user.real_name if user else None,
-                # 添加必需的字段以符合UserSubmissionResponse模型
+        items = []
+        for row in rows[:limit]:
+            items.append({
+                "id": row.id,
+                "user_id": row.user_id,
+                "problem_id": row.problem_id,
+                "exercise_id": row.exercise_id,
+                "language": row.language,
+                "status": row.status,
+                "code_check_score": row.code_check_score,
+                "runtime_score": row.runtime_score,
+                "total_score": row.total_score,
+                "submitted_at": row.submitted_at,
+                "problem_name": row.problem_name or f"题目 {row.problem_id}",
+                "problem_chinese_name": row.problem_chinese_name,
+                "exercise_name": row.exercise_name,
+                "course_id": row.course_id,
+                "course_name": row.course_name,
+                "username": row.username or f"用户{row.user_id}",
+                "real_name": row.real_name,
                 "class_names": None,
                 "class_id": None
-            }
-            
-            response_data.append(submission_data)
+            })
         
-        return response_data
+        return {"items": items, "next_cursor": cursor_next}
         
     except Exception as e:
         print(f"获取提交记录出错: {str(e)}")
         raise HTTPException(status_code=500, detail=f"获取提交记录失败: {str(e)}")
 
+@router.get("/problem-ranking/{problem_id}/export")
+async def export_problem_ranking(
+    problem_id: int,
+    exercise_id: int = Query(..., description="练习ID"),
+    class_id: Optional[int] = Query(None, description="班级ID，不传则导出所有班级"),
+    format: str = Query("csv", description="导出格式：csv或xlsx"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_teacher_user)
+):
+    """导出题目排名（教师或管理员）"""
+    try:
+        ExportService.check_format(format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    problem = db.query(Problem).filter(Problem.id == problem_id).first()
+    if not problem:
+        raise HTTPException(status_code=404, detail="题目不存在")
+    exercise = db.query(Exercise).filter(Exercise.id == exercise_id).first()
+    if not exercise:
+        raise HTTPException(status_code=404, detail="练习不存在")
+    
+    # 与排名查询一致：指定班级时只含该班级，否则限制为练习关联的班级（课程未关联班级时不限制）
+    if class_id:
+        class_ids = [class_id]
+    else:
+        class_ids = [cls.id for cls in exercise.course.classes] if exercise.course else []
+    
+    header = ["名次", "学号", "姓名", "班级", "得分", "状态", "最后提交时间"]
+    rows = ExportService.problem_ranking(exercise_id, problem_id, class_ids or None)
+    
+    filename = ExportService.filename(f"{problem.chinese_name or problem.name}_排名", format)
+    return StreamingResponse(
+        ExportService.render(header, rows, format, title="排名"),
+        media_type=ExportService.media_type(format),
+        headers={"Content-Disposition": ExportService.content_disposition(filename)}
+    )
+
 @router.get("/problem-ranking/{problem_id}", response_model=ProblemRankingResponse)
 async def get_problem_ranking(
     problem_id: int,
     exercise_id: int = Query(..., description="练习ID"),
     class_id: Optional[int] = Query(None, description="班级ID，不传则查询所有班级"),
+    offset: int = Query(0, ge=0, description="从第几名开始返回"),
+    limit: Optional[int] = Query(None, ge=1, le=500, description="返回人数，不传则返回全部学生"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -359,7 +453,7 @@ async def get_problem_ranking(
     
     try:
         ranking_data = JudgeService.get_problem_ranking(
-            db, problem_id, exercise_id, class_id, current_user.id
+            db, problem_id, exercise_id, class_id, current_user.id, offset, limit
         )
         
         return ranking_data 
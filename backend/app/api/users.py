@@ -284,6 +284,11 @@ async def update_student(
     db.commit()
     db.refresh(student)
     
+    # 班级关系变化后排行榜需要重建
+    if class_ids is not None:
+        from app.services.leaderboard_service import LeaderboardService
+        LeaderboardService.bump_membership_version()
+    
     # 记录操作日志
     log = OperationLog(
         user_id=current_user.id,
@@ -365,6 +370,10 @@ async def delete_student(
     db.delete(student)
     db.commit()
     
+    # 学生删除后需要从排行榜中移除
+    from app.services.leaderboard_service import LeaderboardService
+    LeaderboardService.bump_membership_version()
+    
     return {"message": "学生删除成功"}
 
 @router.post("/import")
@@ -596,6 +605,10 @@ async def clear_students(
     
     db.commit()
     
+    # 学生删除后需要从排行榜中移除
+    from app.services.leaderboard_service import LeaderboardService
+    LeaderboardService.bump_membership_version()
+    
     # 记录操作日志
     target = f"所有学生" if not class_id else f"班级ID {class_id} 的学生"
     log = OperationLog(
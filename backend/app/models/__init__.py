@@ -5,7 +5,7 @@ from app.models.course import Course
 from app.models.exercise import Exercise
 from app.models.tag import TagType, Tag, TagApprovalRequest, problem_tag
 from app.models.problem import Problem, ProblemCategory, user_favorites
-from app.models.submission import Submission
+from app.models.submission import Submission, CodeBlob, SubmissionSummary, SubmissionCaseResult, SubmissionTimeline
 from app.models.operation_log import OperationLog
 from app.models.system_setting import SystemSetting
 
@@ -18,7 +18,7 @@ __all__ = [
     "Exercise",
     "TagType", "Tag", "TagApprovalRequest", "problem_tag",
     "Problem", "ProblemCategory", "user_favorites",
-    "Submission",
+    "Submission", "CodeBlob", "SubmissionSummary", "SubmissionCaseResult", "SubmissionTimeline",
     "OperationLog",
     "SystemSetting"
 ] 
\ No newline at end of file
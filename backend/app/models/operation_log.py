@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 
@@ -6,14 +6,18 @@ from app.models.database import Base
 
 
 class OperationLog(Base):
-    """操作日志模型"""
+    """操作日志模型（数据库中按created_at每月一个分区）"""
     __tablename__ = "operation_logs"
+    __table_args__ = (
+        # 按用户查询最近的操作（活跃学生统计）
+        Index("idx_operation_logs_user_created", "user_id", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     operation = Column(String, nullable=False)  # 操作类型，如"提交代码"、"删除题目"等
     target = Column(String, nullable=True)  # 操作对象，如题目名称或练习名称
     # details = Column(Text, nullable=True)  # 操作详情 - 数据库表中不存在此列
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())  # 分区键
     
     # 关系
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -1,10 +1,11 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, Text, Boolean, DateTime, Table
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, Text, Boolean, DateTime, Table, event, inspect
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 
 from app.models.database import Base
 from .exercise import exercise_problem
 from .tag import problem_tag
+from app.utils.path_utils import normalize_problem_path
 
 # 用户收藏关联表
 user_favorites = Table(
@@ -29,6 +30,8 @@ class Problem(Base):
     runtime_score = Column(Integer, default=80)
     score_method = Column(String, default="sum")  # sum或max
     data_path = Column(String, nullable=True)
+    # 规范化后的data_path，用于按路径查找题目（唯一索引）
+    path_key = Column(String, nullable=True, unique=True, index=True)
     category = Column(String, nullable=True)
     is_shared = Column(Boolean, default=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -48,6 +51,19 @@ class Problem(Base):
     # 收藏关系 - 被哪些用户收藏
     favorited_by = relationship("User", secondary=user_favorites, back_populates="favorite_problems")
 
+
+@event.listens_for(Problem, "before_insert")
+def _set_path_key(mapper, connection, target):
+    """新建题目时生成path_key"""
+    target.path_key = normalize_problem_path(target.data_path)
+
+
+@event.listens_for(Problem, "before_update")
+def _update_path_key(mapper, connection, target):
+    """data_path变化时同步更新path_key"""
+    if inspect(target).attrs.data_path.history.has_changes():
+        target.path_key = normalize_problem_path(target.data_path)
+
 # 保留ProblemCategory类，但修复与Problem的关系
 class ProblemCategory(Base):
     """问题分类模型"""
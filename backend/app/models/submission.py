@@ -1,29 +1,138 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, JSON
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, JSON, Index, LargeBinary
+from sqlalchemy.orm import relationship, deferred
 from sqlalchemy.sql import func
 from sqlalchemy.dialects.postgresql import JSONB
 
 from app.models.database import Base
+from app.utils.compression import decompress_text
 
 
 class Submission(Base):
-    """提交模型"""
+    """
+    提交模型
+
+    数据库中按submitted_at每月一个分区（见docker/db/init.sql和PartitionService），
+    表的主键为(id, submitted_at)，ORM仍按id识别记录
+    """
     __tablename__ = "submissions"
+    __table_args__ = (
+        # 提交列表按(提交时间, ID)键集分页
+        Index("idx_submissions_submitted_at_id", "submitted_at", "id"),
+        Index("idx_submissions_user_submitted_at", "user_id", "submitted_at", "id"),
+        Index("idx_submissions_exercise_submitted_at", "exercise_id", "submitted_at", "id"),
+        # 删除提交时按代码哈希减少引用计数
+        Index("idx_submissions_code_hash", "code_hash"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
     problem_id = Column(Integer, ForeignKey("problems.id"))
     exercise_id = Column(Integer, ForeignKey("exercises.id"))
-    code = Column(Text, nullable=False)
+    # 代码保存在code_blobs表中（按SHA-256去重、压缩），code列只保留迁移前的旧数据
+    code_hash = Column(String(64), ForeignKey("code_blobs.hash"), nullable=True)
+    legacy_code = deferred(Column("code", Text, nullable=True))
     language = Column(String, nullable=False)
     status = Column(String, nullable=True)  # 'Pending', 'Accepted', 'Wrong Answer', 'Compilation Error', etc.
     code_check_score = Column(Integer, nullable=True)
     runtime_score = Column(Integer, nullable=True)
     total_score = Column(Integer, nullable=True)
-    result = Column(JSONB, nullable=True)  # 评测结果详情
-    submitted_at = Column(DateTime(timezone=True), server_default=func.now())
+    # 评测结果摘要（各测试点的详情在submission_case_results表中），列表查询不加载
+    result = deferred(Column(JSONB, nullable=True))
+    submitted_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())  # 分区键
 
     # 关系
     user = relationship("User", back_populates="submissions")
     problem = relationship("Problem", back_populates="submissions")
-    exercise = relationship("Exercise", back_populates="submissions") 
\ No newline at end of file
+    exercise = relationship("Exercise", back_populates="submissions")
+    code_blob = relationship("CodeBlob", lazy="select")
+
+    @property
+    def code(self) -> str:
+        """提交的源代码（读取时解压）"""
+        if self.code_blob is not None:
+            return self.code_blob.text
+        return self.legacy_code or ""
+
+
+class CodeBlob(Base):
+    """
+    按内容寻址的源代码
+
+    以代码的SHA-256为主键，相同代码的提交共用一行；data为压缩后的代码（见app.utils.compression），
+    ref_count为引用该代码的提交数，删除提交时减一，减到0的行由清理任务删除
+    """
+    __tablename__ = "code_blobs"
+
+    hash = Column(String(64), primary_key=True)
+    data = Column(LargeBinary, nullable=False)
+    size = Column(Integer, nullable=False)  # 原始代码的字节数
+    ref_count = Column(Integer, nullable=False, default=1)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    @property
+    def text(self) -> str:
+        return decompress_text(self.data)
+
+class SubmissionSummary(Base):
+    """
+    每个(练习, 题目, 用户)的提交汇总
+
+    每次评测结束时在同一事务中更新，排名和统计直接读取本表，不再扫描全部提交记录。
+    不属于任何练习的提交exercise_id记为0。
+    """
+    __tablename__ = "submission_summary"
+
+    exercise_id = Column(Integer, primary_key=True, default=0)
+    problem_id = Column(Integer, ForeignKey("problems.id", ondelete="CASCADE"), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True, index=True)
+    best_score = Column(Integer, nullable=False, default=0)
+    best_submission_id = Column(Integer, nullable=True)
+    best_status = Column(String, nullable=True)
+    latest_submission_id = Column(Integer, nullable=False)
+    latest_score = Column(Integer, nullable=False, default=0)
+    latest_status = Column(String, nullable=True)
+    attempt_count = Column(Integer, nullable=False, default=0)
+    first_ac_at = Column(DateTime(timezone=True), nullable=True)
+    last_submitted_at = Column(DateTime(timezone=True), nullable=True)
+
+
+class SubmissionCaseResult(Base):
+    """
+    提交在每个测试点上的评测详情
+
+    输入、期望输出和实际输出只保存开头和结尾（以及完整内容的长度和MD5），
+    未通过的测试点另外保存压缩后的完整实际输出
+    """
+    __tablename__ = "submission_case_results"
+
+    # submissions是分区表（主键含submitted_at），不能按id建外键，删除提交时由CaseResultService.forget()一并删除
+    submission_id = Column(Integer, primary_key=True)
+    test_case = Column(Integer, primary_key=True)
+    result = Column(Integer, nullable=False)  # 0通过 -1输出不匹配 1超时 2运行错误 3其他错误
+    message = Column(String, nullable=True)
+    input_preview = Column(Text, nullable=True)
+    input_size = Column(Integer, nullable=True)
+    input_md5 = Column(String(32), nullable=True)
+    expected_preview = Column(Text, nullable=True)
+    expected_size = Column(Integer, nullable=True)
+    expected_md5 = Column(String(32), nullable=True)
+    actual_preview = Column(Text, nullable=True)
+    actual_size = Column(Integer, nullable=True)
+    actual_md5 = Column(String(32), nullable=True)
+    actual_output = deferred(Column(LargeBinary, nullable=True))  # 压缩的完整实际输出，仅未通过的测试点
+    extra = Column(JSONB, nullable=True)  # 其他字段，如远程评测的cpu_time、memory、exit_code等
+
+
+class SubmissionTimeline(Base):
+    """
+    练习提交时间线的历史数据（按分钟）
+
+    进行中的练习由Redis计数器实时累计，超过沉淀时间的分钟定期压缩写入本表
+    """
+    __tablename__ = "submission_timeline"
+
+    exercise_id = Column(Integer, ForeignKey("exercises.id", ondelete="CASCADE"), primary_key=True)
+    bucket_start = Column(DateTime, primary_key=True)  # 该分钟的开始时间
+    submission_count = Column(Integer, nullable=False, default=0)
+    distinct_users = Column(Integer, nullable=False, default=0)
+    status_counts = Column(JSONB, nullable=False, default=dict)  # {评测状态: 提交数}
@@ -10,6 +10,26 @@ class SubmissionCreate(BaseModel):
     code: str
     language: str = "c"
 
+# 自测运行请求模型
+class TestRunRequest(BaseModel):
+    problem_id: int
+    code: str
+    input: str = ""
+    language: str = "c"
+
+# 自测运行中单个程序的运行结果
+class TestRunOutput(BaseModel):
+    status: str
+    output: str
+    time_ms: int
+
+# 自测运行响应模型
+class TestRunResponse(BaseModel):
+    compile: Dict[str, Any]
+    user: Optional[TestRunOutput] = None
+    reference: Optional[TestRunOutput] = None
+    match: Optional[bool] = None
+
 # 提交响应模型
 class SubmissionResponse(BaseModel):
     id: int
@@ -30,7 +50,9 @@ class SubmissionResponse(BaseModel):
 class SubmissionDetail(SubmissionResponse):
     code: str
     result: Optional[Dict[str, Any]] = None
+    # 测试用例元数据：test_case、input_size、input_md5、output_size、output_md5
     test_cases: Optional[List[Dict[str, Any]]] = None
+    test_case_count: Optional[int] = None
 
     class Config:
         orm_mode = True
@@ -85,4 +107,9 @@ class UserSubmissionResponse(BaseModel):
     real_name: Optional[str] = None
     
     class Config:
-        orm_mode = True 
\ No newline at end of file
+        orm_mode = True
+
+# 提交记录分页响应（键集分页）
+class SubmissionPage(BaseModel):
+    items: List[UserSubmissionResponse]
+    next_cursor: Optional[str] = None
@@ -0,0 +1,210 @@
+import json
+import time
+import uuid
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.models import User, OperationLog, SubmissionSummary
+from app.models.class_model import student_class
+from app.services.exercise_service import ExerciseService
+from app.utils.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+# 活跃学生列表的缓存（每个练习一个哈希，字段为班级ID或"all"）和锁键
+ACTIVE_STUDENTS_CACHE_KEY = "exercise_active_students:{exercise_id}"
+ACTIVE_STUDENTS_LOCK_KEY = "exercise_active_students:lock:{exercise_id}:{scope}"
+
+# 教师页面轮询间隔为数秒，缓存时间与之相当即可让同时打开的多个页面共享一次查询
+CACHE_EXPIRE = 5
+
+# 计算结果的锁超时（秒）及其他请求等待结果的最长时间
+LOCK_EXPIRE = 10
+WAIT_TIMEOUT = 3
+WAIT_INTERVAL = 0.05
+
+NOT_ACTIVE = "尚未活动"
+
+
+def _naive(value: Optional[datetime]) -> Optional[datetime]:
+    """统一使用naive datetime比较（提交时间和日志时间的时区信息不一致）"""
+    if value is not None and value.tzinfo is not None:
+        return value.replace(tzinfo=None)
+    return value
+
+
+def _time_ago(last_active: Optional[str], now: datetime) -> str:
+    if not last_active:
+        return "未知"
+    time_diff = now - datetime.strptime(last_active, "%Y-%m-%d %H:%M:%S")
+    if time_diff.days > 0:
+        return f"{time_diff.days}天前"
+    elif time_diff.seconds > 3600:
+        return f"{time_diff.seconds // 3600}小时前"
+    elif time_diff.seconds > 60:
+        return f"{time_diff.seconds // 60}分钟前"
+    return f"{time_diff.seconds}秒前"
+
+
+class ActiveStudentsService:
+    """练习活跃学生列表（教师上课时轮询）"""
+
+    @staticmethod
+    def compute(db: Session, exercise_id: int, class_ids: List[int], total_problems: int) -> List[Dict[str, Any]]:
+        """
+        批量计算学生的最后活动时间和通过题数
+
+        学生及其统计一条查询完成：最后提交时间和通过题数来自提交汇总表，
+        最近操作时间按用户聚合operation_logs；班级名称一条批量查询
+        """
+        student_ids = db.query(User.id).filter(
+            User.role == "student",
+            User.id.in_(db.query(student_class.c.student_id).filter(student_class.c.class_id.in_(class_ids)))
+        )
+
+        submission_stats = (
+            db.query(
+                SubmissionSummary.user_id.label("user_id"),
+                func.max(SubmissionSummary.last_submitted_at).label("last_submitted_at"),
+                func.count(SubmissionSummary.first_ac_at).label("accepted_count"),
+            )
+            .filter(
+                SubmissionSummary.exercise_id == exercise_id,
+                SubmissionSummary.user_id.in_(student_ids)
+            )
+            .group_by(SubmissionSummary.user_id)
+            .subquery()
+        )
+        log_stats = (
+            db.query(
+                OperationLog.user_id.label("user_id"),
+                func.max(OperationLog.created_at).label("last_log_at"),
+            )
+            .filter(OperationLog.user_id.in_(student_ids))
+            .group_by(OperationLog.user_id)
+            .subquery()
+        )
+        rows = (
+            db.query(
+                User.id, User.username, User.real_name, User.is_online,
+                submission_stats.c.last_submitted_at,
+                submission_stats.c.accepted_count,
+                log_stats.c.last_log_at,
+            )
+            .filter(User.id.in_(student_ids))
+            .outerjoin(submission_stats, submission_stats.c.user_id == User.id)
+            .outerjoin(log_stats, log_stats.c.user_id == User.id)
+            .all()
+        )
+
+        class_names = ExerciseService.get_student_class_names(db, [row[0] for row in rows])
+
+        active_students = []
+        for user_id, username, real_name, is_online, last_submitted_at, accepted_count, last_log_at in rows:
+            times = [t for t in (_naive(last_submitted_at), _naive(last_log_at)) if t is not None]
+            active_students.append({
+                "student_id": user_id,
+                "username": username,
+                "real_name": real_name or username,
+                "class_names": class_names.get(user_id, []),
+                "is_online": is_online,  # 使用数据库中的在线状态
+                "latest_activity": max(times).strftime("%Y-%m-%d %H:%M:%S") if times else NOT_ACTIVE,
+                "completed_problems_count": accepted_count or 0,
+                "total_problems_count": total_problems
+            })
+
+        # 按活跃时间和在线状态排序（与原有顺序一致）
+        active_students.sort(key=lambda x: (
+            not x["is_online"],
+            x["latest_activity"] == NOT_ACTIVE,
+            x["latest_activity"]
+        ), reverse=True)
+        return active_students
+
+    @staticmethod
+    def _with_time_ago(active_students: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """相对时间在每次响应时按当前时间计算，缓存中只保存绝对时间"""
+        now = datetime.now().replace(tzinfo=None)
+        for student in active_students:
+            latest = student["latest_activity"]
+            student["last_active_time_ago"] = _time_ago(None if latest == NOT_ACTIVE else latest, now)
+        return active_students
+
+    @staticmethod
+    def _read_cache(exercise_id: int, scope: str) -> Optional[List[Dict[str, Any]]]:
+        try:
+            value = redis_client.hget(ACTIVE_STUDENTS_CACHE_KEY.format(exercise_id=exercise_id), scope)
+            if value is None:
+                return None
+            entry = json.loads(value)
+            if time.time() - entry["at"] > CACHE_EXPIRE:
+                return None
+            return entry["data"]
+        except Exception as e:
+            logger.warning(f"读取活跃学生缓存失败: {e}")
+            return None
+
+    @staticmethod
+    def _write_cache(exercise_id: int, scope: str, active_students: List[Dict[str, Any]]) -> None:
+        key = ACTIVE_STUDENTS_CACHE_KEY.format(exercise_id=exercise_id)
+        try:
+            pipe = redis_client.pipeline(transaction=False)
+            pipe.hset(key, scope, json.dumps({"at": time.time(), "data": active_students}, ensure_ascii=False))
+            pipe.expire(key, CACHE_EXPIRE)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"写入活跃学生缓存失败: {e}")
+
+    @staticmethod
+    def invalidate(exercise_id: int) -> None:
+        """练习中有新的评测结果时清除缓存，推送触发的刷新能立即读到最新数据"""
+        try:
+            redis_client.delete(ACTIVE_STUDENTS_CACHE_KEY.format(exercise_id=exercise_id))
+        except Exception as e:
+            logger.warning(f"清除活跃学生缓存失败: {e}")
+
+    @staticmethod
+    async def get(db: Session, exercise_id: int, class_ids: List[int], scope: str, total_problems: int) -> List[Dict[str, Any]]:
+        """
+        读取活跃学生列表，短时间缓存并合并并发请求
+
+        缓存失效时只有拿到Redis锁的请求查询数据库，其余请求等待其写入缓存；
+        等待超时或Redis不可用时各自查询
+        """
+        lock_key = ACTIVE_STUDENTS_LOCK_KEY.format(exercise_id=exercise_id, scope=scope)
+
+        cached = ActiveStudentsService._read_cache(exercise_id, scope)
+        if cached is not None:
+            return ActiveStudentsService._with_time_ago(cached)
+
+        token = uuid.uuid4().hex
+        try:
+            acquired = bool(redis_client.set(lock_key, token, nx=True, ex=LOCK_EXPIRE))
+        except Exception as e:
+            logger.warning(f"获取活跃学生缓存锁失败: {e}")
+            acquired = True
+
+        if not acquired:
+            deadline = time.monotonic() + WAIT_TIMEOUT
+            while time.monotonic() < deadline:
+                await asyncio.sleep(WAIT_INTERVAL)
+                cached = ActiveStudentsService._read_cache(exercise_id, scope)
+                if cached is not None:
+                    return ActiveStudentsService._with_time_ago(cached)
+
+        try:
+            active_students = ActiveStudentsService.compute(db, exercise_id, class_ids, total_problems)
+            ActiveStudentsService._write_cache(exercise_id, scope, active_students)
+        finally:
+            if acquired:
+                try:
+                    if redis_client.get(lock_key) == token:
+                        redis_client.delete(lock_key)
+                except Exception:
+                    pass
+        return ActiveStudentsService._with_time_ago(active_students)
@@ -0,0 +1,260 @@
+import time
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.models import Exercise, Problem, Submission, User
+from app.models.exercise import exercise_problem
+from app.utils.redis_client import RedisCache
+
+logger = logging.getLogger(__name__)
+
+# 练习分析结果的缓存键和过期时间（秒）
+ANALYTICS_CACHE_KEY = "analytics:exercise:{exercise_id}"
+CACHE_EXPIRE = 30 * 60
+
+# 通过所需提交次数的分组：1、2、3、4、5、6-10、11次及以上
+ATTEMPT_BINS = np.array([1, 2, 3, 4, 5, 6, 11])
+ATTEMPT_LABELS = ["1", "2", "3", "4", "5", "6-10", "11+"]
+
+# 得分分布按满分的10%分段，满分计入最后一段
+SCORE_BIN_COUNT = 10
+
+# 解题用时（首次提交到首次通过，秒）的分位数
+TIME_PERCENTILES = [25, 50, 75, 90]
+
+# 定时任务只重新计算最近仍在进行或刚结束的练习
+RECENT_DAYS = 7
+
+
+def _group_starts(*keys: np.ndarray) -> np.ndarray:
+    """已排序数组中各组的起始下标（任一键变化即为新的一组）"""
+    if len(keys[0]) == 0:
+        return np.zeros(0, dtype=np.int64)
+    changed = np.zeros(len(keys[0]) - 1, dtype=bool)
+    for key in keys:
+        changed |= key[1:] != key[:-1]
+    return np.flatnonzero(np.r_[True, changed])
+
+
+def _percentiles(values: np.ndarray) -> Dict[str, Optional[float]]:
+    if len(values) == 0:
+        return {f"p{q}": None for q in TIME_PERCENTILES}
+    return {f"p{q}": round(float(v), 1) for q, v in zip(TIME_PERCENTILES, np.percentile(values, TIME_PERCENTILES))}
+
+
+def _difficulty_label(difficulty: Optional[float]) -> str:
+    if difficulty is None:
+        return "暂无数据"
+    if difficulty < 0.3:
+        return "简单"
+    if difficulty < 0.6:
+        return "中等"
+    return "困难"
+
+
+class AnalyticsService:
+    """
+    题目与练习的统计分析
+
+    一次查询把练习的全部学生提交按列读入NumPy数组，按(题目, 学生, 提交ID)排序后
+    用分组归约（reduceat/bincount）计算通过率、通过所需提交次数、得分分布和解题用时，
+    不再对每道题、每个学生分别查询。结果缓存在Redis中供教师分析页面读取。
+    """
+
+    @staticmethod
+    def load_columns(db: Session, exercise_id: int, problem_ids: List[int]) -> Dict[str, np.ndarray]:
+        """读取练习中学生对当前题目的全部提交：user、problem、id、score、accepted、ts（秒）"""
+        stmt = (
+            select(
+                Submission.user_id,
+                Submission.problem_id,
+                Submission.id,
+                func.coalesce(Submission.total_score, 0),
+                Submission.status == "Accepted",
+                func.extract("epoch", Submission.submitted_at),
+            )
+            .join(User, User.id == Submission.user_id)
+            .where(
+                Submission.exercise_id == exercise_id,
+                Submission.problem_id.in_(problem_ids),
+                User.role == "student"
+            )
+        )
+        rows = db.execute(stmt).fetchall() if problem_ids else []
+        n = len(rows)
+        columns = list(zip(*rows)) if rows else [()] * 6
+        return {
+            "user": np.fromiter(columns[0], dtype=np.int64, count=n),
+            "problem": np.fromiter(columns[1], dtype=np.int64, count=n),
+            "id": np.fromiter(columns[2], dtype=np.int64, count=n),
+            "score": np.fromiter(columns[3], dtype=np.float64, count=n),
+            "accepted": np.fromiter((bool(v) for v in columns[4]), dtype=bool, count=n),
+            "ts": np.fromiter((float(v or 0) for v in columns[5]), dtype=np.float64, count=n),
+        }
+
+    @staticmethod
+    def analyze(columns: Dict[str, np.ndarray], problems: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        计算各题和整个练习的统计
+
+        Args:
+            columns: load_columns的结果
+            problems: 练习题目 [{"id", "name", "full_score"}]，按练习中的顺序
+        """
+        problem_ids = np.array([p["id"] for p in problems], dtype=np.int64)
+        full_scores = np.array([max(p["full_score"], 1) for p in problems], dtype=np.float64)
+        problem_count = len(problems)
+
+        # 按(题目, 学生, 提交ID)排序，题目换成在练习中的下标
+        order = np.lexsort((columns["id"], columns["user"], columns["problem"]))
+        user = columns["user"][order]
+        problem_index = np.searchsorted(problem_ids, columns["problem"][order]) if problem_count else np.zeros(0, np.int64)
+        score = columns["score"][order]
+        accepted = columns["accepted"][order]
+        ts = columns["ts"][order]
+        n = len(order)
+
+        # 每个(题目, 学生)一组
+        starts = _group_starts(problem_index, user)
+        pair_problem = problem_index[starts]
+        pair_user = user[starts]
+        pair_attempts = np.diff(np.r_[starts, n])
+        pair_best = np.maximum.reduceat(score, starts) if n else np.zeros(0)
+        first_ac = np.minimum.reduceat(np.where(accepted, np.arange(n), n), starts) if n else np.zeros(0, np.int64)
+        solved = first_ac < n
+        attempts_to_ac = first_ac[solved] - starts[solved] + 1
+        time_to_solve = ts[first_ac[solved]] - ts[starts[solved]]
+        solved_problem = pair_problem[solved]
+
+        # 各题计数（bincount按题目下标归约）
+        submissions = np.bincount(problem_index, minlength=problem_count)
+        accepted_submissions = np.bincount(problem_index[accepted], minlength=problem_count)
+        attempted = np.bincount(pair_problem, minlength=problem_count)
+        solved_count = np.bincount(solved_problem, minlength=problem_count)
+        ratio = pair_best / full_scores[pair_problem] if len(pair_best) else np.zeros(0)
+        ratio_sum = np.bincount(pair_problem, weights=ratio, minlength=problem_count)
+
+        # 二维直方图：题目下标 * 分段数 + 分段
+        attempt_bin = np.digitize(attempts_to_ac, ATTEMPT_BINS) - 1
+        attempt_hist = np.bincount(solved_problem * len(ATTEMPT_BINS) + attempt_bin,
+                                   minlength=problem_count * len(ATTEMPT_BINS)).reshape(problem_count, len(ATTEMPT_BINS))
+        score_bin = np.minimum((ratio * SCORE_BIN_COUNT).astype(np.int64), SCORE_BIN_COUNT - 1)
+        score_hist = np.bincount(pair_problem * SCORE_BIN_COUNT + score_bin,
+                                 minlength=problem_count * SCORE_BIN_COUNT).reshape(problem_count, SCORE_BIN_COUNT)
+
+        # 解题用时按题目切片（solved_problem已按题目排序）
+        solve_bounds = np.searchsorted(solved_problem, np.arange(problem_count + 1))
+
+        problem_stats = []
+        for i, problem in enumerate(problems):
+            attempts = attempts_to_ac[solve_bounds[i]:solve_bounds[i + 1]]
+            difficulty = round(1 - float(ratio_sum[i]) / attempted[i], 3) if attempted[i] else None
+            problem_stats.append({
+                "problem_id": problem["id"],
+                "name": problem["name"],
+                "full_score": problem["full_score"],
+                "submission_count": int(submissions[i]),
+                "accepted_submission_count": int(accepted_submissions[i]),
+                "attempted_students": int(attempted[i]),
+                "solved_students": int(solved_count[i]),
+                "pass_rate": round(float(solved_count[i]) / attempted[i], 3) if attempted[i] else None,
+                "average_attempts_to_ac": round(float(attempts.mean()), 2) if len(attempts) else None,
+                "attempts_to_ac_histogram": dict(zip(ATTEMPT_LABELS, attempt_hist[i].tolist())),
+                "score_histogram": score_hist[i].tolist(),
+                "time_to_solve_seconds": _percentiles(time_to_solve[solve_bounds[i]:solve_bounds[i + 1]]),
+                "difficulty": difficulty,
+                "difficulty_label": _difficulty_label(difficulty),
+            })
+
+        # 练习整体：按学生归约各题最高分和通过题数
+        students, student_index = np.unique(pair_user, return_inverse=True)
+        student_total = np.bincount(student_index, weights=pair_best, minlength=len(students))
+        student_solved = np.bincount(student_index, weights=solved, minlength=len(students))
+        exercise_full = float(full_scores.sum()) if problem_count else 0.0
+        total_bin = (np.minimum((student_total / exercise_full * SCORE_BIN_COUNT).astype(np.int64), SCORE_BIN_COUNT - 1)
+                     if exercise_full else np.zeros(len(students), np.int64))
+
+        return {
+            "problems": problem_stats,
+            "exercise": {
+                "problem_count": problem_count,
+                "full_score": int(exercise_full),
+                "submission_count": int(n),
+                "active_students": int(len(students)),
+                "students_solved_all": int(np.count_nonzero(student_solved == problem_count)) if problem_count else 0,
+                "pass_rate": round(float(solved.sum()) / len(solved), 3) if len(solved) else None,
+                "average_score": round(float(student_total.mean()), 2) if len(students) else None,
+                "median_score": round(float(np.median(student_total)), 2) if len(students) else None,
+                "score_histogram": np.bincount(total_bin, minlength=SCORE_BIN_COUNT).tolist(),
+                "solved_problems_histogram": np.bincount(student_solved.astype(np.int64),
+                                                         minlength=problem_count + 1).tolist(),
+                "average_attempts_to_ac": round(float(attempts_to_ac.mean()), 2) if len(attempts_to_ac) else None,
+                "time_to_solve_seconds": _percentiles(time_to_solve),
+            },
+        }
+
+    @staticmethod
+    def compute(db: Session, exercise_id: int) -> Optional[Dict[str, Any]]:
+        """计算练习的分析结果并写入缓存，练习不存在时返回None"""
+        exercise = db.query(Exercise).filter(Exercise.id == exercise_id).first()
+        if not exercise:
+            return None
+
+        started = time.time()
+        rows = (
+            db.query(Problem.id, Problem.chinese_name, Problem.name, Problem.code_check_score, Problem.runtime_score)
+            .join(exercise_problem, exercise_problem.c.problem_id == Problem.id)
+            .filter(exercise_problem.c.exercise_id == exercise_id)
+            .order_by(Problem.id)
+            .all()
+        )
+        problems = [
+            {"id": problem_id, "name": chinese_name or name, "full_score": (code_check_score or 0) + (runtime_score or 0)}
+            for problem_id, chinese_name, name, code_check_score, runtime_score in rows
+        ]
+        columns = AnalyticsService.load_columns(db, exercise_id, [p["id"] for p in problems])
+        result = AnalyticsService.analyze(columns, problems)
+
+        # 按练习中的题目顺序返回（计算时按题目ID排序以便二分查找）
+        sequence = {
+            problem_id: seq for problem_id, seq in db.query(exercise_problem.c.problem_id, exercise_problem.c.sequence)
+            .filter(exercise_problem.c.exercise_id == exercise_id)
+        }
+        result["problems"].sort(key=lambda p: sequence.get(p["problem_id"], 0))
+
+        result.update({
+            "exercise_id": exercise_id,
+            "exercise_name": exercise.name,
+            "computed_at": datetime.now(),
+            "elapsed": round(time.time() - started, 3),
+        })
+        RedisCache.set(ANALYTICS_CACHE_KEY.format(exercise_id=exercise_id), result, expire=CACHE_EXPIRE)
+        return result
+
+    @staticmethod
+    def get(db: Session, exercise_id: int, refresh: bool = False) -> Optional[Dict[str, Any]]:
+        """读取分析结果，缓存不存在或要求刷新时重新计算"""
+        if not refresh:
+            cached = RedisCache.get(ANALYTICS_CACHE_KEY.format(exercise_id=exercise_id))
+            if isinstance(cached, dict):
+                return cached
+        return AnalyticsService.compute(db, exercise_id)
+
+    @staticmethod
+    def compute_recent(db: Session, days: int = RECENT_DAYS) -> Dict[str, Any]:
+        """重新计算进行中和最近结束的练习（供定时任务调用）"""
+        since = datetime.now(timezone.utc) - timedelta(days=days)
+        exercise_ids = [row[0] for row in db.query(Exercise.id).filter(Exercise.end_time >= since)]
+        failed = []
+        for exercise_id in exercise_ids:
+            try:
+                AnalyticsService.compute(db, exercise_id)
+            except Exception as e:
+                logger.warning(f"计算练习 {exercise_id} 的分析数据失败: {e}")
+                failed.append(exercise_id)
+        return {"exercises": len(exercise_ids), "failed": failed}
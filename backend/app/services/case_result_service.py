@@ -0,0 +1,189 @@
+import hashlib
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session, undefer
+
+from app.models import Submission, SubmissionCaseResult
+from app.utils.compression import compress_text, decompress_text
+
+logger = logging.getLogger(__name__)
+
+# 预览保留的开头和结尾字符数
+PREVIEW_HEAD_CHARS = 2048
+PREVIEW_TAIL_CHARS = 512
+
+# 0表示测试点通过
+CASE_PASSED = 0
+
+_FIELDS = ("input", "expected", "actual")
+
+# 有单独列的字段，其余字段（如远程评测的cpu_time、memory、exit_code、signal、error、output_md5）保存在extra列
+_COLUMN_KEYS = {"test_case", "result", "message", *_FIELDS}
+
+
+def preview(text: str) -> str:
+    """保留开头和结尾，中间用省略说明代替"""
+    if len(text) <= PREVIEW_HEAD_CHARS + PREVIEW_TAIL_CHARS:
+        return text
+    omitted = len(text) - PREVIEW_HEAD_CHARS - PREVIEW_TAIL_CHARS
+    return f"{text[:PREVIEW_HEAD_CHARS]}\n……（省略 {omitted} 个字符）……\n{text[-PREVIEW_TAIL_CHARS:]}"
+
+
+def _test_case_number(value: Any, default: int) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+class CaseResultService:
+    """
+    提交的测试点详情
+
+    评测结束时把运行结果中各测试点的输入、期望输出和实际输出拆到submission_case_results表，
+    提交记录的result列只保留通过情况、得分等摘要；查看提交详情时再合并回result.runtime.details，
+    返回给前端的结构不变
+    """
+
+    @staticmethod
+    def split(submission_id: int, runtime_result: Dict[str, Any]) -> Tuple[Dict[str, Any], List[SubmissionCaseResult]]:
+        """
+        拆分运行结果
+
+        返回 (去掉details的运行结果, 测试点详情行)；details不是测试点列表时（如远程评测的错误信息）原样保留
+        """
+        details = runtime_result.get("details") if runtime_result else None
+        if not isinstance(details, list) or not all(isinstance(case, dict) for case in details):
+            return runtime_result, []
+
+        rows = []
+        for index, case in enumerate(details):
+            row = SubmissionCaseResult(
+                submission_id=submission_id,
+                test_case=_test_case_number(case.get("test_case"), index + 1),
+                result=case.get("result", 3),
+                message=case.get("message"),
+                extra={key: value for key, value in case.items() if key not in _COLUMN_KEYS} or None
+            )
+            for field in _FIELDS:
+                text = case.get(field)
+                if text is None:
+                    continue
+                data = text.encode("utf-8", "replace")
+                setattr(row, f"{field}_preview", preview(text))
+                setattr(row, f"{field}_size", len(data))
+                setattr(row, f"{field}_md5", hashlib.md5(data).hexdigest())
+            # 完整的实际输出只为未通过且被截断的测试点保存
+            actual = case.get("actual")
+            if row.result != CASE_PASSED and actual is not None and row.actual_preview != actual:
+                row.actual_output = compress_text(actual)
+            rows.append(row)
+
+        summary = {key: value for key, value in runtime_result.items() if key != "details"}
+        summary["case_count"] = len(rows)
+        summary["passed_count"] = sum(1 for row in rows if row.result == CASE_PASSED)
+        return summary, rows
+
+    @staticmethod
+    def _to_detail(row: SubmissionCaseResult) -> Dict[str, Any]:
+        detail: Dict[str, Any] = {**(row.extra or {}), "test_case": row.test_case, "result": row.result}
+        if row.message is not None:
+            detail["message"] = row.message
+        for field in _FIELDS:
+            text = getattr(row, f"{field}_preview")
+            if text is None:
+                continue
+            detail[field] = text
+            detail[f"{field}_size"] = getattr(row, f"{field}_size")
+            detail[f"{field}_md5"] = getattr(row, f"{field}_md5")
+            # 预览与完整内容的MD5不同说明内容被截断
+            detail[f"{field}_truncated"] = hashlib.md5(text.encode("utf-8", "replace")).hexdigest() != getattr(row, f"{field}_md5")
+        return detail
+
+    @staticmethod
+    def get_details(db: Session, submission_id: int) -> List[Dict[str, Any]]:
+        """提交的测试点详情（按测试点序号），字段与原result.runtime.details一致"""
+        rows = (
+            db.query(SubmissionCaseResult)
+            .filter(SubmissionCaseResult.submission_id == submission_id)
+            .order_by(SubmissionCaseResult.test_case)
+            .all()
+        )
+        return [CaseResultService._to_detail(row) for row in rows]
+
+    @staticmethod
+    def attach_details(db: Session, result: Optional[Dict[str, Any]], submission_id: int) -> Optional[Dict[str, Any]]:
+        """把测试点详情合并回result.runtime.details（旧数据的details仍保存在result中，不做处理）"""
+        runtime = (result or {}).get("runtime")
+        if not isinstance(runtime, dict) or "details" in runtime:
+            return result
+        details = CaseResultService.get_details(db, submission_id)
+        if not details:
+            return result
+        return {**result, "runtime": {**runtime, "details": details}}
+
+    @staticmethod
+    def forget(db: Session, *criteria) -> None:
+        """
+        即将删除满足条件的提交记录时调用，删除其测试点详情（不提交事务）
+
+        例：CaseResultService.forget(db, Submission.problem_id == problem_id)
+        """
+        submission_ids = select(Submission.id).where(*criteria)
+        (
+            db.query(SubmissionCaseResult)
+            .filter(SubmissionCaseResult.submission_id.in_(submission_ids))
+            .delete(synchronize_session=False)
+        )
+
+    @staticmethod
+    def get_actual_output(db: Session, submission_id: int, test_case: int) -> Optional[str]:
+        """测试点的完整实际输出：未通过的测试点从压缩数据解压，其余返回保存的内容"""
+        row = (
+            db.query(SubmissionCaseResult)
+            .filter(SubmissionCaseResult.submission_id == submission_id,
+                    SubmissionCaseResult.test_case == test_case)
+            .first()
+        )
+        if row is None:
+            return None
+        if row.actual_output is not None:
+            try:
+                return decompress_text(row.actual_output)
+            except Exception as e:
+                logger.warning(f"解压实际输出失败 submission={submission_id} case={test_case}: {e}")
+        return row.actual_preview
+
+    @staticmethod
+    def migrate_inline(db: Session, batch_size: int = 200) -> Dict[str, int]:
+        """把旧提交result中内嵌的测试点详情迁移到submission_case_results表，每批一个事务"""
+        stats = {"submissions": 0, "cases": 0}
+        last_id = 0
+        while True:
+            submissions = (
+                db.query(Submission)
+                .options(undefer(Submission.result))
+                .filter(
+                    Submission.id > last_id,
+                    func.jsonb_typeof(Submission.result["runtime"]["details"]) == "array"
+                )
+                .order_by(Submission.id)
+                .limit(batch_size)
+                .all()
+            )
+            if not submissions:
+                break
+            for submission in submissions:
+                runtime, rows = CaseResultService.split(submission.id, submission.result["runtime"])
+                db.query(SubmissionCaseResult).filter(SubmissionCaseResult.submission_id == submission.id).delete()
+                db.add_all(rows)
+                submission.result = {**submission.result, "runtime": runtime}
+                stats["submissions"] += 1
+                stats["cases"] += len(rows)
+            last_id = submissions[-1].id
+            db.commit()
+            db.expunge_all()
+            logger.info(f"已迁移 {stats['submissions']} 条提交的测试点详情")
+        return stats
@@ -116,6 +116,10 @@ class ClassService:
         db.delete(class_item)
         db.commit()
         
+        # 班级关系变化后排行榜需要重建
+        from app.services.leaderboard_service import LeaderboardService
+        LeaderboardService.bump_membership_version()
+        
         return True
     
     @staticmethod
@@ -0,0 +1,116 @@
+import hashlib
+import logging
+from typing import Dict
+
+from sqlalchemy import and_, exists, func, select, text, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.models import CodeBlob, Submission
+from app.utils.compression import compress
+
+logger = logging.getLogger(__name__)
+
+
+class CodeBlobService:
+    """
+    提交源代码的去重存储
+
+    代码按SHA-256保存在code_blobs表中，提交记录只保存哈希。ref_count随提交的新增、删除增减，
+    引用数为0的代码由collect_garbage()删除；计数出现偏差时可用recount()按提交记录重新统计。
+    """
+
+    @staticmethod
+    def store(db: Session, code: str) -> str:
+        """
+        保存代码并增加引用计数，返回代码的哈希（不提交事务，由调用方与提交记录一起提交）
+
+        使用INSERT ... ON CONFLICT，并发提交相同代码时计数不会丢失
+        """
+        data = code.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        stmt = insert(CodeBlob).values(hash=digest, data=compress(data), size=len(data), ref_count=1)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[CodeBlob.hash],
+            set_={"ref_count": CodeBlob.__table__.c.ref_count + 1},
+        )
+        db.execute(stmt)
+        return digest
+
+    @staticmethod
+    def release(db: Session, *criteria) -> None:
+        """
+        即将删除满足条件的提交记录时调用，减少其代码的引用计数（不提交事务）
+
+        例：CodeBlobService.release(db, Submission.problem_id == problem_id)
+        """
+        refs = (
+            select(Submission.code_hash, func.count().label("refs"))
+            .where(Submission.code_hash.isnot(None), *criteria)
+            .group_by(Submission.code_hash)
+            .subquery()
+        )
+        db.execute(
+            update(CodeBlob)
+            .where(CodeBlob.hash == refs.c.code_hash)
+            .values(ref_count=CodeBlob.ref_count - refs.c.refs)
+            .execution_options(synchronize_session=False)
+        )
+
+    @staticmethod
+    def collect_garbage(db: Session) -> int:
+        """删除不再被引用的代码，返回删除的行数"""
+        referenced = exists().where(Submission.code_hash == CodeBlob.hash)
+        result = db.execute(
+            CodeBlob.__table__.delete().where(and_(CodeBlob.ref_count <= 0, ~referenced))
+        )
+        db.commit()
+        return result.rowcount
+
+    @staticmethod
+    def recount(db: Session) -> None:
+        """按提交记录重新统计全部引用计数"""
+        db.execute(text(
+            "UPDATE code_blobs b SET ref_count = "
+            "(SELECT count(*) FROM submissions s WHERE s.code_hash = b.hash)"
+        ))
+        db.commit()
+
+    @staticmethod
+    def migrate(db: Session, batch_size: int = 500) -> Dict[str, int]:
+        """
+        把submissions.code中的旧代码移入code_blobs，每批一个事务，可中断后重复执行
+
+        迁移后submissions.code置为NULL，空间要等VACUUM（FULL）后才会归还
+        """
+        stats = {"submissions": 0, "bytes": 0}
+        last_id = 0
+        while True:
+            rows = db.execute(
+                select(Submission.id, Submission.legacy_code)
+                .where(Submission.id > last_id,
+                       Submission.code_hash.is_(None),
+                       Submission.legacy_code.isnot(None))
+                .order_by(Submission.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            for submission_id, code in rows:
+                digest = CodeBlobService.store(db, code)
+                db.execute(
+                    update(Submission)
+                    .where(Submission.id == submission_id)
+                    .values({Submission.code_hash: digest, Submission.legacy_code: None})
+                    .execution_options(synchronize_session=False)
+                )
+                stats["submissions"] += 1
+                stats["bytes"] += len(code.encode("utf-8"))
+            last_id = rows[-1][0]
+            db.commit()
+            logger.info(f"已迁移 {stats['submissions']} 条提交的代码")
+
+        blobs, stored = db.query(func.count(CodeBlob.hash), func.coalesce(func.sum(func.length(CodeBlob.data)), 0)).one()
+        stats["blobs"] = blobs
+        stats["stored_bytes"] = int(stored)
+        return stats
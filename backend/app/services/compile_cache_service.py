@@ -0,0 +1,166 @@
+import os
+import hashlib
+import tempfile
+import threading
+import subprocess
+import logging
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+# 编译产物缓存目录（backend容器中挂载到宿主机的data目录）
+COMPILE_CACHE_DIR = os.getenv("COMPILE_CACHE_DIR", "/app/data/compile_cache")
+
+# 磁盘上最多保留的可执行文件数量
+MAX_BINARIES = 2000
+
+# 内存中缓存的编译错误数量
+MAX_ERRORS = 512
+
+# 编译超时（秒）
+COMPILE_TIMEOUT = 10
+
+# 默认编译参数（与评测机的编译命令一致）
+DEFAULT_FLAGS = ["-O2", "-std=c99", "-lm"]
+
+
+class CompileCache:
+    """
+    C代码编译缓存
+
+    以"编译参数 + 源代码"的SHA-256作为键，把可执行文件保存在COMPILE_CACHE_DIR中。
+    相同代码重复提交、参考答案多次运行时直接复用已编译的二进制文件；
+    编译失败的结果在内存中缓存，避免重复调用gcc。
+    """
+
+    def __init__(self, cache_dir: str = COMPILE_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self._lock = threading.Lock()
+        self._key_locks: Dict[str, threading.Lock] = {}
+        self._errors: "OrderedDict[str, str]" = OrderedDict()
+        self._compiles_since_prune = 0
+
+    @staticmethod
+    def cache_key(source: Union[str, bytes], flags: List[str]) -> str:
+        digest = hashlib.sha256()
+        digest.update(" ".join(flags).encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(source.encode("utf-8") if isinstance(source, str) else source)
+        return digest.hexdigest()
+
+    def _key_lock(self, key: str) -> threading.Lock:
+        with self._lock:
+            lock = self._key_locks.get(key)
+            if lock is None:
+                lock = self._key_locks[key] = threading.Lock()
+            return lock
+
+    @staticmethod
+    def _touch(exe_path: str) -> bool:
+        """命中缓存时更新修改时间（用于按最近使用时间清理）"""
+        try:
+            os.utime(exe_path)
+            return True
+        except OSError:
+            return False
+
+    def compile(self, source: Union[str, bytes], flags: Optional[List[str]] = None) -> Tuple[Optional[str], str]:
+        """
+        编译C代码；源代码为bytes时按原样写入（保留题库文件中字符串常量的原始编码）
+
+        Returns:
+            (可执行文件路径, 编译器输出)；编译失败时路径为None
+        """
+        flags = list(DEFAULT_FLAGS if flags is None else flags)
+        key = self.cache_key(source, flags)
+        exe_path = os.path.join(self.cache_dir, key[:2], key)
+
+        if self._touch(exe_path):
+            return exe_path, ""
+        with self._lock:
+            if key in self._errors:
+                self._errors.move_to_end(key)
+                return None, self._errors[key]
+
+        # 同一份代码同时只编译一次
+        try:
+            with self._key_lock(key):
+                if os.path.exists(exe_path):
+                    return exe_path, ""
+                with self._lock:
+                    if key in self._errors:
+                        return None, self._errors[key]
+
+                os.makedirs(os.path.dirname(exe_path), exist_ok=True)
+                with tempfile.TemporaryDirectory() as temp_dir:
+                    source_file = os.path.join(temp_dir, "main.c")
+                    temp_exe = os.path.join(temp_dir, "main")
+                    with open(source_file, "wb") as f:
+                        f.write(source.encode("utf-8") if isinstance(source, str) else source)
+
+                    # 链接参数需要放在源文件之后
+                    link_flags = [flag for flag in flags if flag.startswith("-l")]
+                    compile_flags = [flag for flag in flags if not flag.startswith("-l")]
+                    try:
+                        process = subprocess.run(
+                            ["gcc", *compile_flags, "-o", temp_exe, source_file, *link_flags],
+                            capture_output=True, text=True, timeout=COMPILE_TIMEOUT
+                        )
+                    except subprocess.TimeoutExpired:
+                        return None, "编译超时"
+
+                    if process.returncode != 0:
+                        with self._lock:
+                            self._errors[key] = process.stderr
+                            while len(self._errors) > MAX_ERRORS:
+                                self._errors.popitem(last=False)
+                        return None, process.stderr
+
+                    # 先写到临时文件再原子替换，避免其他进程读到不完整的文件
+                    staged = f"{exe_path}.{os.getpid()}.tmp"
+                    with open(temp_exe, "rb") as src, open(staged, "wb") as dst:
+                        dst.write(src.read())
+                    os.chmod(staged, 0o755)
+                    os.replace(staged, exe_path)
+        finally:
+            # 无论编译成功、失败还是已被其他线程编译，都移除该代码的锁
+            with self._lock:
+                self._key_locks.pop(key, None)
+
+        with self._lock:
+            self._compiles_since_prune += 1
+            should_prune = self._compiles_since_prune >= 100
+            if should_prune:
+                self._compiles_since_prune = 0
+        if should_prune:
+            self.prune()
+        return exe_path, process.stderr
+
+    def prune(self) -> int:
+        """删除最久未使用的可执行文件，使缓存数量不超过MAX_BINARIES"""
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    entries.append((os.stat(path).st_mtime, path))
+                except OSError:
+                    continue
+        if len(entries) <= MAX_BINARIES:
+            return 0
+
+        entries.sort()
+        removed = 0
+        for _, path in entries[:len(entries) - MAX_BINARIES]:
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError:
+                pass
+        logger.info(f"编译缓存清理完成: 删除 {removed} 个文件")
+        return removed
+
+
+# 进程内单例
+compile_cache = CompileCache()
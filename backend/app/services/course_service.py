@@ -107,6 +107,11 @@ class CourseService:
         db.commit()
         db.refresh(course)
         
+        # 班级关系变化后排行榜需要重建
+        if 'class_ids' in update_data and update_data['class_ids'] is not None:
+            from app.services.leaderboard_service import LeaderboardService
+            LeaderboardService.bump_membership_version()
+        
         return course
     
     @staticmethod
@@ -0,0 +1,254 @@
+import os
+import re
+import json
+import codecs
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 每个题目目录下的编码清单文件
+MANIFEST_NAME = ".encoding.json"
+MANIFEST_VERSION = 1
+
+# 转码后的UTF-8副本所在子目录
+UTF8_DIR = ".utf8"
+
+# 需要检测编码的题目文件
+_BANK_FILE_RE = re.compile(r"^(Question\.INF|.+\.html?|\d+\.in|\d+\.out)$", re.IGNORECASE)
+
+# 判定GB18030解码结果是否可信时认为"正常"的字符
+_COMMON_CHAR_RE = re.compile(r"[\x00-\x7f　-〿一-鿿＀-￯‐-⁯·×÷]")
+
+_BOMS = [
+    (codecs.BOM_UTF8, "utf-8"),
+    (codecs.BOM_UTF16_LE, "utf-16-le"),
+    (codecs.BOM_UTF16_BE, "utf-16-be"),
+]
+
+
+def detect_encoding(raw_data: bytes) -> Tuple[str, int, bool, str]:
+    """
+    检测文件编码
+
+    Returns:
+        (编码, BOM长度, 是否存在歧义, 判定依据)
+    """
+    for bom, encoding in _BOMS:
+        if raw_data.startswith(bom):
+            return encoding, len(bom), False, "bom"
+
+    if not raw_data:
+        return "utf-8", 0, False, "empty"
+
+    # 没有BOM的UTF-16：大量NUL字节集中在奇数或偶数位置
+    nul_count = raw_data.count(b"\x00")
+    if nul_count > len(raw_data) // 4:
+        odd_nuls = raw_data[1::2].count(b"\x00")
+        encoding = "utf-16-le" if odd_nuls >= nul_count / 2 else "utf-16-be"
+        return encoding, 0, True, "nul-pattern"
+
+    try:
+        raw_data.decode("ascii")
+        return "utf-8", 0, False, "ascii"
+    except UnicodeDecodeError:
+        pass
+
+    non_ascii = sum(1 for b in raw_data if b > 0x7f)
+
+    try:
+        raw_data.decode("utf-8")
+        # 非ASCII字节很少时，GBK文本也可能恰好是合法的UTF-8
+        ambiguous = non_ascii < 6 and _decodes(raw_data, "gb18030")
+        return "utf-8", 0, ambiguous, "utf-8-strict"
+    except UnicodeDecodeError:
+        pass
+
+    try:
+        text = raw_data.decode("gb18030")
+        non_ascii_text = [c for c in text if ord(c) > 0x7f]
+        common = sum(1 for c in non_ascii_text if _COMMON_CHAR_RE.match(c))
+        # 大量生僻字通常说明实际是其他编码（如Big5）
+        ambiguous = bool(non_ascii_text) and common / len(non_ascii_text) < 0.9
+        return "gb18030", 0, ambiguous, "gb18030-strict"
+    except UnicodeDecodeError:
+        pass
+
+    return "latin1", 0, True, "fallback"
+
+
+def _decodes(raw_data: bytes, encoding: str) -> bool:
+    try:
+        raw_data.decode(encoding)
+        return True
+    except UnicodeDecodeError:
+        return False
+
+
+class BankEncodingService:
+    """
+    题库编码规范化
+
+    离线检测题库中每个Question.INF、题面HTML、.in和.out文件的编码，写入题目目录下的
+    编码清单（可选生成UTF-8副本）。评测和接口读取文件时直接按清单解码，无需逐个尝试编码。
+    """
+
+    _manifest_cache: Dict[str, Tuple[int, Dict]] = {}
+    _lock = threading.Lock()
+
+    # ---------- 离线规范化 ----------
+
+    @staticmethod
+    def normalize_problem(problem_dir: str, transcode: bool = False) -> Dict:
+        """检测单个题目目录下所有文件的编码并写入编码清单"""
+        files = {}
+        ambiguous = []
+
+        for name in sorted(os.listdir(problem_dir)):
+            path = os.path.join(problem_dir, name)
+            if not _BANK_FILE_RE.match(name) or not os.path.isfile(path):
+                continue
+
+            with open(path, "rb") as f:
+                stat = os.fstat(f.fileno())
+                raw_data = f.read()
+
+            encoding, bom, is_ambiguous, reason = detect_encoding(raw_data)
+            entry = {
+                "encoding": encoding,
+                "bom": bom,
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+                "ambiguous": is_ambiguous,
+                "reason": reason,
+                "utf8_copy": None,
+            }
+
+            if transcode and (encoding != "utf-8" or bom):
+                utf8_dir = os.path.join(problem_dir, UTF8_DIR)
+                os.makedirs(utf8_dir, exist_ok=True)
+                text = raw_data[bom:].decode(encoding, errors="replace")
+                with open(os.path.join(utf8_dir, name), "w", encoding="utf-8", newline="") as f:
+                    f.write(text)
+                entry["utf8_copy"] = os.path.join(UTF8_DIR, name)
+
+            files[name] = entry
+            if is_ambiguous:
+                ambiguous.append({"path": path, "encoding": encoding, "reason": reason})
+
+        manifest = {"version": MANIFEST_VERSION, "files": files}
+        manifest_path = os.path.join(problem_dir, MANIFEST_NAME)
+        tmp_path = manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, manifest_path)
+
+        return {"files": len(files), "ambiguous": ambiguous}
+
+    @staticmethod
+    def find_problem_dirs(root: str) -> List[str]:
+        """查找题库中所有包含Question.INF的题目目录"""
+        problem_dirs = []
+        for current, dirs, files in os.walk(root):
+            dirs[:] = [d for d in dirs if not d.startswith(".")]
+            if "Question.INF" in files:
+                problem_dirs.append(current)
+        return problem_dirs
+
+    @staticmethod
+    def normalize_bank(root: str, transcode: bool = False, workers: int = 8) -> Dict:
+        """规范化整个题库，返回统计信息和存在歧义的文件列表"""
+        problem_dirs = BankEncodingService.find_problem_dirs(root)
+        report = {"problems": 0, "files": 0, "ambiguous": [], "errors": []}
+
+        def run(problem_dir):
+            try:
+                return problem_dir, BankEncodingService.normalize_problem(problem_dir, transcode), None
+            except Exception as e:
+                return problem_dir, None, str(e)
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for problem_dir, result, error in executor.map(run, problem_dirs):
+                if error:
+                    report["errors"].append({"path": problem_dir, "error": error})
+                    continue
+                report["problems"] += 1
+                report["files"] += result["files"]
+                report["ambiguous"].extend(result["ambiguous"])
+
+        return report
+
+    # ---------- 读取 ----------
+
+    @staticmethod
+    def _load_manifest(problem_dir: str) -> Optional[Dict]:
+        manifest_path = os.path.join(problem_dir, MANIFEST_NAME)
+        try:
+            mtime_ns = os.stat(manifest_path).st_mtime_ns
+        except OSError:
+            return None
+
+        cached = BankEncodingService._manifest_cache.get(problem_dir)
+        if cached and cached[0] == mtime_ns:
+            return cached[1]
+
+        try:
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except Exception as e:
+            logger.warning(f"读取编码清单失败 {manifest_path}: {e}")
+            return None
+        if manifest.get("version") != MANIFEST_VERSION:
+            return None
+
+        files = manifest.get("files", {})
+        with BankEncodingService._lock:
+            BankEncodingService._manifest_cache[problem_dir] = (mtime_ns, files)
+        return files
+
+    @staticmethod
+    def lookup(path: str) -> Optional[Dict]:
+        """查询文件在编码清单中的记录"""
+        files = BankEncodingService._load_manifest(os.path.dirname(path))
+        if not files:
+            return None
+        return files.get(os.path.basename(path))
+
+    @staticmethod
+    def decode_known(path: str, raw_data: bytes, stat: os.stat_result) -> Optional[str]:
+        """
+        按编码清单解码已读取的文件内容
+
+        文件在生成清单后发生过变化、或不在清单中时返回None，由调用方自行检测编码。
+        """
+        entry = BankEncodingService.lookup(path)
+        if not entry or entry["size"] != stat.st_size or entry["mtime_ns"] != stat.st_mtime_ns:
+            return None
+        return raw_data[entry["bom"]:].decode(entry["encoding"], errors="replace")
+
+    @staticmethod
+    def read_text(path: str) -> Optional[str]:
+        """按编码清单读取文本文件，优先使用UTF-8副本；无可用清单时返回None"""
+        entry = BankEncodingService.lookup(path)
+        if not entry:
+            return None
+
+        try:
+            with open(path, "rb") as f:
+                stat = os.fstat(f.fileno())
+                if entry["size"] != stat.st_size or entry["mtime_ns"] != stat.st_mtime_ns:
+                    return None
+                if entry.get("utf8_copy"):
+                    utf8_path = os.path.join(os.path.dirname(path), entry["utf8_copy"])
+                    try:
+                        with open(utf8_path, "r", encoding="utf-8", newline="") as utf8_file:
+                            return utf8_file.read()
+                    except OSError:
+                        pass
+                raw_data = f.read()
+        except OSError:
+            return None
+
+        return raw_data[entry["bom"]:].decode(entry["encoding"], errors="replace")
@@ -0,0 +1,108 @@
+import json
+import asyncio
+import logging
+from typing import Any, Dict, Optional, Set
+
+from app.utils.redis_client import redis_client, REDIS_URL, DateTimeEncoder
+
+logger = logging.getLogger(__name__)
+
+# 推送频道：用户频道接收自己提交的评测结果，练习频道接收该练习的成绩变化
+USER_CHANNEL = "events:user:{user_id}"
+EXERCISE_CHANNEL = "events:exercise:{exercise_id}"
+CHANNEL_PATTERN = "events:*"
+
+# 每个连接的待发送事件上限，客户端处理不过来时丢弃最旧的事件
+QUEUE_SIZE = 100
+
+
+def publish(channel: str, event: Dict[str, Any]) -> None:
+    """发布事件（同步调用，Redis不可用时只记录日志）"""
+    try:
+        redis_client.publish(channel, json.dumps(event, ensure_ascii=False, cls=DateTimeEncoder))
+    except Exception as e:
+        logger.warning(f"发布事件失败 {channel}: {e}")
+
+
+def publish_verdict(submission, exercise_event: Optional[Dict[str, Any]] = None) -> None:
+    """评测结束后推送：提交者收到评测结果，练习订阅者收到成绩变化"""
+    publish(USER_CHANNEL.format(user_id=submission.user_id), {
+        "type": "verdict",
+        "submission_id": submission.id,
+        "problem_id": submission.problem_id,
+        "exercise_id": submission.exercise_id,
+        "status": submission.status,
+        "code_check_score": submission.code_check_score,
+        "runtime_score": submission.runtime_score,
+        "total_score": submission.total_score,
+        "submitted_at": submission.submitted_at,
+    })
+    if submission.exercise_id and exercise_event:
+        publish(EXERCISE_CHANNEL.format(exercise_id=submission.exercise_id), {"type": "score", **exercise_event})
+
+
+class EventBroker:
+    """
+    进程内的事件分发
+
+    每个uvicorn worker只维护一个Redis订阅连接（按模式订阅全部事件频道），
+    收到消息后分发给本进程内订阅了该频道的连接队列；多个worker通过Redis pub/sub共享事件。
+    """
+
+    def __init__(self):
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def subscribe(self, *channels: str) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        for channel in channels:
+            self._subscribers.setdefault(channel, set()).add(queue)
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._listen())
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue, *channels: str) -> None:
+        for channel in channels:
+            queues = self._subscribers.get(channel)
+            if queues is not None:
+                queues.discard(queue)
+                if not queues:
+                    del self._subscribers[channel]
+
+    def _dispatch(self, channel: str, data: str) -> None:
+        for queue in list(self._subscribers.get(channel, ())):
+            if queue.full():
+                try:
+                    queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    pass
+            queue.put_nowait(data)
+
+    async def _listen(self) -> None:
+        """订阅Redis并分发消息，连接断开后自动重连；没有订阅者时退出"""
+        import redis.asyncio as aioredis
+
+        while self._subscribers:
+            client = aioredis.from_url(REDIS_URL, decode_responses=True)
+            pubsub = client.pubsub()
+            try:
+                await pubsub.psubscribe(CHANNEL_PATTERN)
+                while self._subscribers:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                    if message and message.get("type") == "pmessage":
+                        self._dispatch(message["channel"], message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"事件订阅连接异常，稍后重连: {e}")
+                await asyncio.sleep(1)
+            finally:
+                try:
+                    await pubsub.close()
+                    await client.close()
+                except Exception:
+                    pass
+
+
+# 进程内单例
+event_broker = EventBroker()
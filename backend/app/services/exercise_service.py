@@ -3,8 +3,10 @@ from datetime import datetime
 from sqlalchemy.orm import Session
 import re
 
-from app.models import User, Exercise, Course, Problem, OperationLog, Class, Submission
+from app.models import User, Exercise, Course, Problem, OperationLog, Class, Submission, SubmissionSummary
 from app.models.exercise import exercise_problem
+from app.models.class_model import student_class
+from app.services.problem_resolver_service import problem_path_resolver
 
 class ExerciseService:
     """练习服务类"""
@@ -195,6 +197,88 @@ class ExerciseService:
             db.rollback()
             return False
     
+    @staticmethod
+    def get_score_matrix(db: Session, exercise_id: int, problem_ids: List[int],
+                         user_ids: Optional[List[int]] = None) -> Dict[int, Dict[int, Dict[str, Any]]]:
+        """
+        练习的成绩矩阵：{用户ID: {题目ID: {"score", "submission_id", "status"}}}
+
+        一条查询读取提交汇总表（汇总表中已按最高分选出每个用户每道题的最佳提交），
+        只返回练习当前包含的题目
+        """
+        if not problem_ids:
+            return {}
+        query = db.query(
+            SubmissionSummary.user_id,
+            SubmissionSummary.problem_id,
+            SubmissionSummary.best_score,
+            SubmissionSummary.best_submission_id,
+            SubmissionSummary.best_status,
+        ).filter(
+            SubmissionSummary.exercise_id == exercise_id,
+            SubmissionSummary.problem_id.in_(problem_ids)
+        )
+        if user_ids is not None:
+            if not user_ids:
+                return {}
+            query = query.filter(SubmissionSummary.user_id.in_(user_ids))
+
+        matrix: Dict[int, Dict[int, Dict[str, Any]]] = {}
+        for user_id, problem_id, score, submission_id, status in query:
+            matrix.setdefault(user_id, {})[problem_id] = {
+                "score": score,
+                "submission_id": submission_id,
+                "status": status
+            }
+        return matrix
+
+    @staticmethod
+    def fill_problem_scores(stats: Dict[str, Any], problem_ids: List[int], scores: Dict[int, Dict[str, Any]]) -> Dict[str, Any]:
+        """按练习题目顺序填入成绩，未提交的题目记为"未提交"，并累加总分"""
+        for problem_id in problem_ids:
+            entry = scores.get(problem_id)
+            if entry:
+                stats["problem_scores"][problem_id] = entry
+                stats["total_score"] += entry["score"] or 0
+            else:
+                stats["problem_scores"][problem_id] = {
+                    "score": None,
+                    "submission_id": None,
+                    "status": "未提交"
+                }
+        return stats
+
+    @staticmethod
+    def get_class_students(db: Session, class_ids: List[int]) -> List[User]:
+        """多个班级的学生（去重），一条查询"""
+        if not class_ids:
+            return []
+        return (
+            db.query(User)
+            .filter(
+                User.role == "student",
+                User.id.in_(db.query(student_class.c.student_id).filter(student_class.c.class_id.in_(class_ids)))
+            )
+            .order_by(User.id)
+            .all()
+        )
+
+    @staticmethod
+    def get_student_class_names(db: Session, student_ids: List[int]) -> Dict[int, List[str]]:
+        """批量查询学生所在的全部班级名称，避免逐个学生加载classes关系"""
+        if not student_ids:
+            return {}
+        class_names: Dict[int, List[str]] = {}
+        rows = (
+            db.query(student_class.c.student_id, Class.name)
+            .join(Class, Class.id == student_class.c.class_id)
+            .filter(student_class.c.student_id.in_(student_ids))
+            .order_by(student_class.c.student_id, Class.id)
+        )
+        for student_id, class_name in rows:
+            class_names.setdefault(student_id, []).append(class_name)
+        return class_names
+
     @staticmethod
     def check_student_permission(db: Session, user_id: int, exercise_id: int) -> bool:
         """检查学生是否有权限查看练习"""
@@ -286,9 +370,7 @@ class ExerciseService:
                     memory_limit = int(memory_match.group(1))
                 
                 # 检查题目是否已存在
-                existing_problem = db.query(Problem).filter(
-                    Problem.data_path == data_path
-                ).first()
+                existing_problem = problem_path_resolver.resolve(db, data_path)
                 
                 if existing_problem:
                     # 题目已存在，检查是否已添加到练习中
@@ -361,6 +443,10 @@ class ExerciseService:
         
         db.commit()
         
+        # 练习总分只统计当前包含的题目，排行榜需要重建
+        from app.services.leaderboard_service import LeaderboardService
+        LeaderboardService.invalidate(exercise_id)
+        
         # 记录操作日志
         if problems_added:
             ExerciseService.log_operation(db, user_id, "添加题目", f"向练习 {exercise.name} 添加了 {len(problems_added)} 道题目")
@@ -448,6 +534,10 @@ class ExerciseService:
         
         db.commit()
         
+        # 练习总分只统计当前包含的题目，排行榜需要重建
+        from app.services.leaderboard_service import LeaderboardService
+        LeaderboardService.invalidate(exercise_id)
+        
         # 记录操作日志
         problem_name = problem.name if problem else f"ID为{problem_id}的题目"
         ExerciseService.log_operation(db, user_id, "移除题目", f"从练习 {exercise.name} 中移除题目 {problem_name}")
@@ -473,6 +563,10 @@ class ExerciseService:
         
         db.commit()
         
+        # 练习总分只统计当前包含的题目，排行榜需要重建
+        from app.services.leaderboard_service import LeaderboardService
+        LeaderboardService.invalidate(exercise_id)
+        
         # 记录操作日志
         ExerciseService.log_operation(db, user_id, "清空题目", f"清空练习 {exercise.name} 中的所有题目")
         
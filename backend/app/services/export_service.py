@@ -0,0 +1,282 @@
+import io
+import csv
+import logging
+import tempfile
+from datetime import datetime
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Sequence, Tuple
+from urllib.parse import quote
+
+from sqlalchemy import case, func, select
+from sqlalchemy.orm import Session
+
+from app.models import Class, Exercise, Problem, SubmissionSummary, User
+from app.models.database import SessionLocal
+from app.models.exercise import exercise_problem
+from app.models.class_model import student_class
+
+try:
+    import openpyxl
+except ImportError:  # openpyxl为可选依赖，缺失时只提供CSV导出
+    openpyxl = None
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = ("csv", "xlsx")
+
+# 服务端游标每次取回的行数
+YIELD_PER = 500
+
+# CSV每积累多少行输出一次
+CSV_FLUSH_ROWS = 200
+
+# XLSX临时文件的读取块大小
+FILE_CHUNK_SIZE = 64 * 1024
+
+RowsFactory = Callable[[Session], Iterable[Sequence[Any]]]
+
+
+def _cell(value: Any) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    return value
+
+
+def _stream(query):
+    """使用服务端游标逐批读取，内存占用与结果行数无关"""
+    return query.execution_options(stream_results=True).yield_per(YIELD_PER)
+
+
+def _class_names_column():
+    """学生所在全部班级的名称（关联子查询，随学生行一起返回）"""
+    return (
+        select(func.string_agg(Class.name, ", "))
+        .select_from(student_class.join(Class, Class.id == student_class.c.class_id))
+        .where(student_class.c.student_id == User.id)
+        .correlate(User)
+        .scalar_subquery()
+    )
+
+
+def _students_in(class_ids: Optional[List[int]]):
+    """班级中学生ID的子查询，class_ids为None时不限制班级"""
+    if class_ids is None:
+        return None
+    return select(student_class.c.student_id).where(student_class.c.class_id.in_(class_ids))
+
+
+class ExportService:
+    """
+    成绩数据的流式导出
+
+    每种导出给出表头和一个按行产生数据的查询：行的拼装（按题目/练习展开成列、
+    求总分和名次）在数据库中完成，结果通过服务端游标分批读取并逐块写出，
+    导出大班级时不会在内存中构造完整的统计结果。
+    """
+
+    # ---------- 查询 ----------
+
+    @staticmethod
+    def exercise_statistics(exercise_id: int, problem_ids: List[int], class_ids: List[int]) -> RowsFactory:
+        """练习答题统计：每名学生一行，每道题一列（最高分），按总分排名"""
+        def rows(db: Session):
+            score_columns = [
+                func.max(case((SubmissionSummary.problem_id == problem_id, SubmissionSummary.best_score)))
+                .label(f"p{problem_id}")
+                for problem_id in problem_ids
+            ]
+            scores = (
+                db.query(SubmissionSummary.user_id.label("user_id"),
+                         func.sum(SubmissionSummary.best_score).label("total"),
+                         *score_columns)
+                .filter(
+                    SubmissionSummary.exercise_id == exercise_id,
+                    SubmissionSummary.problem_id.in_(problem_ids),
+                    SubmissionSummary.user_id.in_(_students_in(class_ids))
+                )
+                .group_by(SubmissionSummary.user_id)
+                .subquery()
+            )
+            total = func.coalesce(scores.c.total, 0)
+            query = (
+                db.query(
+                    func.rank().over(order_by=total.desc()),
+                    User.username, User.real_name, _class_names_column(),
+                    *[scores.c[f"p{problem_id}"] for problem_id in problem_ids],
+                    total,
+                )
+                .outerjoin(scores, scores.c.user_id == User.id)
+                .filter(User.role == "student", User.id.in_(_students_in(class_ids)))
+                .order_by(total.desc(), User.username)
+            )
+            return _stream(query)
+        return rows
+
+    @staticmethod
+    def problem_ranking(exercise_id: int, problem_id: int, class_ids: Optional[List[int]]) -> RowsFactory:
+        """题目排名：按最新一次提交的成绩排序，同分时提交早者在前（与排行榜一致）"""
+        def rows(db: Session):
+            order = (SubmissionSummary.latest_score.desc(), SubmissionSummary.last_submitted_at)
+            query = (
+                db.query(
+                    func.row_number().over(order_by=order),
+                    User.username, User.real_name, _class_names_column(),
+                    SubmissionSummary.latest_score,
+                    SubmissionSummary.latest_status,
+                    SubmissionSummary.last_submitted_at,
+                )
+                .join(User, User.id == SubmissionSummary.user_id)
+                .filter(
+                    SubmissionSummary.exercise_id == exercise_id,
+                    SubmissionSummary.problem_id == problem_id,
+                    User.role == "student"
+                )
+                .order_by(*order)
+            )
+            students = _students_in(class_ids)
+            if students is not None:
+                query = query.filter(User.id.in_(students))
+            return _stream(query)
+        return rows
+
+    @staticmethod
+    def course_gradebook(exercise_ids: List[int], class_ids: List[int]) -> RowsFactory:
+        """课程成绩册：每名学生一行，每个练习一列（练习当前各题最高分之和）"""
+        def rows(db: Session):
+            exercise_columns = [
+                func.sum(case((SubmissionSummary.exercise_id == exercise_id, SubmissionSummary.best_score)))
+                .label(f"e{exercise_id}")
+                for exercise_id in exercise_ids
+            ]
+            scores = (
+                db.query(SubmissionSummary.user_id.label("user_id"),
+                         func.sum(SubmissionSummary.best_score).label("total"),
+                         *exercise_columns)
+                .join(exercise_problem, (exercise_problem.c.exercise_id == SubmissionSummary.exercise_id)
+                      & (exercise_problem.c.problem_id == SubmissionSummary.problem_id))
+                .filter(
+                    SubmissionSummary.exercise_id.in_(exercise_ids),
+                    SubmissionSummary.user_id.in_(_students_in(class_ids))
+                )
+                .group_by(SubmissionSummary.user_id)
+                .subquery()
+            )
+            total = func.coalesce(scores.c.total, 0)
+            query = (
+                db.query(
+                    func.rank().over(order_by=total.desc()),
+                    User.username, User.real_name, _class_names_column(),
+                    *[func.coalesce(scores.c[f"e{exercise_id}"], 0) for exercise_id in exercise_ids],
+                    total,
+                )
+                .outerjoin(scores, scores.c.user_id == User.id)
+                .filter(User.role == "student", User.id.in_(_students_in(class_ids)))
+                .order_by(total.desc(), User.username)
+            )
+            return _stream(query)
+        return rows
+
+    @staticmethod
+    def exercise_statistics_header(db: Session, exercise: Exercise) -> Tuple[List[str], List[int]]:
+        """练习统计的表头和题目ID（按练习中的题目顺序）"""
+        problems = (
+            db.query(Problem.id, Problem.name, Problem.chinese_name)
+            .join(exercise_problem, exercise_problem.c.problem_id == Problem.id)
+            .filter(exercise_problem.c.exercise_id == exercise.id)
+            .order_by(exercise_problem.c.sequence)
+            .all()
+        )
+        header = ["名次", "学号", "姓名", "班级"] + [chinese_name or name for _, name, chinese_name in problems] + ["总分"]
+        return header, [problem_id for problem_id, _, _ in problems]
+
+    # ---------- 输出 ----------
+
+    @staticmethod
+    def _iter_rows(rows: RowsFactory) -> Iterator[Sequence[Any]]:
+        """
+        在独立的数据库会话中逐行读取
+
+        流式响应在请求处理函数返回后才开始发送，此时依赖注入的会话已经关闭，
+        所以导出期间使用自己的会话，发送结束（或客户端断开）时关闭
+        """
+        db = SessionLocal()
+        try:
+            for row in rows(db):
+                yield row
+        finally:
+            db.close()
+
+    @staticmethod
+    def iter_csv(header: List[str], rows: RowsFactory) -> Iterator[bytes]:
+        """逐块输出CSV（带BOM，Excel可直接打开）"""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        buffer.write("\ufeff")
+        writer.writerow(header)
+        count = 0
+        for row in ExportService._iter_rows(rows):
+            writer.writerow([_cell(value) for value in row])
+            count += 1
+            if count % CSV_FLUSH_ROWS == 0:
+                yield buffer.getvalue().encode("utf-8")
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue().encode("utf-8")
+
+    @staticmethod
+    def iter_xlsx(header: List[str], rows: RowsFactory, title: str) -> Iterator[bytes]:
+        """
+        输出XLSX
+
+        使用openpyxl的只写模式逐行写入（行数据不保留在内存中），
+        xlsx是zip格式，需要写完后再从临时文件分块发送
+        """
+        workbook = openpyxl.Workbook(write_only=True)
+        sheet = workbook.create_sheet(title=title[:31] or "Sheet1")
+        sheet.append(header)
+        for row in ExportService._iter_rows(rows):
+            sheet.append([_cell(value) for value in row])
+
+        with tempfile.TemporaryFile() as f:
+            workbook.save(f)
+            f.seek(0)
+            while True:
+                chunk = f.read(FILE_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+
+    @staticmethod
+    def check_format(fmt: str) -> None:
+        """
+        Raises:
+            ValueError: 不支持的导出格式
+        """
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"不支持的导出格式: {fmt}")
+        if fmt == "xlsx" and openpyxl is None:
+            raise ValueError("服务器未安装openpyxl，暂不支持导出xlsx，请选择csv格式")
+
+    @staticmethod
+    def render(header: List[str], rows: RowsFactory, fmt: str, title: str = "Sheet1") -> Iterator[bytes]:
+        if fmt == "xlsx":
+            return ExportService.iter_xlsx(header, rows, title)
+        return ExportService.iter_csv(header, rows)
+
+    @staticmethod
+    def media_type(fmt: str) -> str:
+        if fmt == "xlsx":
+            return "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        return "text/csv; charset=utf-8"
+
+    @staticmethod
+    def content_disposition(filename: str) -> str:
+        """文件名可能包含中文，同时提供ASCII回退名和RFC 5987编码的文件名"""
+        fallback = filename.encode("ascii", "ignore").decode("ascii") or "export"
+        return f"attachment; filename=\"{fallback}\"; filename*=UTF-8''{quote(filename)}"
+
+    @staticmethod
+    def filename(prefix: str, fmt: str) -> str:
+        timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+        return f"{prefix}_{timestamp}.{fmt}"
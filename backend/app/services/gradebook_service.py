@@ -0,0 +1,188 @@
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.models import Course, Exercise, Problem, SubmissionSummary
+from app.models.exercise import exercise_problem
+from app.models.class_model import student_class
+from app.services.exercise_service import ExerciseService
+
+
+class GradebookService:
+    """
+    课程成绩册：学生 × 练习（× 题目）的成绩矩阵
+
+    成绩直接读取评测时增量维护的提交汇总表，一条查询取出课程全部练习的最高分，
+    不再逐个练习扫描提交记录。只统计练习当前包含的题目，与练习统计页面一致。
+    """
+
+    @staticmethod
+    def get_course_exercises(db: Session, course_id: int) -> List[Dict[str, Any]]:
+        """课程的练习及其题目（按练习创建顺序和题目序号），两条查询"""
+        exercises = (
+            db.query(Exercise.id, Exercise.name, Exercise.end_time)
+            .filter(Exercise.course_id == course_id)
+            .order_by(Exercise.start_time, Exercise.id)
+            .all()
+        )
+        if not exercises:
+            return []
+
+        problems: Dict[int, List[Dict[str, Any]]] = {}
+        rows = (
+            db.query(exercise_problem.c.exercise_id, Problem.id, Problem.name, Problem.chinese_name,
+                     Problem.code_check_score, Problem.runtime_score)
+            .join(Problem, Problem.id == exercise_problem.c.problem_id)
+            .filter(exercise_problem.c.exercise_id.in_([e.id for e in exercises]))
+            .order_by(exercise_problem.c.exercise_id, exercise_problem.c.sequence)
+        )
+        for exercise_id, problem_id, name, chinese_name, code_check_score, runtime_score in rows:
+            problems.setdefault(exercise_id, []).append({
+                "id": problem_id,
+                "name": name,
+                "chinese_name": chinese_name,
+                "total_score": (code_check_score or 0) + (runtime_score or 0)
+            })
+
+        return [
+            {
+                "id": exercise_id,
+                "name": name,
+                "end_time": end_time,
+                "problems": problems.get(exercise_id, []),
+                "total_score": sum(p["total_score"] for p in problems.get(exercise_id, []))
+            }
+            for exercise_id, name, end_time in exercises
+        ]
+
+    @staticmethod
+    def get_score_rows(db: Session, exercise_ids: List[int], user_ids: List[int]):
+        """课程全部练习中各学生各题的最高分，只包含练习当前的题目"""
+        if not exercise_ids or not user_ids:
+            return []
+        return (
+            db.query(SubmissionSummary.user_id, SubmissionSummary.exercise_id,
+                     SubmissionSummary.problem_id, SubmissionSummary.best_score)
+            .join(exercise_problem, (exercise_problem.c.exercise_id == SubmissionSummary.exercise_id)
+                  & (exercise_problem.c.problem_id == SubmissionSummary.problem_id))
+            .filter(
+                SubmissionSummary.exercise_id.in_(exercise_ids),
+                SubmissionSummary.user_id.in_(user_ids)
+            )
+            .all()
+        )
+
+    @staticmethod
+    def get_gradebook(db: Session, course: Course, class_id: Optional[int] = None,
+                      include_problems: bool = True) -> Dict[str, Any]:
+        """
+        生成课程成绩册
+
+        Args:
+            course: 课程
+            class_id: 只包含该班级的学生，为空时包含课程关联的全部班级
+            include_problems: 是否返回每道题的得分，为False时只返回各练习的总分
+
+        Raises:
+            ValueError: 指定的班级未关联该课程
+        """
+        classes = course.classes
+        if class_id:
+            classes = [cls for cls in classes if cls.id == class_id]
+            if not classes:
+                raise ValueError("未找到指定班级或该班级未关联此课程")
+
+        exercises = GradebookService.get_course_exercises(db, course.id)
+        students = ExerciseService.get_class_students(db, [cls.id for cls in classes])
+        student_ids = [student.id for student in students]
+        class_names = ExerciseService.get_student_class_names(db, student_ids)
+
+        # {学生ID: {练习ID: {"total_score", "problem_scores"}}}
+        scores: Dict[int, Dict[int, Dict[str, Any]]] = {}
+        for user_id, exercise_id, problem_id, best_score in GradebookService.get_score_rows(
+                db, [e["id"] for e in exercises], student_ids):
+            entry = scores.setdefault(user_id, {}).setdefault(exercise_id, {"total_score": 0, "problem_scores": {}})
+            entry["total_score"] += best_score or 0
+            if include_problems:
+                entry["problem_scores"][problem_id] = best_score
+
+        rows = []
+        for student in students:
+            student_scores = scores.get(student.id, {})
+            exercise_scores = {}
+            for exercise in exercises:
+                entry = student_scores.get(exercise["id"])
+                exercise_scores[exercise["id"]] = {
+                    "total_score": entry["total_score"] if entry else 0,
+                    "submitted": entry is not None,
+                }
+                if include_problems:
+                    exercise_scores[exercise["id"]]["problem_scores"] = entry["problem_scores"] if entry else {}
+            rows.append({
+                "student_id": student.id,
+                "username": student.username,
+                "real_name": student.real_name or student.username,
+                "class_names": class_names.get(student.id, []),
+                "exercise_scores": exercise_scores,
+                "total_score": sum(s["total_score"] for s in exercise_scores.values())
+            })
+
+        # 按总分排序，同分同名次
+        rows.sort(key=lambda x: x["total_score"], reverse=True)
+        for index, row in enumerate(rows):
+            if index > 0 and row["total_score"] == rows[index - 1]["total_score"]:
+                row["rank"] = rows[index - 1]["rank"]
+            else:
+                row["rank"] = index + 1
+
+        if not include_problems:
+            exercises = [{k: v for k, v in e.items() if k != "problems"} for e in exercises]
+
+        return {
+            "course_id": course.id,
+            "course_name": course.name,
+            "exercises": exercises,
+            "classes": [{"id": cls.id, "name": cls.name} for cls in course.classes],
+            "students": rows,
+            "summary": GradebookService.summarize(db, exercises, rows, classes)
+        }
+
+    @staticmethod
+    def summarize(db: Session, exercises: List[Dict[str, Any]], rows: List[Dict[str, Any]], classes) -> Dict[str, Any]:
+        """各练习的平均分、最高分和提交人数，以及各班级的平均总分"""
+        student_count = len(rows)
+        exercise_summary = {}
+        for exercise in exercises:
+            entries = [row["exercise_scores"][exercise["id"]] for row in rows]
+            submitted = [e["total_score"] for e in entries if e["submitted"]]
+            exercise_summary[exercise["id"]] = {
+                "average_score": round(sum(e["total_score"] for e in entries) / student_count, 2) if student_count else 0,
+                "max_score": max(submitted) if submitted else 0,
+                "submitted_count": len(submitted)
+            }
+
+        totals = {row["student_id"]: row["total_score"] for row in rows}
+        members: Dict[int, List[int]] = {}
+        if totals:
+            for class_id, student_id in db.query(student_class.c.class_id, student_class.c.student_id).filter(
+                student_class.c.class_id.in_([cls.id for cls in classes]),
+                student_class.c.student_id.in_(list(totals))
+            ):
+                members.setdefault(class_id, []).append(totals[student_id])
+
+        class_summary = []
+        for cls in classes:
+            class_totals = members.get(cls.id, [])
+            class_summary.append({
+                "class_id": cls.id,
+                "class_name": cls.name,
+                "student_count": len(class_totals),
+                "average_total_score": round(sum(class_totals) / len(class_totals), 2) if class_totals else 0
+            })
+
+        return {
+            "student_count": student_count,
+            "total_score": sum(e["total_score"] for e in exercises),
+            "exercises": exercise_summary,
+            "classes": class_summary
+        }
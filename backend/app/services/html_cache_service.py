@@ -0,0 +1,150 @@
+import os
+import gzip
+import hashlib
+import threading
+import time
+import logging
+from collections import OrderedDict
+from email.utils import formatdate
+from typing import Optional
+
+from app.services.encoding_service import BankEncodingService
+
+try:
+    import brotli
+except ImportError:  # brotli为可选依赖，缺失时只提供gzip压缩
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# 题面HTML候选文件名（按优先级），{name}为题目目录名
+HTML_CANDIDATES = [
+    "{name}.htm",
+    "{name}.html",
+    "problem.htm",
+    "problem.html",
+    "Question.htm",
+    "Question.html",
+]
+
+# 最多缓存的题面数量
+MAX_ENTRIES = 1024
+
+# 未找到题面文件时的缓存时间（秒），避免反复探测不存在的文件
+MISS_TTL = 30
+
+
+def decode_html_bytes(raw_data: bytes) -> str:
+    """按BOM和常见编码解码题面HTML"""
+    if raw_data.startswith(b'\xff\xfe'):  # UTF-16 LE
+        return raw_data[2:].decode('utf-16-le')
+    if raw_data.startswith(b'\xef\xbb\xbf'):  # UTF-8
+        return raw_data[3:].decode('utf-8')
+    for encoding in ['utf-8', 'gbk', 'gb2312', 'gb18030', 'latin1']:
+        try:
+            return raw_data.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    return raw_data.decode('latin1')
+
+
+class HtmlEntry:
+    """一份已解码并预压缩的题面"""
+
+    __slots__ = ("path", "mtime_ns", "size", "text", "body", "gzip_body", "br_body", "etag", "last_modified")
+
+    def __init__(self, path: str, stat: os.stat_result, text: str):
+        self.path = path
+        self.mtime_ns = stat.st_mtime_ns
+        self.size = stat.st_size
+        self.text = text
+        self.body = text.encode("utf-8")
+        self.gzip_body = gzip.compress(self.body, compresslevel=6)
+        self.br_body = brotli.compress(self.body) if brotli else None
+        self.etag = 'W/"%s"' % hashlib.sha1(self.body).hexdigest()
+        self.last_modified = formatdate(stat.st_mtime, usegmt=True)
+
+    def is_fresh(self, stat: os.stat_result) -> bool:
+        return stat.st_mtime_ns == self.mtime_ns and stat.st_size == self.size
+
+
+class ProblemHtmlCache:
+    """
+    题面HTML缓存
+
+    缓存解析出的文件路径、UTF-8文本以及gzip/brotli压缩结果，以文件修改时间校验。
+    命中时只需一次stat，不再逐个探测候选文件名或尝试多种编码。
+    """
+
+    def __init__(self, problems_root: str):
+        self.problems_root = problems_root
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, HtmlEntry]" = OrderedDict()
+        self._misses = {}
+
+    def _resolve(self, data_path: str) -> Optional[str]:
+        problem_dir = os.path.join(self.problems_root, data_path)
+        name = os.path.basename(data_path)
+        for candidate in HTML_CANDIDATES:
+            html_path = os.path.join(problem_dir, candidate.format(name=name))
+            if os.path.exists(html_path):
+                return html_path
+        return None
+
+    def _load(self, html_path: str) -> HtmlEntry:
+        with open(html_path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            raw_data = f.read()
+        text = BankEncodingService.decode_known(html_path, raw_data, stat)
+        if text is None:
+            text = decode_html_bytes(raw_data)
+        return HtmlEntry(html_path, stat, text)
+
+    def get(self, data_path: str) -> Optional[HtmlEntry]:
+        """获取题面缓存项，题面文件不存在时返回None"""
+        if not data_path:
+            return None
+
+        with self._lock:
+            entry = self._entries.get(data_path)
+            if entry is not None:
+                self._entries.move_to_end(data_path)
+            elif time.time() - self._misses.get(data_path, 0) < MISS_TTL:
+                return None
+
+        if entry is not None:
+            try:
+                if entry.is_fresh(os.stat(entry.path)):
+                    return entry
+            except OSError:
+                pass
+
+        html_path = self._resolve(data_path)
+        if html_path is None:
+            with self._lock:
+                self._entries.pop(data_path, None)
+                if len(self._misses) > MAX_ENTRIES:
+                    self._misses.clear()
+                self._misses[data_path] = time.time()
+            return None
+
+        try:
+            entry = self._load(html_path)
+        except Exception as e:
+            logger.error(f"读取题目HTML文件失败: {html_path}: {str(e)}")
+            return None
+
+        with self._lock:
+            self._entries[data_path] = entry
+            self._entries.move_to_end(data_path)
+            self._misses.pop(data_path, None)
+            while len(self._entries) > MAX_ENTRIES:
+                self._entries.popitem(last=False)
+        logger.info(f"缓存题目HTML文件: {html_path}")
+        return entry
+
+    def invalidate(self, data_path: str) -> None:
+        """移除某道题的缓存"""
+        with self._lock:
+            self._entries.pop(data_path, None)
+            self._misses.pop(data_path, None)
@@ -0,0 +1,97 @@
+import os
+import time
+import signal
+import resource
+import tempfile
+import threading
+import subprocess
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+# 每个backend进程中同时运行的评测程序数量上限（正式评测与自测运行共用）
+JUDGE_MAX_WORKERS = int(os.getenv("JUDGE_MAX_WORKERS", str(os.cpu_count() or 2)))
+
+# 等待评测槽位的最长时间（秒）
+SLOT_WAIT_TIMEOUT = 30
+
+# 运行限制
+MEMORY_LIMIT = 512 * 1024 * 1024  # 地址空间上限
+OUTPUT_LIMIT = 1024 * 1024  # 输出文件大小上限
+
+# 运行程序时使用的中文环境，与本地评测保持一致
+RUN_ENV = {
+    "LANG": "zh_CN.UTF-8",
+    "LC_ALL": "zh_CN.UTF-8",
+    "LC_CTYPE": "zh_CN.UTF-8",
+    "PYTHONIOENCODING": "utf-8",
+}
+
+_judge_slots = threading.BoundedSemaphore(JUDGE_MAX_WORKERS)
+
+
+class JudgeBusyError(Exception):
+    """评测槽位已满"""
+
+
+@contextmanager
+def judge_slot(timeout: float = SLOT_WAIT_TIMEOUT):
+    """占用一个评测槽位，超时未获得时抛出JudgeBusyError"""
+    if not _judge_slots.acquire(timeout=timeout):
+        raise JudgeBusyError("评测繁忙，请稍后重试")
+    try:
+        yield
+    finally:
+        _judge_slots.release()
+
+
+def _limit_resources(time_limit_ms: int):
+    def apply():
+        cpu_seconds = max(1, (time_limit_ms + 999) // 1000) + 1
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds))
+        resource.setrlimit(resource.RLIMIT_AS, (MEMORY_LIMIT, MEMORY_LIMIT))
+        resource.setrlimit(resource.RLIMIT_FSIZE, (OUTPUT_LIMIT, OUTPUT_LIMIT))
+    return apply
+
+
+def run_program(exe_path: str, input_data: bytes, time_limit_ms: int = 1000) -> Dict:
+    """
+    在资源限制下运行已编译的程序（调用方需先占用评测槽位）
+
+    Returns:
+        {"status", "output"(bytes), "time_ms", "exit_code"}
+    """
+    with tempfile.TemporaryFile() as stdout:
+        started = time.time()
+        try:
+            process = subprocess.run(
+                [exe_path],
+                input=input_data,
+                stdout=stdout,
+                stderr=subprocess.DEVNULL,
+                timeout=time_limit_ms / 1000,
+                env=RUN_ENV,
+                preexec_fn=_limit_resources(time_limit_ms),
+            )
+            exit_code = process.returncode
+            status = "OK" if exit_code == 0 else "Runtime Error"
+        except subprocess.TimeoutExpired:
+            exit_code = None
+            status = "Time Limit Exceeded"
+        elapsed_ms = int((time.time() - started) * 1000)
+
+        if exit_code == -signal.SIGXFSZ:
+            status = "Output Limit Exceeded"
+        elif exit_code == -signal.SIGXCPU:
+            status = "Time Limit Exceeded"
+
+        stdout.seek(0)
+        output = stdout.read(OUTPUT_LIMIT)
+
+    return {"status": status, "output": output, "time_ms": elapsed_ms, "exit_code": exit_code}
+
+
+def run_program_limited(exe_path: str, input_data: bytes, time_limit_ms: int = 1000,
+                        timeout: Optional[float] = SLOT_WAIT_TIMEOUT) -> Dict:
+    """占用评测槽位后运行程序"""
+    with judge_slot(timeout):
+        return run_program(exe_path, input_data, time_limit_ms)
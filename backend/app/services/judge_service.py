@@ -13,13 +13,29 @@ from sqlalchemy.orm import Session
 from sqlalchemy import and_
 from sqlalchemy import func # Added for latest_submissions
 
-from app.models import Submission, Problem, User, Exercise, Course, Class
+from app.models import Submission, SubmissionSummary, Problem, User, Exercise, Course, Class
 from app.models.class_model import student_class
+from app.services.encoding_service import BankEncodingService
+from app.services.compile_cache_service import compile_cache
+from app.services.judge_runner_service import judge_slot, run_program_limited
+from app.services.testdata_pack_service import TestDataPackService
+from app.services.submission_summary_service import SubmissionSummaryService
+from app.services.leaderboard_service import LeaderboardService, ALL_SCOPE
+from app.services.submission_history_service import SubmissionHistoryService
+from app.services.case_result_service import CaseResultService
+from app.services.code_blob_service import CodeBlobService
+from app.services.event_service import publish_verdict
 from config.settings import settings
 
 # 题库根目录
 PROBLEMS_ROOT = "/app_root/题库"  # 与problem_service.py中保持一致
 
+# 本地评测的编译参数
+LOCAL_JUDGE_FLAGS = ["-lm"]
+
+# 自测运行输入的最大长度
+TEST_RUN_MAX_INPUT = 64 * 1024
+
 class JudgeService:
     """评测服务"""
     
@@ -66,6 +82,33 @@ class JudgeService:
         
         return '\n'.join(head_lines) + f"\n... (省略了 {total_lines - max_lines} 行) ...\n" + '\n'.join(tail_lines)
     
+    @staticmethod
+    def _decode_bank_file(path: str, raw_data: bytes, stat: os.stat_result) -> str:
+        """
+        解码题库中的测试数据文件，优先使用编码清单中记录的编码，否则退回多编码尝试
+        """
+        known = BankEncodingService.decode_known(path, raw_data, stat)
+        if known is not None:
+            return known.strip()
+        return JudgeService._decode_output(raw_data)
+
+    @staticmethod
+    def _read_bank_text(path: str) -> str:
+        """读取题库文本文件，优先按编码清单（或UTF-8副本）读取"""
+        text = BankEncodingService.read_text(path)
+        if text is not None:
+            return text.strip()
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return f.read().strip()
+        except UnicodeDecodeError:
+            try:
+                with open(path, 'r', encoding='gbk') as f:
+                    return f.read().strip()
+            except UnicodeDecodeError:
+                with open(path, 'r', encoding='latin-1') as f:
+                    return f.read().strip()
+
     @staticmethod
     def _decode_output(binary_output) -> str:
         """
@@ -332,6 +375,10 @@ class JudgeService:
                 "details": []
             }
         
+        # 评测机按test_case_id读取自己的测试用例目录，评测前先增量同步该题的测试数据
+        from app.services.judge_sync_service import JudgeSyncService
+        JudgeSyncService.ensure_synced(problem.data_path)
+
         # 确保时间和内存限制有效
         time_limit = problem.time_limit if problem.time_limit else 1000  # 默认1秒
         memory_limit = problem.memory_limit if problem.memory_limit else 134217728  # 默认128MB
@@ -484,6 +531,38 @@ class JudgeService:
             "details": judge_result
         }
     
+    @staticmethod
+    def _commit_verdict(db: Session, submission: Submission) -> None:
+        """提交评测结果：汇总表与提交记录（及测试点详情）在同一事务中提交"""
+        SubmissionSummaryService.record(db, submission)
+        db.commit()
+    
+    @staticmethod
+    def _after_verdict(db: Session, submission: Submission) -> None:
+        """评测结果提交之后更新排行榜、时间线和缓存并推送事件；这里的失败不影响已提交的结果"""
+        try:
+            JudgeService._notify_verdict(db, submission)
+        except Exception as e:
+            db.rollback()
+            print(f"[Judge] 评测结果后续处理失败 submission={submission.id}: {str(e)}")
+    
+    @staticmethod
+    def _notify_verdict(db: Session, submission: Submission) -> None:
+        ranks = LeaderboardService.on_verdict(db, submission)
+        SubmissionHistoryService.invalidate(submission.user_id)
+        if submission.exercise_id:
+            from app.services.active_students_service import ActiveStudentsService
+            from app.services.timeline_service import TimelineService
+            ActiveStudentsService.invalidate(submission.exercise_id)
+            TimelineService.record(submission)
+        publish_verdict(submission, {
+            "user_id": submission.user_id,
+            "problem_id": submission.problem_id,
+            "status": submission.status,
+            "total_score": submission.total_score,
+            **(ranks or {})
+        })
+    
     @staticmethod
     def submit(db: Session, user_id: int, problem_id: int, exercise_id: Optional[int], 
                code: str, language: str = "c") -> Submission:
@@ -495,12 +574,12 @@ class JudgeService:
         if not problem:
             raise ValueError(f"问题不存在: ID {problem_id}")
         
-        # 创建提交记录
+        # 创建提交记录（代码按哈希去重保存在code_blobs表中）
         submission = Submission(
             user_id=user_id,
             problem_id=problem_id,
             exercise_id=exercise_id,
-            code=code,
+            code_hash=CodeBlobService.store(db, code),
             language=language,
             status="Pending"
         )
@@ -523,7 +602,8 @@ class JudgeService:
                     "code_check": code_check_result,
                     "runtime": {"passed": False, "score": 0, "message": "编译失败，未运行测试"}
                 }
-                db.commit()
+                JudgeService._commit_verdict(db, submission)
+                JudgeService._after_verdict(db, submission)
                 return submission
             
             # 进行运行测试
@@ -541,29 +621,38 @@ class JudgeService:
             else:
                 submission.status = "Wrong Answer"
             
-            # 保存结果详情
+            # 保存结果摘要，各测试点的详情写入submission_case_results表
+            runtime_result, case_rows = CaseResultService.split(submission.id, runtime_result)
+            db.add_all(case_rows)
             submission.result = {
                 "code_check": code_check_result,
                 "runtime": runtime_result
             }
             
-            db.commit()
-            return submission
+            JudgeService._commit_verdict(db, submission)
             
         except Exception as e:
+            # 失败的可能是评测本身，也可能是写入结果的事务；先回滚（同时丢弃未提交的测试点详情）再记录系统错误
+            db.rollback()
             submission.status = "System Error"
             submission.code_check_score = 0
             submission.runtime_score = 0
             submission.total_score = 0
             submission.result = {"error": str(e)}
-            db.commit()
+            try:
+                JudgeService._commit_verdict(db, submission)
+            except Exception:
+                db.rollback()
+                raise
             
             # 记录错误但不抛出，以便让API能正确返回
             import traceback
             print(f"[Judge] 提交评测异常: {str(e)}")
             traceback.print_exc()
-            
-            return submission
+        
+        # 排行榜、时间线等在结果提交之后处理，不会再改写已提交的结果
+        JudgeService._after_verdict(db, submission)
+        return submission
     
     @staticmethod
     def run_judge_with_local_testcases(problem: Problem, code: str, language: str) -> Optional[Dict[str, Any]]:
@@ -578,20 +667,25 @@ class JudgeService:
             print(f"[Judge] 题目路径不存在: {problem_path}")
             return None
         
-        # 查找所有的测试用例文件(.in和.out)
+        # 优先使用测试数据包（一次mmap即可读取全部用例），不可用时再逐个读取测试文件
+        pack = TestDataPackService.get(problem_path, problem.data_path)
         test_cases = []
-        for file in os.listdir(problem_path):
-            # 匹配数字.in文件
-            if file.endswith('.in') and re.match(r'^\d+\.in$', file):
-                test_number = file.split('.')[0]
-                in_file = os.path.join(problem_path, file)
-                out_file = os.path.join(problem_path, f"{test_number}.out")
+        if pack is not None:
+            test_cases = [(str(number), None, None) for number in pack.numbers()]
+        else:
+            # 查找所有的测试用例文件(.in和.out)
+            for file in os.listdir(problem_path):
+                # 匹配数字.in文件
+                if file.endswith('.in') and re.match(r'^\d+\.in$', file):
+                    test_number = file.split('.')[0]
+                    in_file = os.path.join(problem_path, file)
+                    out_file = os.path.join(problem_path, f"{test_number}.out")
                 
-                # 确保对应的.out文件存在
-                if os.path.exists(out_file):
-                    test_cases.append((test_number, in_file, out_file))
-                else:
-                    print(f"[Judge] 测试用例 {test_number} 缺少输出文件: {out_file}")
+                    # 确保对应的.out文件存在
+                    if os.path.exists(out_file):
+                        test_cases.append((test_number, in_file, out_file))
+                    else:
+                        print(f"[Judge] 测试用例 {test_number} 缺少输出文件: {out_file}")
         
         # 如果没有找到有效的测试用例
         if not test_cases:
@@ -602,23 +696,15 @@ class JudgeService:
         
         # 根据语言编译代码
         if language.lower() == 'c':
-            # 创建临时目录
-            with tempfile.TemporaryDirectory() as temp_dir:
-                # 保存代码到临时文件
-                source_file = os.path.join(temp_dir, 'main.c')
-                exe_file = os.path.join(temp_dir, 'main')
-                
-                with open(source_file, 'w') as f:
-                    f.write(code)
-                
-                # 编译代码
-                compile_cmd = ['gcc', '-o', exe_file, source_file]
-                compile_process = subprocess.run(compile_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-                
+            # 编译代码（相同代码复用编译缓存中的可执行文件）
+            exe_file, compile_output = compile_cache.compile(code, LOCAL_JUDGE_FLAGS)
+            
+            # 占用评测槽位，与自测运行共用并发上限
+            with judge_slot():
                 # 检查编译结果
-                if compile_process.returncode != 0:
+                if exe_file is None:
                     # 编译失败
-                    print(f"[Judge] 编译失败: {compile_process.stderr}")
+                    print(f"[Judge] 编译失败: {compile_output}")
                     return {
                         "passed": False,
                         "score": 0,
@@ -633,12 +719,16 @@ class JudgeService:
                 
                 for test_number, in_file, out_file in test_cases:
                     try:
-                        # 读取输入文件为二进制
-                        with open(in_file, 'rb') as f:
-                            input_data = f.read()
-                        
-                        # 检查输入文件是否是UTF-16LE编码
-                        is_utf16 = input_data.startswith(b'\xff\xfe')
+                        if pack is not None:
+                            # 直接使用数据包映射区域中的输入，不复制数据
+                            input_data = pack.input(int(test_number))
+                            input_str = pack.input_text(int(test_number)).strip()
+                        else:
+                            # 读取输入文件为二进制
+                            with open(in_file, 'rb') as f:
+                                input_stat = os.fstat(f.fileno())
+                                input_data = f.read()
+                            input_str = JudgeService._decode_bank_file(in_file, input_data, input_stat)
                         
                         # 运行程序
                         time_limit_ms = problem.time_limit if problem.time_limit else 1000
@@ -659,14 +749,16 @@ class JudgeService:
                                 }  # 设置中文环境
                             )
                             
-                            # 以二进制方式读取输出文件
-                            with open(out_file, 'rb') as f:
-                                expected_output = f.read()
-                            
                             actual_output = process.stdout
                             
-                            # 使用更智能的多编码解码
-                            expected_output_str = JudgeService._decode_output(expected_output)
+                            # 期望输出按数据包或编码清单中记录的编码解码，程序输出使用多编码解码
+                            if pack is not None:
+                                expected_output_str = pack.output_text(int(test_number)).strip()
+                            else:
+                                with open(out_file, 'rb') as f:
+                                    expected_stat = os.fstat(f.fileno())
+                                    expected_output = f.read()
+                                expected_output_str = JudgeService._decode_bank_file(out_file, expected_output, expected_stat)
                             actual_output_str = JudgeService._decode_output(actual_output)
                             
                             # 使用智能比较
@@ -677,7 +769,7 @@ class JudgeService:
                                 results.append({
                                     "test_case": test_number,
                                     "result": 0,  # 0表示通过
-                                    "input": JudgeService._decode_output(input_data),
+                                    "input": input_str,
                                     "expected": expected_output_str,
                                     "actual": actual_output_str
                                 })
@@ -685,7 +777,7 @@ class JudgeService:
                                 results.append({
                                     "test_case": test_number,
                                     "result": -1,  # -1表示输出不匹配
-                                    "input": JudgeService._decode_output(input_data),
+                                    "input": input_str,
                                     "expected": expected_output_str,
                                     "actual": actual_output_str
                                 })
@@ -694,7 +786,7 @@ class JudgeService:
                             results.append({
                                 "test_case": test_number,
                                 "result": 1,  # 1表示超时
-                                "input": JudgeService._decode_output(input_data),
+                                "input": input_str,
                                 "message": "程序运行超时"
                             })
                         except Exception as e:
@@ -702,7 +794,7 @@ class JudgeService:
                             results.append({
                                 "test_case": test_number,
                                 "result": 2,  # 2表示运行错误
-                                "input": JudgeService._decode_output(input_data),
+                                "input": input_str,
                                 "message": "程序运行错误"
                             })
                     except Exception as e:
@@ -753,6 +845,75 @@ class JudgeService:
             print(f"[Judge] 暂不支持的语言: {language}")
             return None 
 
+    @staticmethod
+    def _reference_source(problem: Problem) -> Optional[bytes]:
+        """获取题目参考答案源码：优先使用题目目录下的StdAnswer.c，其次使用数据库中的参考答案"""
+        if problem.data_path:
+            std_answer = os.path.join(PROBLEMS_ROOT, problem.data_path, "StdAnswer.c")
+            try:
+                with open(std_answer, 'rb') as f:
+                    return f.read()
+            except OSError:
+                pass
+        if problem.reference_answer:
+            return problem.reference_answer.encode('utf-8')
+        return None
+
+    @staticmethod
+    def _format_run(run_result: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "status": run_result["status"],
+            "output": JudgeService._decode_output(run_result["output"]),
+            "time_ms": run_result["time_ms"]
+        }
+
+    @staticmethod
+    def test_run(problem: Problem, code: str, input_data: str, language: str = "c") -> Dict[str, Any]:
+        """
+        自测运行：用自定义输入运行学生代码和参考答案，返回两者的输出，不写入提交记录
+
+        学生代码与参考答案都通过编译缓存获取可执行文件，运行时占用评测槽位，
+        与正式评测共用同一并发上限。
+        """
+        if language.lower() != 'c':
+            raise ValueError(f"暂不支持的语言: {language}")
+        input_bytes = input_data.encode('utf-8')
+        if len(input_bytes) > TEST_RUN_MAX_INPUT:
+            raise ValueError(f"输入数据不能超过{TEST_RUN_MAX_INPUT // 1024}KB")
+
+        result = {
+            "compile": {"success": False, "message": ""},
+            "user": None,
+            "reference": None,
+            "match": None
+        }
+
+        user_exe, compile_output = compile_cache.compile(code, LOCAL_JUDGE_FLAGS)
+        result["compile"] = {
+            "success": user_exe is not None,
+            "message": JudgeService._truncate_log_output(compile_output, max_lines=30, max_chars=2000) if compile_output else ""
+        }
+        if user_exe is None:
+            return result
+
+        time_limit = problem.time_limit if problem.time_limit else 1000
+        user_run = run_program_limited(user_exe, input_bytes, time_limit)
+        result["user"] = JudgeService._format_run(user_run)
+
+        reference_source = JudgeService._reference_source(problem)
+        if reference_source:
+            reference_exe, _ = compile_cache.compile(reference_source, LOCAL_JUDGE_FLAGS)
+            if reference_exe:
+                reference_run = run_program_limited(reference_exe, input_bytes, time_limit)
+                result["reference"] = JudgeService._format_run(reference_run)
+            else:
+                print(f"[Judge] 题目 {problem.id} 的参考答案编译失败")
+
+        if result["reference"] and result["user"]["status"] == "OK" and result["reference"]["status"] == "OK":
+            result["match"] = JudgeService.compare_outputs(result["reference"]["output"], result["user"]["output"])
+
+        return result
+
     @staticmethod
     def get_test_cases(data_path: str) -> List[Dict[str, str]]:
         """
@@ -774,6 +935,19 @@ class JudgeService:
                 print(f"[Judge] 路径不存在: {full_path}")
                 return []
             
+            # 优先从测试数据包读取
+            if not os.path.isabs(data_path):
+                pack = TestDataPackService.get(full_path, data_path)
+                if pack is not None:
+                    for number in pack.numbers():
+                        test_cases.append({
+                            "test_case": number,
+                            "input": pack.input_text(number).strip(),
+                            "output": pack.output_text(number).strip()
+                        })
+                    print(f"[Judge] 从测试数据包读取 {len(test_cases)} 个测试用例")
+                    return test_cases
+            
             # 遍历测试用例文件
             i = 1
             while True:
@@ -783,32 +957,11 @@ class JudgeService:
                 if not os.path.exists(input_file):
                     break
                     
-                # 读取输入数据 - 尝试多种编码
-                input_data = ""
-                try:
-                    with open(input_file, 'r', encoding='utf-8') as f:
-                        input_data = f.read().strip()
-                except UnicodeDecodeError:
-                    try:
-                        with open(input_file, 'r', encoding='gbk') as f:
-                            input_data = f.read().strip()
-                    except UnicodeDecodeError:
-                        with open(input_file, 'r', encoding='latin-1') as f:
-                            input_data = f.read().strip()
-                
-                # 读取输出数据 - 尝试多种编码
+                # 读取输入输出数据（优先按编码清单解码）
+                input_data = JudgeService._read_bank_text(input_file)
                 output_data = ""
                 if os.path.exists(output_file):
-                    try:
-                        with open(output_file, 'r', encoding='utf-8') as f:
-                            output_data = f.read().strip()
-                    except UnicodeDecodeError:
-                        try:
-                            with open(output_file, 'r', encoding='gbk') as f:
-                                output_data = f.read().strip()
-                        except UnicodeDecodeError:
-                            with open(output_file, 'r', encoding='latin-1') as f:
-                                output_data = f.read().strip()
+                    output_data = JudgeService._read_bank_text(output_file)
                     
                 test_cases.append({
                     "test_case": i,
@@ -821,13 +974,223 @@ class JudgeService:
             return test_cases
         except Exception as e:
             print(f"读取测试用例失败: {e}")
-            return [] 
+            return []
+
+    @staticmethod
+    def _test_data_dir(data_path: str) -> str:
+        if not os.path.isabs(data_path):
+            return os.path.join(PROBLEMS_ROOT, data_path)
+        return data_path
+
+    @staticmethod
+    def get_test_case_meta(data_path: str) -> List[Dict[str, Any]]:
+        """
+        测试用例元数据（用例号、输入输出的字节数和MD5），不读取用例内容
+
+        元数据直接取自测试数据包的索引；没有数据包时只能给出文件大小，MD5为None
+        """
+        full_path = JudgeService._test_data_dir(data_path)
+        if not os.path.isdir(full_path):
+            return []
+
+        if not os.path.isabs(data_path):
+            pack = TestDataPackService.get(full_path, data_path)
+            if pack is not None:
+                return [
+                    {
+                        "test_case": number,
+                        "input_size": pack.cases[number].in_length,
+                        "input_md5": pack.cases[number].in_md5,
+                        "output_size": pack.cases[number].out_length,
+                        "output_md5": pack.cases[number].out_md5
+                    }
+                    for number in pack.numbers()
+                ]
+
+        cases = []
+        i = 1
+        while True:
+            input_file = os.path.join(full_path, f"{i}.in")
+            output_file = os.path.join(full_path, f"{i}.out")
+            if not os.path.exists(input_file):
+                break
+            cases.append({
+                "test_case": i,
+                "input_size": os.path.getsize(input_file),
+                "input_md5": None,
+                "output_size": os.path.getsize(output_file) if os.path.exists(output_file) else 0,
+                "output_md5": None
+            })
+            i += 1
+        return cases
+
+    @staticmethod
+    def get_test_case_data(data_path: str, number: int, kind: str) -> Optional[Dict[str, Any]]:
+        """
+        单个测试用例的输入(kind="input")或输出(kind="output")原始字节
+
+        返回 {"data": 字节(数据包中为memoryview，不复制), "size", "md5", "encoding"}，
+        用例不存在时返回None
+        """
+        full_path = JudgeService._test_data_dir(data_path)
+        if not os.path.isdir(full_path):
+            return None
+
+        if not os.path.isabs(data_path):
+            pack = TestDataPackService.get(full_path, data_path)
+            if pack is not None:
+                case = pack.cases.get(number)
+                if case is None:
+                    return None
+                if kind == "input":
+                    return {"data": pack.input(number), "size": case.in_length,
+                            "md5": case.in_md5, "encoding": case.in_encoding}
+                return {"data": pack.output(number), "size": case.out_length,
+                        "md5": case.out_md5, "encoding": case.out_encoding}
+
+        path = os.path.join(full_path, f"{number}.{'in' if kind == 'input' else 'out'}")
+        if number < 1 or not os.path.isfile(path):
+            return None
+        with open(path, "rb") as f:
+            data = f.read()
+        return {"data": data, "size": len(data), "md5": hashlib.md5(data).hexdigest(), "encoding": "utf-8"}
+
+    @staticmethod
+    def _current_user_submission(db: Session, problem_id: int, exercise_id: int, current_user_id: Optional[int]) -> Optional[Dict[str, Any]]:
+        """非学生用户在该题上的最新提交（不参与排名，单独返回）"""
+        if not current_user_id:
+            return None
+        current_user = db.query(User).filter(User.id == current_user_id).first()
+        if not current_user or current_user.role == "student":
+            return None
+        current_user_summary = db.query(SubmissionSummary).filter(
+            SubmissionSummary.exercise_id == exercise_id,
+            SubmissionSummary.problem_id == problem_id,
+            SubmissionSummary.user_id == current_user_id
+        ).first()
+        if not current_user_summary:
+            return None
+        return {
+            "user_id": current_user_id,
+            "username": current_user.username,
+            "real_name": current_user.real_name,
+            "score": current_user_summary.latest_score or 0,
+            "status": current_user_summary.latest_status,
+            "submitted_at": current_user_summary.last_submitted_at
+        }
 
     @staticmethod
     def get_problem_ranking(
         db: Session, problem_id: int, exercise_id: int, class_id: Optional[int] = None, current_user_id: Optional[int] = None,
+        offset: int = 0, limit: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """
+        获取题目在班级中的排名情况
+
+        优先读取Redis排行榜（名次查询和分页均为O(log n)），Redis不可用时改为查询数据库。
+        limit为None时返回全部学生（含未提交的学生）。
+        """
+        try:
+            return JudgeService._get_problem_ranking_from_leaderboard(
+                db, problem_id, exercise_id, class_id, current_user_id, offset, limit
+            )
+        except Exception as e:
+            print(f"读取排行榜失败，改为查询数据库: {str(e)}")
+
+        result = JudgeService._get_problem_ranking_from_db(db, problem_id, exercise_id, class_id, current_user_id)
+        if offset or limit is not None:
+            end = None if limit is None else offset + limit
+            result["rankings"] = result["rankings"][offset:end]
+        return result
+
+    @staticmethod
+    def _get_problem_ranking_from_leaderboard(
+        db: Session, problem_id: int, exercise_id: int, class_id: Optional[int], current_user_id: Optional[int],
+        offset: int, limit: Optional[int],
+    ) -> Dict[str, Any]:
+        """从Redis有序集合读取排名，只查询当前页学生的信息"""
+        LeaderboardService.ensure_built(db, exercise_id)
+        exercise_class_ids = LeaderboardService._course_class_ids(db, exercise_id) or []
+        key = LeaderboardService.board_key(exercise_id, problem_id, class_id or ALL_SCOPE)
+        page, submission_count = LeaderboardService.page(key, offset, limit)
+
+        # 当前页已提交学生的信息
+        details = {}
+        if page:
+            rows = (
+                db.query(SubmissionSummary, User.username, User.real_name)
+                .join(User, SubmissionSummary.user_id == User.id)
+                .filter(
+                    SubmissionSummary.exercise_id == exercise_id,
+                    SubmissionSummary.problem_id == problem_id,
+                    SubmissionSummary.user_id.in_([user_id for user_id, _ in page])
+                )
+            )
+            details = {summary.user_id: (summary, username, real_name) for summary, username, real_name in rows}
+
+        rankings = []
+        for user_id, score in page:
+            if user_id not in details:
+                continue
+            summary, username, real_name = details[user_id]
+            rankings.append({
+                "user_id": user_id,
+                "username": username,
+                "real_name": real_name,
+                "score": score,
+                "status": summary.latest_status,
+                "submitted_at": summary.last_submitted_at
+            })
+
+        # 参与排名的学生范围
+        student_query = db.query(User).filter(User.role == "student")
+        if class_id or exercise_class_ids:
+            scope_class_ids = [class_id] if class_id else exercise_class_ids
+            student_query = student_query.filter(
+                User.id.in_(
+                    db.query(student_class.c.student_id).filter(student_class.c.class_id.in_(scope_class_ids))
+                )
+            )
+        total_students = student_query.count()
+
+        # 页尾超出已提交的学生时，用未提交的学生补齐
+        if limit is None or offset + limit > submission_count:
+            submitted = db.query(SubmissionSummary.user_id).filter(
+                SubmissionSummary.exercise_id == exercise_id,
+                SubmissionSummary.problem_id == problem_id
+            )
+            unsubmitted_query = student_query.filter(~User.id.in_(submitted)).order_by(User.id)
+            unsubmitted_query = unsubmitted_query.offset(max(0, offset - submission_count))
+            if limit is not None:
+                unsubmitted_query = unsubmitted_query.limit(offset + limit - max(offset, submission_count))
+            for student in unsubmitted_query:
+                rankings.append({
+                    "user_id": student.id,
+                    "username": student.username,
+                    "real_name": student.real_name,
+                    "score": 0,
+                    "status": "未提交",
+                    "submitted_at": None
+                })
+
+        result = {
+            "rankings": rankings,
+            "current_user_rank": LeaderboardService.rank(key, current_user_id) if current_user_id else None,
+            "total_students": total_students,
+            "submission_count": submission_count
+        }
+
+        current_user_submission = JudgeService._current_user_submission(db, problem_id, exercise_id, current_user_id)
+        if current_user_submission:
+            result["current_user_submission"] = current_user_submission
+
+        return result
+
+    @staticmethod
+    def _get_problem_ranking_from_db(
+        db: Session, problem_id: int, exercise_id: int, class_id: Optional[int] = None, current_user_id: Optional[int] = None,
     ) -> Dict[str, Any]:
-        """获取题目在班级中的排名情况"""
+        """从提交汇总表计算题目在班级中的排名情况"""
         # 获取练习相关的班级ID列表
         exercise_class_ids = []
         try:
@@ -841,36 +1204,17 @@ class JudgeService:
             print(f"获取练习相关班级失败: {str(e)}")
             exercise_class_ids = []
         
-        # 使用子查询获取每个学生的最新提交ID
-        latest_submission_ids = {}
-        try:
-            # 使用直接的SQL查询而不是SQLAlchemy ORM来获取每个用户的最新提交ID
-            latest_submission_query = db.query(
-                Submission.user_id, 
-                func.max(Submission.id).label("latest_id")
-            ).filter(
-                Submission.problem_id == problem_id,
-                Submission.exercise_id == exercise_id
-            ).group_by(Submission.user_id).all()
-            
-            # 将结果转换为字典
-            for user_id, latest_id in latest_submission_query:
-                latest_submission_ids[user_id] = latest_id
-        except Exception as e:
-            print(f"获取最新提交ID出错: {str(e)}")
-            # 发生错误时继续使用旧逻辑
-        
-        # 基本查询构建 - 获取所有提交记录
+        # 从提交汇总表读取每个用户在该题上的最新提交（按主键前缀扫描，不再扫描全部提交记录）
         query = (
             db.query(
-                Submission,
+                SubmissionSummary,
                 User.username,
                 User.real_name,
                 User.role,
             )
-            .join(User, Submission.user_id == User.id)
-            .filter(Submission.problem_id == problem_id)
-            .filter(Submission.exercise_id == exercise_id)
+            .join(User, SubmissionSummary.user_id == User.id)
+            .filter(SubmissionSummary.exercise_id == exercise_id)
+            .filter(SubmissionSummary.problem_id == problem_id)
         )
         
         # 如果指定了班级，则只查询该班级的学生
@@ -892,83 +1236,32 @@ class JudgeService:
                 )
             )
         
-        # 获取所有符合条件的提交记录
-        submissions = query.all()
-        
-        # 获取每个学生的最高分数提交
+        # 每个学生取最新一次提交的成绩
         user_best_submissions = {}
         teacher_submissions = []
         
-        for submission, username, real_name, role in submissions:
+        for summary, username, real_name, role in query.all():
             if role == "admin":  # 不处理管理员提交
                 continue
-                
-            user_id = submission.user_id
-            score = submission.total_score or 0
+            
+            entry = {
+                "user_id": summary.user_id,
+                "username": username,
+                "real_name": real_name,
+                "score": summary.latest_score or 0,
+                "status": summary.latest_status,
+                "submitted_at": summary.last_submitted_at
+            }
             
             if role == "teacher":  # 如果是教师，单独保存
-                teacher_submissions.append({
-                    "user_id": user_id,
-                    "username": username,
-                    "real_name": real_name,
-                    "score": score,
-                    "status": submission.status,
-                    "submitted_at": submission.submitted_at
-                })
+                teacher_submissions.append(entry)
                 continue  # 不计入排名
 
             if role == "student":  # 只有学生计入排名
-                # 如果有最新提交ID并且当前提交ID匹配，则使用当前提交
-                if latest_submission_ids and user_id in latest_submission_ids and submission.id == latest_submission_ids[user_id]:
-                    user_best_submissions[user_id] = {
-                        "user_id": user_id,
-                        "username": username,
-                        "real_name": real_name,
-                        "score": score,
-                        "status": submission.status,
-                        "submitted_at": submission.submitted_at
-                    }
-                # 如果没有最新提交ID信息，或者出现了问题，则使用旧逻辑
-                elif not latest_submission_ids and (user_id not in user_best_submissions or score > user_best_submissions[user_id]["score"]):
-                    user_best_submissions[user_id] = {
-                        "user_id": user_id,
-                        "username": username,
-                        "real_name": real_name,
-                        "score": score,
-                        "status": submission.status,
-                        "submitted_at": submission.submitted_at
-                    }
+                user_best_submissions[summary.user_id] = entry
     
         # 获取当前用户的提交（非学生用户特殊处理）
-        current_user_submission = None
-        if current_user_id:
-            current_user = db.query(User).filter(User.id == current_user_id).first()
-            if current_user and current_user.role != "student":
-                # 构建当前用户最新提交的查询
-                current_user_query = db.query(Submission).filter(
-                    Submission.user_id == current_user_id,
-                    Submission.problem_id == problem_id,
-                    Submission.exercise_id == exercise_id
-                )
-                
-                # 获取当前用户的最新提交ID
-                latest_id = None
-                if latest_submission_ids and current_user_id in latest_submission_ids:
-                    latest_id = latest_submission_ids[current_user_id]
-                    current_user_sub = current_user_query.filter(Submission.id == latest_id).first()
-                else:
-                    # 如果无法获取最新ID，使用最高分
-                    current_user_sub = current_user_query.order_by(Submission.total_score.desc()).first()
-                
-                if current_user_sub:
-                    current_user_submission = {
-                        "user_id": current_user_id,
-                        "username": current_user.username,
-                        "real_name": current_user.real_name,
-                        "score": current_user_sub.total_score or 0,
-                        "status": current_user_sub.status,
-                        "submitted_at": current_user_sub.submitted_at
-                    }
+        current_user_submission = JudgeService._current_user_submission(db, problem_id, exercise_id, current_user_id)
         
         # 按分数排序
         rankings = list(user_best_submissions.values())
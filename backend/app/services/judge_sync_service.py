@@ -0,0 +1,312 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from config.settings import settings
+from app.services.problem_service import ProblemService, PROBLEMS_ROOT
+from app.services.testdata_pack_service import TestDataPackService, TestDataPack
+from app.utils.redis_client import RedisCache
+
+logger = logging.getLogger(__name__)
+
+# 每个测试用例目录中记录已同步内容的清单文件
+SYNC_MANIFEST_NAME = ".sync_manifest.json"
+
+# 评测机读取的测试用例信息文件
+JUDGE_INFO_NAME = "info"
+
+# 最近一次同步结果的缓存键
+SYNC_STATUS_KEY = "judge_sync:last_run:{node}"
+
+# 并行传输的线程数
+SYNC_WORKERS = 8
+
+
+def build_manifest(pack: TestDataPack) -> Dict:
+    """
+    根据测试数据包生成题目的内容清单
+
+    清单包含每个文件的大小和MD5，以及评测机info文件需要的去除行尾空白后的输出MD5；
+    digest是整个清单的摘要，用于快速判断评测节点上的数据是否最新。
+    所有信息都取自数据包的索引，不读取用例内容，清单中也不引用数据包本身。
+    """
+    files = {}
+    test_cases = {}
+    for number in pack.numbers():
+        case = pack.cases[number]
+        files[f"{number}.in"] = {"size": case.in_length, "md5": case.in_md5}
+        files[f"{number}.out"] = {"size": case.out_length, "md5": case.out_md5}
+        test_cases[str(number)] = {
+            "input_name": f"{number}.in",
+            "input_size": case.in_length,
+            "output_name": f"{number}.out",
+            "output_size": case.out_length,
+            "output_md5": case.out_md5,
+            "stripped_output_md5": case.out_stripped_md5,
+        }
+
+    digest = hashlib.sha1(json.dumps(files, sort_keys=True).encode("utf-8")).hexdigest()
+    return {
+        "digest": digest,
+        "files": files,
+        "info": {"test_case_number": len(test_cases), "spj": False, "test_cases": test_cases},
+    }
+
+
+class LocalDirectoryTarget:
+    """
+    以目录形式存放测试用例的评测节点
+
+    布局与评测机的/test_case目录一致：<root>/<test_case_id>/N.in、N.out和info。
+    远程节点可以通过NFS等方式挂载后作为目录使用。
+    """
+
+    def __init__(self, name: str, root: str):
+        self.name = name
+        self.root = root
+
+    def _case_dir(self, test_case_id: str) -> str:
+        path = os.path.normpath(os.path.join(self.root, test_case_id))
+        if not path.startswith(os.path.normpath(self.root) + os.sep):
+            raise ValueError(f"非法的测试用例ID: {test_case_id}")
+        return path
+
+    def read_manifest(self, test_case_id: str) -> Optional[Dict]:
+        try:
+            with open(os.path.join(self._case_dir(test_case_id), SYNC_MANIFEST_NAME), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_atomic(self, path: str, data) -> None:
+        staged = f"{path}.{os.getpid()}.tmp"
+        with open(staged, "wb") as f:
+            f.write(data)
+        os.replace(staged, path)
+
+    def put_file(self, test_case_id: str, name: str, data) -> None:
+        case_dir = self._case_dir(test_case_id)
+        os.makedirs(case_dir, exist_ok=True)
+        self._write_atomic(os.path.join(case_dir, name), data)
+
+    def delete_file(self, test_case_id: str, name: str) -> None:
+        try:
+            os.remove(os.path.join(self._case_dir(test_case_id), name))
+        except FileNotFoundError:
+            pass
+
+    def write_manifest(self, test_case_id: str, manifest: Dict) -> None:
+        """最后写入info和同步清单，评测机不会读到写了一半的数据"""
+        info = json.dumps(manifest["info"], ensure_ascii=False).encode("utf-8")
+        self.put_file(test_case_id, JUDGE_INFO_NAME, info)
+        sync_manifest = {"digest": manifest["digest"], "files": manifest["files"], "synced_at": time.time()}
+        self.put_file(test_case_id, SYNC_MANIFEST_NAME, json.dumps(sync_manifest).encode("utf-8"))
+
+    def remove_case(self, test_case_id: str) -> None:
+        shutil.rmtree(self._case_dir(test_case_id), ignore_errors=True)
+
+
+def load_targets() -> List[LocalDirectoryTarget]:
+    """
+    读取已登记的评测节点
+
+    JUDGE_TEST_CASE_TARGETS格式为"名称=目录"，多个节点用逗号分隔
+    """
+    targets = []
+    for item in settings.JUDGE_TEST_CASE_TARGETS.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        name, _, root = item.partition("=")
+        if not root:
+            name, root = os.path.basename(item.rstrip("/")) or "local", item
+        targets.append(LocalDirectoryTarget(name.strip(), root.strip()))
+    return targets
+
+
+class JudgeSyncService:
+    """
+    测试数据增量同步
+
+    为每道题生成内容清单（基于测试数据包，无需重新读取测试文件），与各评测节点上
+    记录的清单比较，只传输有变化的文件。
+    """
+
+    # 进程内记录各节点已同步的清单摘要，评测前的检查无需读取节点上的文件
+    _synced_digests: Dict[str, Dict[str, str]] = {}
+
+    # 题目清单的缓存 {题目路径: (数据包inode, 数据包mtime_ns, 清单)}，数据包重建后自动失效
+    _manifests: Dict[str, Tuple[int, int, Dict]] = {}
+
+    @staticmethod
+    def _problem_manifest(data_path: str, build: bool = True) -> Optional[Dict]:
+        """
+        题目的内容清单
+
+        build为False时不构建缺失或过期的数据包（用于只读的状态查询），此时返回None
+        """
+        pack = TestDataPackService.get(os.path.join(PROBLEMS_ROOT, data_path), data_path, build=build)
+        if pack is None:
+            return None
+        return JudgeSyncService._pack_manifest(data_path, pack)
+
+    @staticmethod
+    def _pack_manifest(data_path: str, pack: TestDataPack) -> Dict:
+        cached = JudgeSyncService._manifests.get(data_path)
+        if cached and cached[0] == pack.pack_inode and cached[1] == pack.pack_mtime_ns:
+            return cached[2]
+        manifest = build_manifest(pack)
+        JudgeSyncService._manifests[data_path] = (pack.pack_inode, pack.pack_mtime_ns, manifest)
+        return manifest
+
+    @staticmethod
+    def sync_problem(target: LocalDirectoryTarget, data_path: str, manifest: Optional[Dict] = None) -> Dict:
+        """将一道题同步到一个节点，返回传输统计"""
+        manifest = manifest or JudgeSyncService._problem_manifest(data_path)
+        stats = {"uploaded": 0, "deleted": 0, "bytes": 0, "changed": False}
+        if manifest is None:
+            return stats
+
+        remote = target.read_manifest(data_path)
+        if remote and remote.get("digest") == manifest["digest"]:
+            JudgeSyncService._synced_digests.setdefault(target.name, {})[data_path] = manifest["digest"]
+            return stats
+
+        # 需要传输时才打开数据包；清单生成后数据包可能已被重建，以当前数据包的清单为准
+        pack = TestDataPackService.get(os.path.join(PROBLEMS_ROOT, data_path), data_path)
+        if pack is None:
+            return stats
+        manifest = JudgeSyncService._pack_manifest(data_path, pack)
+        remote_files = (remote or {}).get("files", {})
+        for name, meta in manifest["files"].items():
+            if remote_files.get(name) == meta:
+                continue
+            number = int(name.split(".")[0])
+            data = pack.input(number) if name.endswith(".in") else pack.output(number)
+            target.put_file(data_path, name, data)
+            stats["uploaded"] += 1
+            stats["bytes"] += meta["size"]
+        for name in remote_files:
+            if name not in manifest["files"]:
+                target.delete_file(data_path, name)
+                stats["deleted"] += 1
+
+        target.write_manifest(data_path, manifest)
+        JudgeSyncService._synced_digests.setdefault(target.name, {})[data_path] = manifest["digest"]
+        stats["changed"] = True
+        return stats
+
+    @staticmethod
+    def ensure_synced(data_path: str) -> None:
+        """
+        评测前确保该题在所有节点上是最新的
+
+        清单按数据包缓存，数据未变化时只有数据包新鲜度检查（stat）和摘要比较
+        """
+        manifest = JudgeSyncService._problem_manifest(data_path)
+        if manifest is None:
+            return
+        for target in load_targets():
+            if JudgeSyncService._synced_digests.get(target.name, {}).get(data_path) == manifest["digest"]:
+                continue
+            try:
+                JudgeSyncService.sync_problem(target, data_path, manifest)
+            except Exception as e:
+                logger.warning(f"同步测试数据到节点 {target.name} 失败 {data_path}: {e}")
+
+    @staticmethod
+    def sync_all(data_paths: Optional[List[str]] = None, workers: int = SYNC_WORKERS) -> Dict:
+        """把题库（或指定题目）并行同步到所有节点"""
+        started = time.time()
+        if data_paths is None:
+            data_paths = [p.data_path for p in ProblemService.list_all_problems()]
+        targets = load_targets()
+
+        manifests = {}
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for data_path, manifest in zip(data_paths, executor.map(JudgeSyncService._problem_manifest, data_paths)):
+                if manifest is not None:
+                    manifests[data_path] = manifest
+
+        def run(job):
+            target, data_path = job
+            try:
+                return target.name, data_path, JudgeSyncService.sync_problem(target, data_path, manifests[data_path]), None
+            except Exception as e:
+                return target.name, data_path, None, str(e)
+
+        jobs = [(target, data_path) for target in targets for data_path in manifests]
+        report = {
+            target.name: {"problems": len(manifests), "changed": 0, "uploaded": 0, "deleted": 0, "bytes": 0, "errors": []}
+            for target in targets
+        }
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for node, data_path, stats, error in executor.map(run, jobs):
+                node_report = report[node]
+                if error:
+                    node_report["errors"].append({"path": data_path, "error": error})
+                    continue
+                node_report["changed"] += int(stats["changed"])
+                node_report["uploaded"] += stats["uploaded"]
+                node_report["deleted"] += stats["deleted"]
+                node_report["bytes"] += stats["bytes"]
+
+        elapsed = round(time.time() - started, 3)
+        for node, node_report in report.items():
+            node_report["elapsed"] = elapsed
+            node_report["finished_at"] = time.time()
+            RedisCache.set(SYNC_STATUS_KEY.format(node=node), node_report, expire=30 * 24 * 3600)
+        logger.info(f"测试数据同步完成，耗时 {elapsed}s: "
+                    + ", ".join(f"{n}: 更新 {r['changed']} 题" for n, r in report.items()))
+        return report
+
+    @staticmethod
+    def status(stale_limit: int = 50) -> Dict:
+        """
+        各节点的测试数据新鲜度：与题库一致、过期和缺失的题目数量
+
+        只读取已有的数据包，不构建；数据包缺失或过期的题目计入unpacked（运行同步时会重建）
+        """
+        data_paths = [p.data_path for p in ProblemService.list_all_problems()]
+        manifests = {}
+        for data_path in data_paths:
+            try:
+                manifests[data_path] = JudgeSyncService._problem_manifest(data_path, build=False)
+            except Exception as e:
+                logger.warning(f"读取测试数据包失败 {data_path}: {e}")
+                manifests[data_path] = None
+
+        nodes = []
+        for target in load_targets():
+            fresh, stale, missing = 0, [], []
+            for data_path, manifest in manifests.items():
+                if manifest is None:
+                    continue
+                remote = target.read_manifest(data_path)
+                if remote is None:
+                    missing.append(data_path)
+                elif remote.get("digest") != manifest["digest"]:
+                    stale.append(data_path)
+                else:
+                    fresh += 1
+            nodes.append({
+                "name": target.name,
+                "root": target.root,
+                "fresh": fresh,
+                "stale_count": len(stale),
+                "missing_count": len(missing),
+                "stale": stale[:stale_limit],
+                "missing": missing[:stale_limit],
+                "last_run": RedisCache.get(SYNC_STATUS_KEY.format(node=target.name)),
+            })
+
+        return {
+            "problems": sum(1 for m in manifests.values() if m is not None),
+            "unpacked": sum(1 for m in manifests.values() if m is None),
+            "nodes": nodes
+        }
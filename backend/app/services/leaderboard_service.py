@@ -0,0 +1,285 @@
+import logging
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.models import Exercise, Submission, SubmissionSummary, User
+from app.models.class_model import student_class, class_course
+from app.models.exercise import exercise_problem
+from app.utils.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+# 排行榜键：scope为班级ID，"all"表示练习关联的全部班级
+PROBLEM_BOARD_KEY = "leaderboard:problem:{exercise_id}:{problem_id}:{scope}"
+EXERCISE_BOARD_KEY = "leaderboard:exercise:{exercise_id}:{scope}"
+
+# 练习排行榜的构建标记，值为构建时的班级成员版本号
+BUILT_KEY = "leaderboard:built:{exercise_id}"
+
+# 学生班级或课程班级变化时递增，排行榜据此判断是否需要重建
+MEMBERSHIP_VERSION_KEY = "leaderboard:membership_version"
+
+# 构建标记过期后下一次读取时从数据库重建；排行榜本身多保留一天，避免标记过期前先过期
+BUILT_EXPIRE = 7 * 24 * 3600
+BOARD_EXPIRE = BUILT_EXPIRE + 24 * 3600
+
+ALL_SCOPE = "all"
+
+# 综合分 = 分数 * 2^32 + (2^32 - 1 - 提交时间戳)：分数高者在前，同分时提交早者在前。
+# 练习总分不超过几千分，综合分远小于2^53，双精度浮点可以精确表示
+TIME_BASE = 2 ** 32
+
+Scope = Union[int, str]
+
+
+def encode_score(score: int, submitted_at: Optional[datetime]) -> int:
+    timestamp = int(submitted_at.timestamp()) if submitted_at else TIME_BASE - 1
+    return int(score) * TIME_BASE + (TIME_BASE - 1 - min(max(timestamp, 0), TIME_BASE - 1))
+
+
+def decode_score(value: float) -> int:
+    return int(value) // TIME_BASE
+
+
+class LeaderboardService:
+    """
+    基于Redis有序集合的排行榜
+
+    每个(练习, 题目, 班级)和(练习, 班级)各维护一个有序集合，成员为学生ID。
+    题目排行按最新一次提交的成绩，练习排行按各题最高分之和，与原有排名规则一致。
+    评测结束后增量更新；查询名次、分页读取均为O(log n)。
+    Redis中的数据丢失或班级成员变化后，下一次读取时从提交汇总表重建。
+    """
+
+    # ---------- 范围 ----------
+
+    @staticmethod
+    def _course_class_ids(db: Session, exercise_id: int) -> Optional[List[int]]:
+        """练习所属课程关联的班级，练习不存在时返回None"""
+        course_id = db.query(Exercise.course_id).filter(Exercise.id == exercise_id).scalar()
+        if course_id is None:
+            exists = db.query(Exercise.id).filter(Exercise.id == exercise_id).first()
+            return [] if exists else None
+        return [row[0] for row in db.query(class_course.c.class_id).filter(class_course.c.course_id == course_id)]
+
+    @staticmethod
+    def _student_scopes(db: Session, exercise_id: int, user_ids: Iterable[int]) -> Dict[int, List[Scope]]:
+        """
+        学生在该练习中所属的排行榜范围
+
+        课程关联了班级时，只有这些班级中的学生参与排名；课程没有关联班级时，所有学生都计入"all"
+        """
+        user_ids = list(user_ids)
+        class_ids = LeaderboardService._course_class_ids(db, exercise_id)
+        if class_ids is None or not user_ids:
+            return {}
+        if not class_ids:
+            return {user_id: [ALL_SCOPE] for user_id in user_ids}
+
+        scopes: Dict[int, List[Scope]] = {}
+        rows = db.query(student_class.c.student_id, student_class.c.class_id).filter(
+            student_class.c.student_id.in_(user_ids),
+            student_class.c.class_id.in_(class_ids)
+        )
+        for user_id, class_id in rows:
+            scopes.setdefault(user_id, [ALL_SCOPE]).append(class_id)
+        return scopes
+
+    # ---------- 成绩 ----------
+
+    @staticmethod
+    def _exercise_totals(db: Session, exercise_id: int, user_ids: Optional[List[int]] = None) -> Dict[int, int]:
+        """各学生在练习中的综合分：各题最高分之和，同分时按达到该分数的时间排序"""
+        query = (
+            db.query(
+                SubmissionSummary.user_id,
+                func.sum(SubmissionSummary.best_score),
+                func.max(Submission.submitted_at),
+            )
+            # 只统计练习当前包含的题目，与统计页、成绩册和导出一致
+            .join(exercise_problem, (exercise_problem.c.exercise_id == SubmissionSummary.exercise_id)
+                  & (exercise_problem.c.problem_id == SubmissionSummary.problem_id))
+            .outerjoin(Submission, Submission.id == SubmissionSummary.best_submission_id)
+            .filter(SubmissionSummary.exercise_id == exercise_id)
+        )
+        if user_ids is not None:
+            query = query.filter(SubmissionSummary.user_id.in_(user_ids))
+        return {
+            user_id: encode_score(total or 0, reached_at)
+            for user_id, total, reached_at in query.group_by(SubmissionSummary.user_id)
+        }
+
+    # ---------- 增量更新 ----------
+
+    @staticmethod
+    def on_verdict(db: Session, submission: Submission) -> Optional[Dict[str, int]]:
+        """
+        评测结束（汇总表已提交）后更新该学生所在的排行榜，Redis不可用时只记录日志
+
+        Returns:
+            学生在练习全部班级范围内的最新名次 {"problem_rank", "exercise_rank", "exercise_score"}，未更新时为None
+        """
+        if not submission.exercise_id or submission.user_id is None:
+            return None
+        try:
+            if not LeaderboardService._is_built(submission.exercise_id):
+                # 排行榜尚未构建，下一次读取时会从数据库完整构建
+                return None
+            role = db.query(User.role).filter(User.id == submission.user_id).scalar()
+            if role != "student":
+                return None
+            scopes = LeaderboardService._student_scopes(db, submission.exercise_id, [submission.user_id])
+            scopes = scopes.get(submission.user_id)
+            if not scopes:
+                return None
+
+            summary = db.query(SubmissionSummary).filter(
+                SubmissionSummary.exercise_id == submission.exercise_id,
+                SubmissionSummary.problem_id == submission.problem_id,
+                SubmissionSummary.user_id == submission.user_id
+            ).first()
+            if summary is None:
+                return None
+            problem_score = encode_score(summary.latest_score, summary.last_submitted_at)
+            exercise_score = LeaderboardService._exercise_totals(
+                db, submission.exercise_id, [submission.user_id]
+            ).get(submission.user_id)
+
+            pipe = redis_client.pipeline(transaction=False)
+            for scope in scopes:
+                pipe.zadd(PROBLEM_BOARD_KEY.format(exercise_id=submission.exercise_id,
+                                                   problem_id=submission.problem_id, scope=scope),
+                          {submission.user_id: problem_score})
+                if exercise_score is not None:
+                    pipe.zadd(EXERCISE_BOARD_KEY.format(exercise_id=submission.exercise_id, scope=scope),
+                              {submission.user_id: exercise_score})
+            pipe.zrevrank(PROBLEM_BOARD_KEY.format(exercise_id=submission.exercise_id,
+                                                   problem_id=submission.problem_id, scope=ALL_SCOPE),
+                          submission.user_id)
+            pipe.zrevrank(EXERCISE_BOARD_KEY.format(exercise_id=submission.exercise_id, scope=ALL_SCOPE),
+                          submission.user_id)
+            problem_rank, exercise_rank = pipe.execute()[-2:]
+            return {
+                "problem_rank": problem_rank + 1 if problem_rank is not None else None,
+                "exercise_rank": exercise_rank + 1 if exercise_rank is not None else None,
+                "exercise_score": decode_score(exercise_score) if exercise_score is not None else None,
+            }
+        except Exception as e:
+            logger.warning(f"更新排行榜失败: {e}")
+            return None
+
+    @staticmethod
+    def bump_membership_version() -> None:
+        """学生或课程的班级关系变化后调用，所有排行榜在下次读取时重建"""
+        try:
+            redis_client.incr(MEMBERSHIP_VERSION_KEY)
+        except Exception as e:
+            logger.warning(f"更新排行榜班级版本失败: {e}")
+
+    @staticmethod
+    def invalidate(exercise_id: int) -> None:
+        """练习的题目变化后调用，该练习的排行榜在下次读取时重建"""
+        try:
+            redis_client.delete(BUILT_KEY.format(exercise_id=exercise_id))
+        except Exception as e:
+            logger.warning(f"清除排行榜构建标记失败: {e}")
+
+    # ---------- 构建 ----------
+
+    @staticmethod
+    def _membership_version() -> str:
+        return redis_client.get(MEMBERSHIP_VERSION_KEY) or "0"
+
+    @staticmethod
+    def _is_built(exercise_id: int) -> bool:
+        built = redis_client.get(BUILT_KEY.format(exercise_id=exercise_id))
+        return built is not None and built == LeaderboardService._membership_version()
+
+    @staticmethod
+    def rebuild_exercise(db: Session, exercise_id: int) -> Dict[str, int]:
+        """从提交汇总表重建一个练习的全部排行榜"""
+        version = LeaderboardService._membership_version()
+
+        rows = (
+            db.query(SubmissionSummary.user_id, SubmissionSummary.problem_id,
+                     SubmissionSummary.latest_score, SubmissionSummary.last_submitted_at)
+            .join(User, User.id == SubmissionSummary.user_id)
+            .filter(SubmissionSummary.exercise_id == exercise_id, User.role == "student")
+            .all()
+        )
+        scopes = LeaderboardService._student_scopes(db, exercise_id, {row[0] for row in rows})
+        totals = LeaderboardService._exercise_totals(db, exercise_id, list(scopes)) if scopes else {}
+
+        boards: Dict[str, Dict[int, int]] = {}
+        for user_id, problem_id, latest_score, last_submitted_at in rows:
+            for scope in scopes.get(user_id, []):
+                key = PROBLEM_BOARD_KEY.format(exercise_id=exercise_id, problem_id=problem_id, scope=scope)
+                boards.setdefault(key, {})[user_id] = encode_score(latest_score, last_submitted_at)
+        for user_id, score in totals.items():
+            for scope in scopes.get(user_id, []):
+                key = EXERCISE_BOARD_KEY.format(exercise_id=exercise_id, scope=scope)
+                boards.setdefault(key, {})[user_id] = score
+
+        # 先写入临时键再RENAME，读者不会看到只写了一半的排行榜
+        stale_keys = set(redis_client.scan_iter(match=f"leaderboard:problem:{exercise_id}:*", count=500))
+        stale_keys.update(redis_client.scan_iter(match=f"leaderboard:exercise:{exercise_id}:*", count=500))
+        pipe = redis_client.pipeline(transaction=False)
+        for key, members in boards.items():
+            staged = f"{key}:rebuild"
+            pipe.delete(staged)
+            pipe.zadd(staged, members)
+            pipe.expire(staged, BOARD_EXPIRE)
+        pipe.execute()
+
+        pipe = redis_client.pipeline(transaction=True)
+        for key in boards:
+            pipe.rename(f"{key}:rebuild", key)
+            stale_keys.discard(key)
+        if stale_keys:
+            pipe.delete(*stale_keys)
+        pipe.set(BUILT_KEY.format(exercise_id=exercise_id), version, ex=BUILT_EXPIRE)
+        pipe.execute()
+
+        return {"boards": len(boards), "students": len(scopes)}
+
+    @staticmethod
+    def ensure_built(db: Session, exercise_id: int) -> None:
+        if not LeaderboardService._is_built(exercise_id):
+            LeaderboardService.rebuild_exercise(db, exercise_id)
+
+    @staticmethod
+    def rebuild_all(db: Session) -> Dict[str, int]:
+        """重建所有练习的排行榜"""
+        stats = {"exercises": 0, "boards": 0}
+        for (exercise_id,) in db.query(Exercise.id).all():
+            result = LeaderboardService.rebuild_exercise(db, exercise_id)
+            stats["exercises"] += 1
+            stats["boards"] += result["boards"]
+        return stats
+
+    # ---------- 查询 ----------
+
+    @staticmethod
+    def board_key(exercise_id: int, problem_id: Optional[int], scope: Scope) -> str:
+        if problem_id is None:
+            return EXERCISE_BOARD_KEY.format(exercise_id=exercise_id, scope=scope)
+        return PROBLEM_BOARD_KEY.format(exercise_id=exercise_id, problem_id=problem_id, scope=scope)
+
+    @staticmethod
+    def page(key: str, offset: int = 0, limit: Optional[int] = None) -> Tuple[List[Tuple[int, int]], int]:
+        """按名次读取一页，返回[(学生ID, 分数)]和排行榜人数"""
+        end = -1 if limit is None else offset + limit - 1
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.zrevrange(key, offset, end, withscores=True)
+        pipe.zcard(key)
+        members, count = pipe.execute()
+        return [(int(member), decode_score(value)) for member, value in members], count
+
+    @staticmethod
+    def rank(key: str, user_id: int) -> Optional[int]:
+        """学生的名次（从1开始），不在排行榜中时返回None"""
+        rank = redis_client.zrevrank(key, user_id)
+        return rank + 1 if rank is not None else None
@@ -0,0 +1,282 @@
+import os
+import re
+import csv
+import gzip
+import json
+import hashlib
+import logging
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# 按月分区的表及其分区键
+PARTITIONED_TABLES = {
+    "submissions": "submitted_at",
+    "operation_logs": "created_at",
+}
+
+# 提前创建的月份数（含当月）
+MONTHS_AHEAD = 3
+
+# 默认保留在线上的月份数，更早的分区由归档任务移出
+KEEP_MONTHS = 12
+
+# 分离出的分区所在的schema，仍可直接用SQL查询
+ARCHIVE_SCHEMA = "archive"
+
+# 导出的压缩归档文件目录（backend容器中挂载到宿主机的data目录）
+ARCHIVE_ROOT = os.getenv("PARTITION_ARCHIVE_ROOT", "/app/data/archive")
+
+# 创建分区时的咨询锁，多个worker同时启动时只有一个执行
+ADVISORY_LOCK_ID = 0x434A5054
+
+_UPPER_BOUND_RE = re.compile(r"TO \('([^']+)'\)")
+
+
+def _month_start(value: datetime) -> datetime:
+    return datetime(value.year, value.month, 1)
+
+
+def _add_months(month: datetime, count: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + count
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table: str, month: datetime) -> str:
+    return f"{table}_{month:%Y%m}"
+
+
+class PartitionService:
+    """
+    提交记录和操作日志的按月分区
+
+    submissions按submitted_at、operation_logs按created_at做范围分区，每月一个分区，
+    另有一个DEFAULT分区兜底。ensure_partitions()在启动时和定时任务中提前创建后几个月的分区；
+    archive()把超过保留期的分区分离到archive schema并去掉外键（不再参与线上查询和VACUUM，仍可用SQL审计），
+    export()再把它们导出为gzip压缩的CSV文件并删除，query_export()可直接按条件检索导出文件。
+    """
+
+    @staticmethod
+    def is_partitioned(db: Session, table: str) -> bool:
+        return bool(db.execute(
+            text("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:table)"),
+            {"table": f"public.{table}"}
+        ).scalar())
+
+    @staticmethod
+    def list_partitions(db: Session, table: str) -> List[Dict[str, Any]]:
+        """表的分区（不含DEFAULT分区），按上界排序；上界为None表示无法解析"""
+        rows = db.execute(text(
+            "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) "
+            "FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(:table)"
+        ), {"table": f"public.{table}"}).all()
+        partitions = []
+        for name, bound in rows:
+            if bound == "DEFAULT":
+                continue
+            match = _UPPER_BOUND_RE.search(bound or "")
+            upper = datetime.fromisoformat(match.group(1)[:19]) if match else None
+            partitions.append({"name": name, "bound": bound, "upper": upper})
+        partitions.sort(key=lambda p: p["upper"] or datetime.max)
+        return partitions
+
+    @staticmethod
+    def _create_partition(db: Session, table: str, month: datetime) -> None:
+        """
+        创建一个月的分区
+
+        DEFAULT分区中已有该月的数据时（如分区没有及时创建），先分离DEFAULT分区，
+        建好新分区后把这些行移过去，再重新挂回
+        """
+        key = PARTITIONED_TABLES[table]
+        name = partition_name(table, month)
+        default = f"{table}_default"
+        params = {"start": month, "end": _add_months(month, 1)}
+        bounds = f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{_add_months(month, 1):%Y-%m-%d}')"
+
+        has_default = db.execute(text("SELECT to_regclass(:name) IS NOT NULL"), {"name": f"public.{default}"}).scalar()
+        stranded = has_default and db.execute(text(
+            f"SELECT EXISTS (SELECT 1 FROM {default} WHERE {key} >= :start AND {key} < :end)"
+        ), params).scalar()
+
+        if not stranded:
+            db.execute(text(f"CREATE TABLE {name} PARTITION OF {table} {bounds}"))
+            return
+        db.execute(text(f"ALTER TABLE {table} DETACH PARTITION {default}"))
+        db.execute(text(f"CREATE TABLE {name} PARTITION OF {table} {bounds}"))
+        db.execute(text(f"INSERT INTO {name} SELECT * FROM {default} WHERE {key} >= :start AND {key} < :end"), params)
+        db.execute(text(f"DELETE FROM {default} WHERE {key} >= :start AND {key} < :end"), params)
+        db.execute(text(f"ALTER TABLE {table} ATTACH PARTITION {default} DEFAULT"))
+        logger.warning(f"{name}: 已把DEFAULT分区中的数据移入新分区")
+
+    @staticmethod
+    def ensure_partitions(db: Session, months_ahead: int = MONTHS_AHEAD, now: Optional[datetime] = None) -> List[str]:
+        """
+        创建从当月起months_ahead个月内缺少的分区，返回新建的分区名
+
+        已有分区按月连续，从最后一个分区的上界（或当月）开始补齐；表未分区时跳过
+        """
+        current = _month_start(now or datetime.now())
+        created = []
+        try:
+            db.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": ADVISORY_LOCK_ID})
+            for table in PARTITIONED_TABLES:
+                if not PartitionService.is_partitioned(db, table):
+                    logger.info(f"{table} 不是分区表，跳过")
+                    continue
+                uppers = [p["upper"] for p in PartitionService.list_partitions(db, table) if p["upper"]]
+                month = max([current] + uppers)
+                while month < _add_months(current, months_ahead):
+                    PartitionService._create_partition(db, table, month)
+                    created.append(partition_name(table, month))
+                    month = _add_months(month, 1)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        if created:
+            logger.info(f"已创建分区: {', '.join(created)}")
+        return created
+
+    @staticmethod
+    def drop_foreign_keys(db: Session, qualified: str) -> List[str]:
+        """
+        删除表上的全部外键约束，返回删除的约束名
+
+        分离出的分区仍保留从父表继承的外键，会阻止删除题目、用户等被引用的记录；
+        归档数据只用于审计，不需要参照完整性
+        """
+        names = [row[0] for row in db.execute(text(
+            "SELECT conname FROM pg_constraint WHERE conrelid = to_regclass(:table) AND contype = 'f'"
+        ), {"table": qualified}).all()]
+        for name in names:
+            db.execute(text(f'ALTER TABLE {qualified} DROP CONSTRAINT "{name}"'))
+        return names
+
+    @staticmethod
+    def archive(db: Session, keep_months: int = KEEP_MONTHS, now: Optional[datetime] = None) -> List[str]:
+        """把上界早于保留期的分区分离并移入archive schema、去掉外键，返回移出的分区名"""
+        cutoff = _add_months(_month_start(now or datetime.now()), -keep_months)
+        archived = []
+        try:
+            db.execute(text(f"CREATE SCHEMA IF NOT EXISTS {ARCHIVE_SCHEMA}"))
+            for table in PARTITIONED_TABLES:
+                if not PartitionService.is_partitioned(db, table):
+                    continue
+                for partition in PartitionService.list_partitions(db, table):
+                    if partition["upper"] is None or partition["upper"] > cutoff:
+                        continue
+                    name = partition["name"]
+                    db.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name}"))
+                    db.execute(text(f"ALTER TABLE {name} SET SCHEMA {ARCHIVE_SCHEMA}"))
+                    db.execute(text(f"COMMENT ON TABLE {ARCHIVE_SCHEMA}.{name} IS :comment"),
+                               {"comment": f"{table} {partition['bound']}"})
+                    archived.append(name)
+            # 包括之前归档时遗留了外键的分区
+            for name, _ in PartitionService.list_archived(db):
+                PartitionService.drop_foreign_keys(db, f"{ARCHIVE_SCHEMA}.{name}")
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        if archived:
+            logger.info(f"已归档分区: {', '.join(archived)}")
+        return archived
+
+    @staticmethod
+    def list_archived(db: Session) -> List[Tuple[str, Optional[str]]]:
+        """archive schema中的分区及其原表和范围说明"""
+        return db.execute(text(
+            "SELECT c.relname, obj_description(c.oid, 'pg_class') FROM pg_class c "
+            "JOIN pg_namespace n ON n.oid = c.relnamespace "
+            "WHERE n.nspname = :schema AND c.relkind = 'r' ORDER BY c.relname"
+        ), {"schema": ARCHIVE_SCHEMA}).all()
+
+    @staticmethod
+    def _copy_out(db: Session, query: str, path: str) -> str:
+        """COPY查询结果为gzip压缩的CSV，返回文件的SHA-256"""
+        tmp_path = path + ".tmp"
+        raw = db.connection().connection
+        with gzip.open(tmp_path, "wb") as f:
+            raw.cursor().copy_expert(f"COPY ({query}) TO STDOUT WITH (FORMAT csv, HEADER)", f)
+        digest = hashlib.sha256()
+        with open(tmp_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        os.replace(tmp_path, path)
+        return digest.hexdigest()
+
+    @staticmethod
+    def export(db: Session, name: str, archive_root: str = ARCHIVE_ROOT) -> Dict[str, Any]:
+        """
+        把archive schema中的一个分区导出为 <archive_root>/<原表>/<分区>.csv.gz 并删除
+
+        提交记录的导出同时带上压缩代码（code_blob列，bytea的十六进制形式）和测试点详情
+        （<分区>.case_results.csv.gz），然后减少代码的引用计数、删除测试点详情；
+        导出文件旁写入manifest（行数、范围、SHA-256）
+        """
+        archived = dict(PartitionService.list_archived(db))
+        if name not in archived:
+            raise ValueError(f"archive schema中没有分区 {name}")
+        table = next((t for t in PARTITIONED_TABLES if name.startswith(t + "_")), None)
+        if table is None:
+            raise ValueError(f"无法识别分区 {name} 所属的表")
+
+        qualified = f"{ARCHIVE_SCHEMA}.{name}"
+        directory = os.path.join(archive_root, table)
+        os.makedirs(directory, exist_ok=True)
+        manifest = {
+            "table": table,
+            "partition": name,
+            "bound": archived[name],
+            "exported_at": datetime.now().isoformat(timespec="seconds"),
+            "rows": db.execute(text(f"SELECT count(*) FROM {qualified}")).scalar(),
+            "files": {},
+        }
+
+        try:
+            if table == "submissions":
+                path = os.path.join(directory, f"{name}.csv.gz")
+                manifest["files"][os.path.basename(path)] = PartitionService._copy_out(
+                    db, f"SELECT p.*, b.data AS code_blob FROM {qualified} p "
+                        f"LEFT JOIN code_blobs b ON b.hash = p.code_hash ORDER BY p.id", path)
+                path = os.path.join(directory, f"{name}.case_results.csv.gz")
+                manifest["files"][os.path.basename(path)] = PartitionService._copy_out(
+                    db, f"SELECT c.* FROM submission_case_results c JOIN {qualified} p ON p.id = c.submission_id "
+                        f"ORDER BY c.submission_id, c.test_case", path)
+                db.execute(text(
+                    f"DELETE FROM submission_case_results c USING {qualified} p WHERE p.id = c.submission_id"
+                ))
+                db.execute(text(
+                    f"UPDATE code_blobs b SET ref_count = b.ref_count - r.refs "
+                    f"FROM (SELECT code_hash, count(*) AS refs FROM {qualified} "
+                    f"WHERE code_hash IS NOT NULL GROUP BY code_hash) r WHERE b.hash = r.code_hash"
+                ))
+            else:
+                path = os.path.join(directory, f"{name}.csv.gz")
+                manifest["files"][os.path.basename(path)] = PartitionService._copy_out(
+                    db, f"SELECT * FROM {qualified} ORDER BY id", path)
+
+            with open(os.path.join(directory, f"{name}.manifest.json"), "w", encoding="utf-8") as f:
+                json.dump(manifest, f, ensure_ascii=False, indent=2)
+            db.execute(text(f"DROP TABLE {qualified}"))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        logger.info(f"{name}: 已导出 {manifest['rows']} 行到 {directory}")
+        return manifest
+
+    @staticmethod
+    def query_export(path: str, filters: Optional[Dict[str, str]] = None) -> Iterator[Dict[str, str]]:
+        """逐行读取导出的csv.gz，返回各列都等于filters中对应值的行"""
+        filters = filters or {}
+        with gzip.open(path, "rt", encoding="utf-8", newline="") as f:
+            for row in csv.DictReader(f):
+                if all(row.get(column) == value for column, value in filters.items()):
+                    yield row
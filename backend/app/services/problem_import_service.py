@@ -0,0 +1,336 @@
+import os
+import re
+import time
+import uuid
+import shutil
+import zipfile
+import subprocess
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.models import Problem
+from app.services.problem_service import ProblemService, PROBLEMS_ROOT, problem_html_cache
+from app.services.html_cache_service import HTML_CANDIDATES
+from app.services.encoding_service import BankEncodingService, detect_encoding
+from app.services.problem_reconcile_service import ProblemReconcileService
+from app.services.testdata_pack_service import TestDataPackService
+from app.services.judge_runner_service import run_program_limited, JUDGE_MAX_WORKERS
+from app.utils.path_utils import normalize_problem_path
+
+logger = logging.getLogger(__name__)
+
+# 导入暂存目录：与题库位于同一挂载点，解压校验完成后可以原子地移动到题库中；
+# 放在题库目录之外，避免暂存中的题目被题库扫描到
+IMPORT_STAGING_ROOT = os.path.join(os.path.dirname(PROBLEMS_ROOT), ".problem_import")
+
+# 压缩包限制
+MAX_UPLOAD_SIZE = 512 * 1024 * 1024  # 512MB
+MAX_ARCHIVE_ENTRIES = 20000
+MAX_UNCOMPRESSED_SIZE = 1024 * 1024 * 1024  # 1GB
+
+# 参考答案文件名
+STD_ANSWER_NAME = "StdAnswer.c"
+
+# 测试数据可以放在题目目录下，也可以放在题目目录的TestData子目录中
+TEST_DATA_DIR = "testdata"
+
+# 生成输出时参考答案的最长运行时间（秒）
+REFERENCE_TIMEOUT = 10
+
+_CASE_RE = re.compile(r"^(\d+)\.(in|out)$")
+
+
+def _run_reference(exe_path: str, input_path: str, output_path: str, timeout: float) -> Tuple[str, Optional[str]]:
+    """
+    运行参考答案，为一组输入生成输出文件
+
+    参考答案来自上传的压缩包，与评测程序一样占用评测槽位并在资源限制（CPU时间、内存、输出大小）下运行
+
+    Returns:
+        (输出文件路径, 错误信息；成功时为None)
+    """
+    try:
+        with open(input_path, "rb") as f:
+            input_data = f.read()
+        run = run_program_limited(exe_path, input_data, int(timeout * 1000), timeout=None)
+        if run["status"] != "OK":
+            if run["status"] == "Runtime Error":
+                return output_path, f"参考答案运行错误（返回值 {run['exit_code']}）"
+            return output_path, f"参考答案运行失败: {run['status']}"
+        with open(output_path, "wb") as f:
+            f.write(run["output"])
+        return output_path, None
+    except Exception as e:
+        return output_path, str(e)
+
+
+def _member_name(info: zipfile.ZipInfo) -> str:
+    """获取压缩包成员文件名；Windows下打包的中文文件名通常是GBK编码"""
+    name = info.filename
+    if not info.flag_bits & 0x800:
+        try:
+            name = name.encode("cp437").decode("gbk")
+        except (UnicodeEncodeError, UnicodeDecodeError):
+            pass
+    return name.replace("\\", "/")
+
+
+class ProblemImportService:
+    """
+    从zip压缩包批量导入题目
+
+    压缩包中每个包含Question.INF的目录视为一道题，目录中可包含题面HTML、StdAnswer.c
+    以及N.in/N.out测试数据（也可以放在TestData子目录中）。缺少的.out文件由参考答案生成。
+    """
+
+    @staticmethod
+    def _extract(zip_path: str, staging_dir: str, archive_name: Optional[str] = None) -> List[str]:
+        """
+        解压压缩包中的题目目录到暂存目录，返回暂存目录中的题目目录列表
+
+        Question.INF位于压缩包根目录时，题目名取上传时的文件名（archive_name，不含扩展名）
+        """
+        with zipfile.ZipFile(zip_path) as archive:
+            members = [info for info in archive.infolist() if not info.is_dir()]
+            if len(members) > MAX_ARCHIVE_ENTRIES:
+                raise ValueError(f"压缩包文件数量超过限制（{MAX_ARCHIVE_ENTRIES}）")
+            if sum(info.file_size for info in members) > MAX_UNCOMPRESSED_SIZE:
+                raise ValueError("压缩包解压后大小超过限制")
+
+            names = {info: _member_name(info) for info in members}
+            for name in names.values():
+                parts = name.split("/")
+                if name.startswith("/") or ".." in parts or re.match(r"^[a-zA-Z]:", name):
+                    raise ValueError(f"压缩包中包含非法路径: {name}")
+
+            # 包含Question.INF的目录即为题目目录
+            problem_roots = sorted({
+                os.path.dirname(name) for name in names.values()
+                if os.path.basename(name) == "Question.INF"
+            })
+            if not problem_roots:
+                raise ValueError("压缩包中没有找到包含Question.INF的题目目录")
+
+            problem_dirs = {}
+            for root in problem_roots:
+                problem_name = os.path.basename(root) or os.path.splitext(os.path.basename(archive_name or zip_path))[0]
+                if problem_name in problem_dirs.values():
+                    raise ValueError(f"压缩包中存在重名题目: {problem_name}")
+                problem_dirs[root] = problem_name
+
+            for info, name in names.items():
+                directory, filename = os.path.split(name)
+                root = directory
+                if os.path.basename(directory).lower() == TEST_DATA_DIR:
+                    # TestData子目录中的测试数据平铺到题目目录
+                    if not _CASE_RE.match(filename):
+                        continue
+                    root = os.path.dirname(directory)
+                if root not in problem_dirs:
+                    continue
+
+                target = os.path.join(staging_dir, problem_dirs[root], filename)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                with archive.open(info) as source, open(target, "wb") as dest:
+                    shutil.copyfileobj(source, dest, 1024 * 1024)
+
+        return [os.path.join(staging_dir, name) for name in problem_dirs.values()]
+
+    @staticmethod
+    def _validate(problem_dir: str, category: str, overwrite: bool) -> Dict:
+        """校验题目目录，需要生成输出时编译参考答案（每道题只编译一次）"""
+        name = os.path.basename(problem_dir)
+        result = {"name": name, "dir": problem_dir, "error": None, "missing_outputs": [], "exe": None}
+
+        if not re.match(r"^[\w\-]+$", name):
+            result["error"] = "题目目录名只能包含字母、数字、下划线和中划线"
+            return result
+
+        problem_info = ProblemService.parse_question_inf(os.path.join(problem_dir, "Question.INF"), name, category)
+        if not problem_info:
+            result["error"] = "无法解析Question.INF"
+            return result
+        result["info"] = problem_info
+
+        files = set(os.listdir(problem_dir))
+        if not any(candidate.format(name=name) in files for candidate in HTML_CANDIDATES):
+            result["error"] = "缺少题面HTML文件"
+            return result
+
+        inputs = sorted(
+            (int(m.group(1)) for m in map(_CASE_RE.match, files) if m and m.group(2) == "in")
+        )
+        if not inputs:
+            result["error"] = "缺少测试输入文件"
+            return result
+        result["cases"] = len(inputs)
+        result["missing_outputs"] = [n for n in inputs if f"{n}.out" not in files]
+
+        if os.path.exists(os.path.join(PROBLEMS_ROOT, category, name)) and not overwrite:
+            result["error"] = "题库中已存在同名题目"
+            return result
+
+        if result["missing_outputs"]:
+            source = os.path.join(problem_dir, STD_ANSWER_NAME)
+            if not os.path.exists(source):
+                result["error"] = f"缺少输出文件且没有{STD_ANSWER_NAME}"
+                return result
+            exe_path = os.path.join(os.path.dirname(problem_dir), f".{name}.std")
+            compile_process = subprocess.run(
+                ["gcc", "-O2", "-o", exe_path, source, "-lm"],
+                stdout=subprocess.PIPE, stderr=subprocess.PIPE
+            )
+            if compile_process.returncode != 0:
+                result["error"] = f"{STD_ANSWER_NAME}编译失败: {compile_process.stderr.decode('utf-8', errors='replace')[:500]}"
+                return result
+            result["exe"] = exe_path
+
+        return result
+
+    @staticmethod
+    def import_zip(db: Session, zip_path: str, category: str, overwrite: bool = False, owner_id: Optional[int] = None,
+                   archive_name: Optional[str] = None) -> Dict:
+        """
+        导入压缩包中的题目
+
+        Args:
+            db: 数据库会话
+            zip_path: 已保存到磁盘的压缩包路径
+            category: 导入到的题库分类（相对题库根目录）
+            overwrite: 是否覆盖题库中的同名题目
+            owner_id: 导入者ID
+            archive_name: 上传的压缩包文件名（暂存的压缩包使用随机文件名）
+
+        Returns:
+            导入报告
+        """
+        started = time.time()
+        category = normalize_problem_path(category)
+        if not category or ".." in category.split("/"):
+            raise ValueError("题库分类无效")
+
+        os.makedirs(IMPORT_STAGING_ROOT, exist_ok=True)
+        staging_dir = os.path.join(IMPORT_STAGING_ROOT, uuid.uuid4().hex)
+        os.makedirs(staging_dir)
+
+        report = {"imported": [], "skipped": [], "generated_outputs": 0}
+        try:
+            problem_dirs = ProblemImportService._extract(zip_path, staging_dir, archive_name)
+
+            # 1. 并行校验并编译参考答案
+            workers = min(len(problem_dirs), os.cpu_count() or 4) or 1
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(
+                    lambda d: ProblemImportService._validate(d, category, overwrite), problem_dirs
+                ))
+
+            valid = {}
+            for result in results:
+                if result["error"]:
+                    report["skipped"].append({"name": result["name"], "reason": result["error"]})
+                else:
+                    valid[result["name"]] = result
+
+            # 2. 运行参考答案生成缺少的输出文件（并发数受评测槽位限制）
+            jobs = [
+                (result["name"], result["exe"], os.path.join(result["dir"], f"{n}.in"), os.path.join(result["dir"], f"{n}.out"))
+                for result in valid.values() for n in result["missing_outputs"]
+            ]
+            if jobs:
+                with ThreadPoolExecutor(max_workers=JUDGE_MAX_WORKERS) as executor:
+                    futures = [
+                        (name, executor.submit(_run_reference, exe, input_path, output_path, REFERENCE_TIMEOUT))
+                        for name, exe, input_path, output_path in jobs
+                    ]
+                    for name, future in futures:
+                        output_path, error = future.result()
+                        if error and name in valid:
+                            report["skipped"].append({
+                                "name": name, "reason": f"{os.path.basename(output_path)}: {error}"
+                            })
+                            del valid[name]
+                        elif not error:
+                            report["generated_outputs"] += 1
+
+            # 3. 移动到题库
+            target_root = os.path.join(PROBLEMS_ROOT, category)
+            os.makedirs(target_root, exist_ok=True)
+            imported = []
+            for name, result in valid.items():
+                if result["exe"] and os.path.exists(result["exe"]):
+                    os.remove(result["exe"])
+                target = os.path.join(target_root, name)
+                if os.path.exists(target):
+                    shutil.rmtree(target)
+                os.replace(result["dir"], target)
+                try:
+                    BankEncodingService.normalize_problem(target)
+                    TestDataPackService.build(target, result["info"].data_path)
+                except Exception as e:
+                    logger.warning(f"生成编码清单或测试数据包失败 {target}: {e}")
+                imported.append(result)
+
+            # 4. 批量更新数据库、检索索引和题面缓存
+            catalog = [result["info"] for result in imported]
+            if catalog:
+                # 覆盖导入时题库中原有的题目保持原来的所有者，只有本次新增的题目记录导入者
+                existing_keys = {
+                    row[0] for row in db.query(Problem.path_key).filter(
+                        Problem.path_key.in_([normalize_problem_path(info.data_path) for info in catalog])
+                    )
+                }
+                reconcile_report = ProblemReconcileService.reconcile(db, catalog=catalog)
+                report["inserted"] = reconcile_report["inserted"]
+                report["updated"] = reconcile_report["updated"]
+                ProblemImportService._save_reference_answers(db, imported, target_root, owner_id, existing_keys)
+
+            from app.services.search_service import problem_search_index
+            for result in imported:
+                data_path = result["info"].data_path
+                problem_html_cache.invalidate(data_path)
+                try:
+                    problem_search_index.index_problem(result["info"])
+                except Exception as e:
+                    logger.warning(f"更新检索索引失败 {data_path}: {e}")
+                report["imported"].append({"data_path": data_path, "cases": result["cases"]})
+        finally:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+
+        report["elapsed"] = round(time.time() - started, 3)
+        logger.info(
+            f"题目导入完成: 导入 {len(report['imported'])} 道, 跳过 {len(report['skipped'])} 道, "
+            f"生成输出 {report['generated_outputs']} 个, 耗时 {report['elapsed']}s"
+        )
+        return report
+
+    @staticmethod
+    def _save_reference_answers(db: Session, imported: List[Dict], target_root: str, owner_id: Optional[int],
+                                existing_keys: Set[str]) -> None:
+        """将StdAnswer.c保存为题目的参考答案，并为本次新增的题目（path_key不在existing_keys中）记录导入者"""
+        by_key = {normalize_problem_path(result["info"].data_path): result for result in imported}
+        updates = []
+        for problem_id, path_key, reference_answer in db.query(
+            Problem.id, Problem.path_key, Problem.reference_answer
+        ).filter(Problem.path_key.in_(by_key.keys())).all():
+            update = {"id": problem_id}
+            source = os.path.join(target_root, by_key[path_key]["name"], STD_ANSWER_NAME)
+            if not reference_answer and os.path.exists(source):
+                with open(source, "rb") as f:
+                    raw_data = f.read()
+                encoding, bom, _, _ = detect_encoding(raw_data)
+                update["reference_answer"] = raw_data[bom:].decode(encoding, errors="replace")
+            if owner_id is not None and path_key not in existing_keys:
+                update["owner_id"] = owner_id
+            if len(update) > 1:
+                updates.append(update)
+
+        if updates:
+            try:
+                db.bulk_update_mappings(Problem, updates)
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
@@ -0,0 +1,140 @@
+import os
+import re
+import time
+import logging
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from app.models import Problem
+from app.schemas.problem import ProblemInfo
+from app.services.problem_service import ProblemService, PROBLEMS_ROOT
+from app.utils.path_utils import normalize_problem_path
+
+logger = logging.getLogger(__name__)
+
+def parse_limits(problem_info: ProblemInfo) -> Tuple[int, int]:
+    """
+    解析Question.INF中的时间、内存限制
+
+    Returns:
+        (时间限制毫秒数, 内存限制字节数)
+    """
+    time_match = re.search(r'(\d+)', problem_info.time_limit or "1000ms")
+    time_limit = int(time_match.group(1)) if time_match else 1000
+
+    memory_match = re.search(r'(\d+)', problem_info.memory_limit or "256M")
+    memory_mb = int(memory_match.group(1)) if memory_match else 256
+    return time_limit, memory_mb * 1024 * 1024
+
+
+def problem_fields(problem_info: ProblemInfo) -> Dict:
+    """根据题库中的试题信息生成problems表字段"""
+    time_limit, memory_limit = parse_limits(problem_info)
+    return {
+        "name": problem_info.name,
+        "chinese_name": problem_info.chinese_name or problem_info.name,
+        "time_limit": time_limit,
+        "memory_limit": memory_limit,
+        "category": os.path.dirname(problem_info.data_path),
+    }
+
+
+class ProblemReconcileService:
+    """
+    题库与problems表对账
+
+    遍历题库目录，在一个事务内批量插入缺失的题目记录、更新名称/限制/分类不一致的记录，
+    并报告两个方向的孤立数据：
+    - 题库中存在但数据库中没有记录的题目（执行时会被插入）
+    - 数据库中存在但题库中已不存在的题目（仅报告，不删除，以免丢失提交记录）
+
+    传入catalog时只同步这些题目（例如批量导入后），不检查孤立记录。
+    """
+
+    @staticmethod
+    def reconcile(db: Session, dry_run: bool = False, catalog: Optional[List[ProblemInfo]] = None) -> Dict:
+        started = time.time()
+        full_scan = catalog is None
+        if full_scan:
+            catalog = ProblemService.list_all_problems()
+        catalog_by_key = {normalize_problem_path(p.data_path): p for p in catalog if p.data_path}
+
+        query = db.query(
+            Problem.id, Problem.data_path, Problem.path_key, Problem.name, Problem.chinese_name,
+            Problem.time_limit, Problem.memory_limit, Problem.category
+        ).filter(Problem.data_path.isnot(None))
+        if not full_scan:
+            query = query.filter(or_(
+                Problem.path_key.in_(catalog_by_key.keys()),
+                Problem.data_path.in_([p.data_path for p in catalog_by_key.values()])
+            ))
+        rows = query.order_by(Problem.id).all()
+
+        # 按规范化路径分组，同一路径的多条记录中只有ID最小的一条持有path_key
+        rows_by_key = defaultdict(list)
+        for row in rows:
+            rows_by_key[row.path_key or normalize_problem_path(row.data_path)].append(row)
+
+        inserts = []
+        updates = []
+        for key, problem_info in catalog_by_key.items():
+            fields = problem_fields(problem_info)
+            existing = rows_by_key.get(key)
+            if not existing:
+                inserts.append({
+                    **fields, "data_path": problem_info.data_path, "path_key": key,
+                    "is_shared": True, "owner_id": None
+                })
+                continue
+            holds_key = any(row.path_key == key for row in existing)
+            for row in existing:
+                changed = {f: v for f, v in fields.items() if getattr(row, f) != v}
+                if not holds_key and row.path_key is None:
+                    changed["path_key"] = key
+                    holds_key = True
+                if changed:
+                    updates.append({"id": row.id, **changed})
+
+        db_orphans = [
+            {"id": row.id, "data_path": row.data_path, "name": row.name}
+            for key, key_rows in rows_by_key.items()
+            if key not in catalog_by_key
+            for row in key_rows
+            if not os.path.isdir(os.path.join(PROBLEMS_ROOT, row.data_path))
+        ] if full_scan else []
+        duplicates = {
+            key: [row.id for row in key_rows]
+            for key, key_rows in rows_by_key.items()
+            if len(key_rows) > 1
+        }
+
+        if not dry_run and (inserts or updates):
+            try:
+                if inserts:
+                    db.bulk_insert_mappings(Problem, inserts)
+                if updates:
+                    db.bulk_update_mappings(Problem, updates)
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+
+        report = {
+            "dry_run": dry_run,
+            "catalog_problems": len(catalog_by_key),
+            "db_problems": len(rows),
+            "inserted": len(inserts),
+            "updated": len(updates),
+            "filesystem_orphans": [item["data_path"] for item in inserts],
+            "db_orphans": db_orphans,
+            "duplicates": duplicates,
+            "elapsed": round(time.time() - started, 3),
+        }
+        logger.info(
+            f"题库对账完成: 新增 {report['inserted']}, 更新 {report['updated']}, "
+            f"数据库孤立记录 {len(db_orphans)}, 重复记录 {len(duplicates)}, 耗时 {report['elapsed']}s"
+        )
+        return report
@@ -0,0 +1,100 @@
+import threading
+import logging
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy.orm import Session
+
+from app.models import Problem
+from app.utils.path_utils import problem_path_key
+
+logger = logging.getLogger(__name__)
+
+# 路径缓存最多保存的条目数
+MAX_ENTRIES = 8192
+
+
+class ProblemPathResolver:
+    """
+    题目路径解析
+
+    将接口传入的题目路径规范化为path_key后，通过唯一索引查找题目ID，并在进程内缓存
+    path_key到题目ID的映射。缓存命中时只需一次主键查询；题目被删除或重建后，
+    缓存中的旧ID查不到记录，会自动回退到按path_key查询。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ids: "OrderedDict[str, int]" = OrderedDict()
+
+    def _remember(self, key: str, problem_id: int) -> None:
+        with self._lock:
+            self._ids[key] = problem_id
+            self._ids.move_to_end(key)
+            while len(self._ids) > MAX_ENTRIES:
+                self._ids.popitem(last=False)
+
+    def _cached(self, key: str) -> Optional[int]:
+        with self._lock:
+            problem_id = self._ids.get(key)
+            if problem_id is not None:
+                self._ids.move_to_end(key)
+            return problem_id
+
+    def resolve_id(self, db: Session, path: str) -> Optional[int]:
+        """解析题目路径对应的题目ID"""
+        key = problem_path_key(path)
+        if not key:
+            return None
+        problem_id = self._cached(key)
+        if problem_id is not None:
+            # 与resolve()一样校验缓存的ID：题目可能已在其他进程中被删除或重建
+            exists = db.query(Problem.id).filter(Problem.id == problem_id, Problem.path_key == key).first()
+            if exists is not None:
+                return problem_id
+            self.forget(path)
+        row = db.query(Problem.id).filter(Problem.path_key == key).first()
+        if row is None:
+            return None
+        self._remember(key, row.id)
+        return row.id
+
+    def resolve(self, db: Session, path: str) -> Optional[Problem]:
+        """解析题目路径对应的题目记录"""
+        key = problem_path_key(path)
+        if not key:
+            return None
+        problem_id = self._cached(key)
+        if problem_id is not None:
+            problem = db.query(Problem).get(problem_id)
+            if problem is not None and problem.path_key == key:
+                return problem
+            self.forget(path)
+
+        problem = db.query(Problem).filter(Problem.path_key == key).first()
+        if problem is not None:
+            self._remember(key, problem.id)
+        return problem
+
+    def resolve_many(self, db: Session, paths: Iterable[str]) -> Dict[str, Problem]:
+        """批量解析题目路径，返回原始路径到题目记录的映射（未找到的路径不包含在结果中）"""
+        keys_by_path = {path: problem_path_key(path) for path in paths}
+        keys = {key for key in keys_by_path.values() if key}
+        if not keys:
+            return {}
+        problems = db.query(Problem).filter(Problem.path_key.in_(keys)).all()
+        by_key = {p.path_key: p for p in problems}
+        for key, problem in by_key.items():
+            self._remember(key, problem.id)
+        return {path: by_key[key] for path, key in keys_by_path.items() if key in by_key}
+
+    def forget(self, path: str) -> None:
+        """移除路径缓存（题目删除或路径变化时调用）"""
+        key = problem_path_key(path)
+        if key:
+            with self._lock:
+                self._ids.pop(key, None)
+
+
+# 进程内单例
+problem_path_resolver = ProblemPathResolver()
@@ -7,6 +7,9 @@ from typing import List, Optional, Dict, Any
 from app.schemas.problem import ProblemCategory, ProblemInfo, ProblemDetail, CustomProblemCreate, CustomProblemResponse
 from sqlalchemy.orm import Session
 from app.models import Problem, Tag, TagType
+from app.services.tag_index_service import tag_bitmap_index
+from app.services.html_cache_service import ProblemHtmlCache
+from app.services.encoding_service import BankEncodingService
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
@@ -17,6 +20,9 @@ PROBLEMS_ROOT = "/app_root/题库"  # Docker挂载的项目根目录下的题库
 
 logger.info(f"题库根目录: {PROBLEMS_ROOT}")
 
+# 题面HTML缓存
+problem_html_cache = ProblemHtmlCache(PROBLEMS_ROOT)
+
 class ProblemService:
     @staticmethod
     def get_problem_categories() -> List[ProblemCategory]:
@@ -95,6 +101,24 @@ class ProblemService:
         
         return problems
     
+    @staticmethod
+    def list_all_problems(categories: Optional[List[ProblemCategory]] = None) -> List[ProblemInfo]:
+        """获取题库中的全部试题（基于data_path去重）"""
+        if categories is None:
+            categories = ProblemService.get_problem_categories()
+        
+        unique_problems = {}
+        for category in categories:
+            try:
+                for problem in ProblemService.get_problems_by_category(category.path):
+                    if problem.data_path and problem.data_path not in unique_problems:
+                        unique_problems[problem.data_path] = problem
+            except Exception as e:
+                logger.warning(f"获取分类 {category.path} 的题目失败: {str(e)}")
+                continue
+        
+        return list(unique_problems.values())
+    
     @staticmethod
     def delete_problem(problem_path: str) -> str:
         """删除试题"""
@@ -151,69 +175,13 @@ class ProblemService:
             result['categories'] = ProblemService.get_problem_categories()
             logger.info(f"获取到 {len(result['categories'])} 个分类")
             
-            # 2. 获取所有题目（根据过滤条件）
-            all_problems = []
+            # 2. 获取所有题目（已基于data_path去重）
+            all_problems = ProblemService.list_all_problems(result['categories'])
             
-            if tag_ids is not None and len(tag_ids) > 0:
-                # 按多个标签ID交集过滤
-                # 先获取所有题目，然后进行交集过滤
-                for category in result['categories']:
-                    try:
-                        category_problems = ProblemService.get_problems_by_category(category.path)
-                        all_problems.extend(category_problems)
-                    except Exception as e:
-                        logger.warning(f"获取分类 {category.path} 的题目失败: {str(e)}")
-                        continue
-                
-                # 进行多标签交集过滤
-                all_problems = ProblemService.filter_problems_by_tags_intersection(db, all_problems, tag_ids)
-                        
-            elif tag_id is not None:
-                # 按标签ID过滤
-                tag_problems = ProblemService.get_problems_by_tag(db, tag_id)
-                tag_problem_paths = [p.data_path for p in tag_problems if p.data_path]
-                
-                # 从所有分类中获取题目，然后过滤
-                for category in result['categories']:
-                    try:
-                        category_problems = ProblemService.get_problems_by_category(category.path)
-                        filtered_problems = [p for p in category_problems if p.data_path in tag_problem_paths]
-                        all_problems.extend(filtered_problems)
-                    except Exception as e:
-                        logger.warning(f"获取分类 {category.path} 的题目失败: {str(e)}")
-                        continue
-                        
-            elif tag_type_id is not None:
-                # 按标签类型ID过滤
-                type_problems = ProblemService.get_problems_by_tag_type(db, tag_type_id)
-                type_problem_paths = [p.data_path for p in type_problems if p.data_path]
-                
-                # 从所有分类中获取题目，然后过滤
-                for category in result['categories']:
-                    try:
-                        category_problems = ProblemService.get_problems_by_category(category.path)
-                        filtered_problems = [p for p in category_problems if p.data_path in type_problem_paths]
-                        all_problems.extend(filtered_problems)
-                    except Exception as e:
-                        logger.warning(f"获取分类 {category.path} 的题目失败: {str(e)}")
-                        continue
-            else:
-                # 获取所有题目
-                for category in result['categories']:
-                    try:
-                        category_problems = ProblemService.get_problems_by_category(category.path)
-                        all_problems.extend(category_problems)
-                    except Exception as e:
-                        logger.warning(f"获取分类 {category.path} 的题目失败: {str(e)}")
-                        continue
-            
-            # 去重（基于data_path）
-            unique_problems = {}
-            for problem in all_problems:
-                if problem.data_path and problem.data_path not in unique_problems:
-                    unique_problems[problem.data_path] = problem
-            
-            result['problems'] = list(unique_problems.values())
+            # 根据标签条件过滤（使用标签位图索引，tag_ids > tag_id > tag_type_id）
+            result['problems'] = tag_bitmap_index.filter_problems(
+                db, all_problems, tag_id=tag_id, tag_ids=tag_ids, tag_type_id=tag_type_id
+            )
             logger.info(f"获取到 {len(result['problems'])} 个唯一题目")
             
             # 3. 如果需要标签数据，获取标签类型和标签
@@ -278,9 +246,14 @@ class ProblemService:
         # 首先尝试二进制方式读取文件，检查文件头
         try:
             with open(inf_path, "rb") as f:
+                stat = os.fstat(f.fileno())
                 raw_data = f.read()
+                # 优先使用编码清单中记录的编码
+                known_content = BankEncodingService.decode_known(inf_path, raw_data, stat)
+                if known_content is not None:
+                    content = known_content
                 # 检查是否有BOM标记
-                if raw_data.startswith(b'\xef\xbb\xbf'):
+                elif raw_data.startswith(b'\xef\xbb\xbf'):
                     content = raw_data[3:].decode('utf-8')
                 # 检查是否有其他编码标记
                 elif raw_data.startswith(b'\xff\xfe'):
@@ -396,51 +369,13 @@ class ProblemService:
         if not data_path:
             logger.warning("题目数据路径为空")
             return "<p>题目内容不可用</p>"
-            
-        # 构建可能的HTML文件路径
-        problem_dir = os.path.join(PROBLEMS_ROOT, data_path)
-        possible_html_paths = [
-            os.path.join(problem_dir, f"{os.path.basename(data_path)}.htm"),  # Ex1.htm
-            os.path.join(problem_dir, f"{os.path.basename(data_path)}.html"),  # Ex1.html
-            os.path.join(problem_dir, "problem.htm"),  # problem.htm
-            os.path.join(problem_dir, "problem.html"),  # problem.html
-            os.path.join(problem_dir, "Question.htm"),  # Question.htm
-            os.path.join(problem_dir, "Question.html")   # Question.html
-        ]
-        
-        # 尝试找到并读取HTML文件
-        html_content = "<p>题目内容不可用</p>"
-        for html_path in possible_html_paths:
-            if os.path.exists(html_path):
-                try:
-                    # 二进制读取，检测BOM
-                    with open(html_path, "rb") as f:
-                        raw_data = f.read()
-                        if raw_data.startswith(b'\xff\xfe'):  # UTF-16 LE
-                            content = raw_data[2:].decode('utf-16-le')
-                        elif raw_data.startswith(b'\xef\xbb\xbf'):  # UTF-8
-                            content = raw_data[3:].decode('utf-8')
-                        else:
-                            # 尝试编码
-                            for encoding in ['utf-8', 'gbk', 'gb2312', 'gb18030', 'latin1']:
-                                try:
-                                    content = raw_data.decode(encoding)
-                                    break
-                                except UnicodeDecodeError:
-                                    continue
-                            else:
-                                content = raw_data.decode('latin1')
-                    
-                    html_content = content
-                    logger.info(f"成功读取题目HTML文件: {html_path}")
-                    break  # 文件读取成功，退出文件路径循环
-                except Exception as e:
-                    logger.error(f"读取题目HTML文件失败: {str(e)}")
-                    continue  # 尝试下一个可能的文件路径
         
-        logger.info(f"HTML文件路径尝试完成，最终使用: {html_content[:100]}...")
+        entry = problem_html_cache.get(data_path)
+        if entry is None:
+            logger.warning(f"未找到题目HTML文件: {data_path}")
+            return "<p>题目内容不可用</p>"
         
-        return html_content 
+        return entry.text
 
     @staticmethod
     def filter_problems_by_tags_intersection(db: Session, problems: List[ProblemInfo], tag_ids: List[int]) -> List[ProblemInfo]:
@@ -458,38 +393,7 @@ class ProblemService:
         if not tag_ids or not problems:
             return problems
         
-        # 获取所有题目的data_path
-        problem_paths = [p.data_path for p in problems if p.data_path]
-        if not problem_paths:
-            return []
-        
-        # 查询所有涉及的问题和标签关系
-        from app.models.problem import Problem, problem_tag
-        from app.models.tag import Tag
-        
-        # 对于每个标签，查找包含该标签的问题
-        filtered_paths_sets = []
-        
-        for tag_id in tag_ids:
-            # 查询包含当前标签的所有问题的data_path
-            tag_problem_paths = db.query(Problem.data_path).join(
-                problem_tag, Problem.id == problem_tag.c.problem_id
-            ).filter(
-                problem_tag.c.tag_id == tag_id,
-                Problem.data_path.in_(problem_paths)
-            ).all()
-            
-            # 提取data_path列表
-            paths_set = set(path[0] for path in tag_problem_paths if path[0])
-            filtered_paths_sets.append(paths_set)
-        
-        # 计算所有标签的交集
-        if filtered_paths_sets:
-            intersection_paths = set.intersection(*filtered_paths_sets)
-            # 返回在交集中的题目
-            return [p for p in problems if p.data_path in intersection_paths]
-        
-        return [] 
+        return tag_bitmap_index.filter_problems(db, problems, tag_ids=tag_ids)
 
     @staticmethod
     def create_custom_problem(problem_data: CustomProblemCreate, db: Session = None) -> CustomProblemResponse:
@@ -536,6 +440,7 @@ class ProblemService:
             
             # 8. 计算相对路径
             relative_path = os.path.join(custom_category_path, unique_name)
+            problem_html_cache.invalidate(relative_path)
             
             # 9. 如果有数据库会话，保存题目信息到数据库
             if db:
@@ -567,6 +472,17 @@ class ProblemService:
                 except Exception as e:
                     logger.warning(f"设置标签失败: {str(e)}")
             
+            # 11. 将新题目加入全文检索索引
+            try:
+                from app.services.search_service import problem_search_index
+                problem_info = ProblemService.parse_question_inf(
+                    os.path.join(problem_dir, "Question.INF"), unique_name, custom_category_path
+                )
+                if problem_info:
+                    problem_search_index.index_problem(problem_info)
+            except Exception as e:
+                logger.warning(f"更新检索索引失败: {str(e)}")
+            
             logger.info(f"自定义题目创建成功: {relative_path}")
             
             return CustomProblemResponse(
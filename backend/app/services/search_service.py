@@ -0,0 +1,293 @@
+import os
+import re
+import math
+import html
+import time
+import threading
+import unicodedata
+import logging
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.schemas.problem import ProblemInfo
+from app.services.problem_service import ProblemService, PROBLEMS_ROOT
+from app.services.html_cache_service import HTML_CANDIDATES
+from app.services.tag_index_service import tag_bitmap_index
+
+logger = logging.getLogger(__name__)
+
+# 各字段权重：名称命中比正文命中重要得多
+FIELD_WEIGHTS = {
+    "chinese_name": 4.0,
+    "name": 3.0,
+    "category": 2.0,
+    "content": 1.0,
+}
+
+# BM25参数
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# 距离上次刷新超过该秒数时，在后台增量刷新索引
+REFRESH_INTERVAL = 300
+
+# 中日韩统一表意文字及扩展A区
+_CJK_RANGES = "㐀-䶿一-鿿豈-﫿"
+_TOKEN_RE = re.compile(f"[{_CJK_RANGES}]+|[a-z0-9_]+")
+_CJK_RE = re.compile(f"^[{_CJK_RANGES}]+$")
+_SCRIPT_STYLE_RE = re.compile(r"<(script|style)[^>]*>.*?</\1>", re.IGNORECASE | re.DOTALL)
+_TAG_RE = re.compile(r"<[^>]+>")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def html_to_text(html_content: str) -> str:
+    """提取HTML中的纯文本"""
+    if not html_content:
+        return ""
+    text = _SCRIPT_STYLE_RE.sub(" ", html_content)
+    text = _TAG_RE.sub(" ", text)
+    text = html.unescape(text)
+    return _SPACE_RE.sub(" ", text).strip()
+
+
+def tokenize(text: str, for_query: bool = False) -> List[str]:
+    """
+    分词：中文按二元组（bigram）切分，英文和数字按单词切分
+
+    索引时对中文同时保留单字，以便支持单字查询；查询时只在查询词为单字时使用单字。
+    """
+    if not text:
+        return []
+    text = unicodedata.normalize("NFKC", text).lower()
+    tokens = []
+    for run in _TOKEN_RE.findall(text):
+        if _CJK_RE.match(run):
+            if len(run) == 1:
+                tokens.append(run)
+                continue
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+            if not for_query:
+                tokens.extend(run)
+        else:
+            tokens.append(run)
+    return tokens
+
+
+class ProblemSearchIndex:
+    """
+    题目全文检索倒排索引
+
+    索引字段包括中文名称、英文名称、分类路径以及题面HTML的正文。
+    每道题记录Question.INF和题面文件的修改时间，刷新时只重建发生变化的题目。
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._postings: Dict[str, Dict[str, float]] = defaultdict(dict)
+        self._doc_terms: Dict[str, Dict[str, float]] = {}
+        self._doc_lengths: Dict[str, float] = {}
+        self._doc_info: Dict[str, ProblemInfo] = {}
+        self._doc_signatures: Dict[str, Tuple] = {}
+        self._total_length = 0.0
+        self._last_refresh = 0.0
+        self._refreshing = False
+
+    # ---------- 索引维护 ----------
+
+    @staticmethod
+    def _signature(data_path: str) -> Tuple:
+        """题目文件签名（Question.INF与题目目录的修改时间，以及题面文件的修改时间和大小）"""
+        problem_dir = os.path.join(PROBLEMS_ROOT, data_path)
+        signature = []
+        for path in (os.path.join(problem_dir, "Question.INF"), problem_dir):
+            try:
+                signature.append(os.stat(path).st_mtime_ns)
+            except OSError:
+                signature.append(None)
+        # 原地编辑题面不会改变目录的修改时间，需要单独记录题面文件
+        name = os.path.basename(data_path)
+        for candidate in HTML_CANDIDATES:
+            try:
+                stat = os.stat(os.path.join(problem_dir, candidate.format(name=name)))
+            except OSError:
+                continue
+            signature.extend((candidate, stat.st_mtime_ns, stat.st_size))
+            break
+        return tuple(signature)
+
+    def _remove_locked(self, data_path: str) -> None:
+        terms = self._doc_terms.pop(data_path, None)
+        if terms is None:
+            return
+        for term in terms:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(data_path, None)
+                if not postings:
+                    del self._postings[term]
+        self._total_length -= self._doc_lengths.pop(data_path, 0.0)
+        self._doc_info.pop(data_path, None)
+        self._doc_signatures.pop(data_path, None)
+
+    def index_problem(self, problem: ProblemInfo, signature: Optional[Tuple] = None) -> None:
+        """索引（或重新索引）一道题目"""
+        if not problem.data_path:
+            return
+
+        content = html_to_text(ProblemService.get_problem_html_content(problem.data_path))
+        fields = {
+            "chinese_name": problem.chinese_name,
+            "name": problem.name,
+            "category": os.path.dirname(problem.data_path),
+            "content": content,
+        }
+
+        terms: Dict[str, float] = defaultdict(float)
+        for field, value in fields.items():
+            weight = FIELD_WEIGHTS[field]
+            for token in tokenize(value):
+                terms[token] += weight
+        length = sum(terms.values())
+
+        with self._lock:
+            self._remove_locked(problem.data_path)
+            for term, weight in terms.items():
+                self._postings[term][problem.data_path] = weight
+            self._doc_terms[problem.data_path] = dict(terms)
+            self._doc_lengths[problem.data_path] = length
+            self._doc_info[problem.data_path] = problem
+            self._doc_signatures[problem.data_path] = signature or self._signature(problem.data_path)
+            self._total_length += length
+
+    def remove_problem(self, data_path: str) -> None:
+        """从索引中移除一道题目"""
+        with self._lock:
+            self._remove_locked(data_path)
+
+    def refresh(self) -> Dict[str, int]:
+        """遍历题库，增量更新新增、修改和删除的题目"""
+        started = time.time()
+        stats = {"indexed": 0, "removed": 0, "unchanged": 0}
+        seen = set()
+
+        for problem in ProblemService.list_all_problems():
+            seen.add(problem.data_path)
+            signature = self._signature(problem.data_path)
+            if self._doc_signatures.get(problem.data_path) == signature:
+                stats["unchanged"] += 1
+                continue
+            try:
+                self.index_problem(problem, signature)
+                stats["indexed"] += 1
+            except Exception as e:
+                logger.warning(f"索引题目失败 {problem.data_path}: {e}")
+
+        with self._lock:
+            for data_path in [p for p in self._doc_info if p not in seen]:
+                self._remove_locked(data_path)
+                stats["removed"] += 1
+            self._last_refresh = time.time()
+
+        logger.info(f"题目检索索引刷新完成: {stats}, 耗时 {time.time() - started:.2f}s")
+        return stats
+
+    def _refresh_in_background(self) -> None:
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def run():
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"后台刷新题目检索索引失败: {e}")
+            finally:
+                self._refreshing = False
+
+        threading.Thread(target=run, name="problem-search-refresh", daemon=True).start()
+
+    def ensure_fresh(self) -> bool:
+        """
+        在后台构建或增量刷新索引（距上次刷新超过REFRESH_INTERVAL时），不阻塞调用方
+
+        Returns:
+            索引是否已构建完成（首次构建完成前为False）
+        """
+        if time.time() - self._last_refresh > REFRESH_INTERVAL:
+            self._refresh_in_background()
+        return self._last_refresh > 0
+
+    # ---------- 查询 ----------
+
+    def _bm25(self, term: str, data_path: str, tf: float, df: int, n_docs: int, avg_length: float) -> float:
+        idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+        norm = 1 - BM25_B + BM25_B * self._doc_lengths[data_path] / avg_length
+        return idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * norm)
+
+    def search(
+        self,
+        db: Session,
+        query: str,
+        tag_id: Optional[int] = None,
+        tag_ids: Optional[List[int]] = None,
+        tag_type_id: Optional[int] = None,
+        limit: int = 20,
+        offset: int = 0
+    ) -> Dict:
+        """
+        检索题目并按相关度排序
+
+        默认要求命中所有查询词；没有结果时退化为命中任一查询词。
+        """
+        if not self.ensure_fresh():
+            # 首次构建需要读取整个题库的题面，构建完成前返回空结果
+            return {"total": 0, "items": [], "indexing": True}
+        terms = list(dict.fromkeys(tokenize(query, for_query=True)))
+        if not terms:
+            return {"total": 0, "items": []}
+
+        with self._lock:
+            n_docs = len(self._doc_info) or 1
+            avg_length = (self._total_length / n_docs) or 1.0
+            postings = [(term, self._postings.get(term, {})) for term in terms]
+
+            # 从最短的倒排表开始求交集
+            candidates = None
+            for _, docs in sorted(postings, key=lambda item: len(item[1])):
+                candidates = set(docs) if candidates is None else candidates & docs.keys()
+                if not candidates:
+                    break
+            if not candidates:
+                candidates = set().union(*(docs.keys() for _, docs in postings))
+
+            if tag_ids or tag_id is not None or tag_type_id is not None:
+                filtered = tag_bitmap_index.filter_problems(
+                    db, [self._doc_info[p] for p in candidates],
+                    tag_id=tag_id, tag_ids=tag_ids, tag_type_id=tag_type_id
+                )
+                candidates = {p.data_path for p in filtered}
+
+            scored = []
+            for data_path in candidates:
+                score = 0.0
+                for term, docs in postings:
+                    tf = docs.get(data_path)
+                    if tf:
+                        score += self._bm25(term, data_path, tf, len(docs), n_docs, avg_length)
+                scored.append((score, data_path))
+
+            scored.sort(key=lambda item: (-item[0], item[1]))
+            page = scored[offset:offset + limit]
+            items = [
+                {**self._doc_info[data_path].dict(), "score": round(score, 4)}
+                for score, data_path in page
+            ]
+
+        return {"total": len(scored), "items": items}
+
+
+# 进程内单例
+problem_search_index = ProblemSearchIndex()
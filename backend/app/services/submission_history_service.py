@@ -0,0 +1,160 @@
+import logging
+import json
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import func, tuple_
+from sqlalchemy.orm import Session
+
+from app.models import Submission, SubmissionSummary, User, Exercise, Problem, Class, Course, student_class
+from app.models.class_model import class_course
+from app.utils.pagination import encode_cursor, next_cursor
+from app.utils.redis_client import redis_client, DateTimeEncoder
+
+logger = logging.getLogger(__name__)
+
+# 每个用户一个哈希，字段为分页参数；评测结果写入汇总表时整个删除
+HISTORY_CACHE_KEY = "my_submissions:{user_id}"
+CACHE_EXPIRE = 10 * 60
+
+
+class SubmissionHistoryService:
+    """
+    "我的答题记录"：每题最后一次提交，按(提交时间, ID)键集分页
+
+    数据来自提交汇总表，页面中练习关联的班级一次批量查询；
+    结果按用户缓存，该用户有新的评测结果时失效
+    """
+
+    @staticmethod
+    def _exercise_classes(db: Session, exercise_ids: List[int]) -> Dict[int, List[Any]]:
+        """练习所属课程关联的班级 {练习ID: [(班级ID, 班级名称)]}，一条查询"""
+        if not exercise_ids:
+            return {}
+        rows = (
+            db.query(Exercise.id, Class.id, Class.name)
+            .join(class_course, class_course.c.course_id == Exercise.course_id)
+            .join(Class, Class.id == class_course.c.class_id)
+            .filter(Exercise.id.in_(exercise_ids))
+            .order_by(Exercise.id, Class.id)
+        )
+        classes: Dict[int, List[Any]] = {}
+        for exercise_id, class_id, class_name in rows:
+            classes.setdefault(exercise_id, []).append((class_id, class_name))
+        return classes
+
+    @staticmethod
+    def query_page(db: Session, user: User, after: Optional[List[Any]], limit: int, ascending: bool) -> Dict[str, Any]:
+        # 每个题目的最新提交ID（按user_id索引扫描汇总表）
+        latest_submissions = (
+            db.query(func.max(SubmissionSummary.latest_submission_id).label("latest_id"))
+            .filter(SubmissionSummary.user_id == user.id)
+            .group_by(SubmissionSummary.problem_id)
+            .subquery()
+        )
+        query = (
+            db.query(
+                Submission.id,
+                Submission.user_id,
+                Submission.problem_id,
+                Submission.exercise_id,
+                Submission.language,
+                Submission.status,
+                Submission.code_check_score,
+                Submission.runtime_score,
+                Submission.total_score,
+                Submission.submitted_at,
+                Problem.name.label("problem_name"),
+                Problem.chinese_name.label("problem_chinese_name"),
+                Exercise.name.label("exercise_name"),
+                Exercise.course_id,
+                Course.name.label("course_name"),
+            )
+            .join(latest_submissions, Submission.id == latest_submissions.c.latest_id)
+            .join(Problem, Submission.problem_id == Problem.id)
+            .outerjoin(Exercise, Submission.exercise_id == Exercise.id)
+            .outerjoin(Course, Exercise.course_id == Course.id)
+        )
+
+        key = tuple_(Submission.submitted_at, Submission.id)
+        if after is not None:
+            query = query.filter(key > tuple_(*after) if ascending else key < tuple_(*after))
+        if ascending:
+            query = query.order_by(Submission.submitted_at.asc(), Submission.id.asc())
+        else:
+            query = query.order_by(Submission.submitted_at.desc(), Submission.id.desc())
+
+        rows = query.limit(limit + 1).all()
+        cursor_next = next_cursor(rows, limit, lambda row: (row.submitted_at, row.id))
+        rows = rows[:limit]
+
+        # 学生直接使用自己所在的班级，其他用户使用练习关联的班级
+        user_classes = []
+        exercise_classes = {}
+        if user.role == "student":
+            user_classes = (
+                db.query(Class.id, Class.name)
+                .join(student_class, Class.id == student_class.c.class_id)
+                .filter(student_class.c.student_id == user.id)
+                .order_by(Class.id)
+                .all()
+            )
+        if not user_classes:
+            exercise_classes = SubmissionHistoryService._exercise_classes(
+                db, list({row.exercise_id for row in rows if row.exercise_id})
+            )
+
+        items = []
+        for row in rows:
+            classes = user_classes or exercise_classes.get(row.exercise_id, [])
+            items.append({
+                "id": row.id,
+                "user_id": row.user_id,
+                "problem_id": row.problem_id,
+                "exercise_id": row.exercise_id,
+                "language": row.language,
+                "status": row.status,
+                "code_check_score": row.code_check_score,
+                "runtime_score": row.runtime_score,
+                "total_score": row.total_score,
+                "submitted_at": row.submitted_at,
+                "problem_name": row.problem_name or f"题目 {row.problem_id}",
+                "problem_chinese_name": row.problem_chinese_name,
+                "exercise_name": row.exercise_name or "-",
+                "course_id": row.course_id,
+                "course_name": row.course_name or "-",
+                "class_names": ", ".join(name for _, name in classes) if classes else "-",
+                "class_id": classes[0][0] if classes else None,
+                "username": user.username,
+                "real_name": user.real_name
+            })
+        return {"items": items, "next_cursor": cursor_next}
+
+    @staticmethod
+    def get_page(db: Session, user: User, after: Optional[List[Any]], limit: int, ascending: bool) -> Dict[str, Any]:
+        """读取一页答题记录，优先使用缓存"""
+        key = HISTORY_CACHE_KEY.format(user_id=user.id)
+        field = f"{'asc' if ascending else 'desc'}:{limit}:{encode_cursor(*after) if after else ''}"
+        try:
+            cached = redis_client.hget(key, field)
+            if cached is not None:
+                return json.loads(cached)
+        except Exception as e:
+            logger.warning(f"读取答题记录缓存失败: {e}")
+
+        page = SubmissionHistoryService.query_page(db, user, after, limit, ascending)
+        try:
+            pipe = redis_client.pipeline(transaction=False)
+            pipe.hset(key, field, json.dumps(page, ensure_ascii=False, cls=DateTimeEncoder))
+            pipe.expire(key, CACHE_EXPIRE)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"写入答题记录缓存失败: {e}")
+        return page
+
+    @staticmethod
+    def invalidate(user_id: int) -> None:
+        """用户有新的评测结果时调用"""
+        try:
+            redis_client.delete(HISTORY_CACHE_KEY.format(user_id=user_id))
+        except Exception as e:
+            logger.warning(f"清除答题记录缓存失败: {e}")
@@ -0,0 +1,124 @@
+import logging
+from typing import Dict
+
+from sqlalchemy import case, func, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.models import Submission, SubmissionSummary
+
+logger = logging.getLogger(__name__)
+
+# 不属于任何练习的提交在汇总表中的exercise_id
+NO_EXERCISE = 0
+
+# 从提交记录重建汇总表：最高分取最早达到最高分的提交，最新提交取ID最大的一条
+REBUILD_SQL = """
+INSERT INTO submission_summary (
+    exercise_id, problem_id, user_id,
+    best_score, best_submission_id, best_status,
+    latest_submission_id, latest_score, latest_status,
+    attempt_count, first_ac_at, last_submitted_at
+)
+SELECT agg.exercise_id, agg.problem_id, agg.user_id,
+       best.score, best.id, best.status,
+       latest.id, latest.score, latest.status,
+       agg.attempt_count, agg.first_ac_at, agg.last_submitted_at
+FROM (
+    SELECT COALESCE(exercise_id, 0) AS exercise_id, problem_id, user_id,
+           count(*) AS attempt_count,
+           min(submitted_at) FILTER (WHERE status = 'Accepted') AS first_ac_at,
+           max(submitted_at) AS last_submitted_at
+    FROM submissions
+    WHERE problem_id IS NOT NULL AND user_id IS NOT NULL
+    GROUP BY 1, 2, 3
+) agg
+JOIN (
+    SELECT DISTINCT ON (COALESCE(exercise_id, 0), problem_id, user_id)
+           COALESCE(exercise_id, 0) AS exercise_id, problem_id, user_id,
+           id, COALESCE(total_score, 0) AS score, status
+    FROM submissions
+    WHERE problem_id IS NOT NULL AND user_id IS NOT NULL
+    ORDER BY COALESCE(exercise_id, 0), problem_id, user_id, COALESCE(total_score, 0) DESC, id
+) best USING (exercise_id, problem_id, user_id)
+JOIN (
+    SELECT DISTINCT ON (COALESCE(exercise_id, 0), problem_id, user_id)
+           COALESCE(exercise_id, 0) AS exercise_id, problem_id, user_id,
+           id, COALESCE(total_score, 0) AS score, status
+    FROM submissions
+    WHERE problem_id IS NOT NULL AND user_id IS NOT NULL
+    ORDER BY COALESCE(exercise_id, 0), problem_id, user_id, id DESC
+) latest USING (exercise_id, problem_id, user_id)
+"""
+
+
+class SubmissionSummaryService:
+    """提交汇总表的维护"""
+
+    @staticmethod
+    def record(db: Session, submission: Submission) -> None:
+        """
+        把一次已出结果的提交合并到汇总表（不提交事务，由调用方与提交记录一起提交）
+
+        使用INSERT ... ON CONFLICT在数据库中合并，并发评测同一题时不会丢失更新；
+        最新提交按提交ID比较，评测结果乱序到达也不会被旧提交覆盖。
+        """
+        if submission.user_id is None or submission.problem_id is None:
+            return
+
+        score = submission.total_score or 0
+        accepted_at = submission.submitted_at if submission.status == "Accepted" else None
+        stmt = insert(SubmissionSummary).values(
+            exercise_id=submission.exercise_id or NO_EXERCISE,
+            problem_id=submission.problem_id,
+            user_id=submission.user_id,
+            best_score=score,
+            best_submission_id=submission.id,
+            best_status=submission.status,
+            latest_submission_id=submission.id,
+            latest_score=score,
+            latest_status=submission.status,
+            attempt_count=1,
+            first_ac_at=accepted_at,
+            last_submitted_at=submission.submitted_at,
+        )
+        current = SubmissionSummary.__table__.c
+        excluded = stmt.excluded
+        improved = excluded.best_score > current.best_score
+        newer = excluded.latest_submission_id > current.latest_submission_id
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[current.exercise_id, current.problem_id, current.user_id],
+            set_={
+                "best_score": case((improved, excluded.best_score), else_=current.best_score),
+                "best_submission_id": case((improved, excluded.best_submission_id), else_=current.best_submission_id),
+                "best_status": case((improved, excluded.best_status), else_=current.best_status),
+                "latest_submission_id": case((newer, excluded.latest_submission_id), else_=current.latest_submission_id),
+                "latest_score": case((newer, excluded.latest_score), else_=current.latest_score),
+                "latest_status": case((newer, excluded.latest_status), else_=current.latest_status),
+                "attempt_count": current.attempt_count + 1,
+                # LEAST/GREATEST会忽略NULL
+                "first_ac_at": func.least(current.first_ac_at, excluded.first_ac_at),
+                "last_submitted_at": func.greatest(current.last_submitted_at, excluded.last_submitted_at),
+            },
+        )
+        db.execute(stmt)
+
+    @staticmethod
+    def rebuild(db: Session) -> Dict[str, int]:
+        """根据全部提交记录重建汇总表（在一个事务中完成，读者看不到中间状态）"""
+        try:
+            db.execute(text("LOCK TABLE submission_summary IN EXCLUSIVE MODE"))
+            db.execute(text("DELETE FROM submission_summary"))
+            db.execute(text(REBUILD_SQL))
+            rows = db.execute(text("SELECT count(*) FROM submission_summary")).scalar()
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        logger.info(f"提交汇总表重建完成: {rows} 行")
+        return {"rows": rows}
+
+    @staticmethod
+    def forget_problem(db: Session, problem_id: int) -> None:
+        """删除题目的提交记录时一并删除其汇总数据（不提交事务）"""
+        db.query(SubmissionSummary).filter(SubmissionSummary.problem_id == problem_id).delete(synchronize_session=False)
@@ -0,0 +1,257 @@
+import threading
+import logging
+from typing import Dict, Iterable, List, Optional, Set
+
+from sqlalchemy.orm import Session
+
+from app.models import Problem, Tag, problem_tag
+from app.utils.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+# 多个uvicorn worker之间通过该版本号判断本地索引是否过期
+TAG_INDEX_VERSION_KEY = "tag_index:version"
+
+
+class TagBitmapIndex:
+    """
+    标签位图索引
+
+    每道题目（按data_path）分配一个序号，每个标签对应一个以Python整数表示的位图，
+    第n位为1表示序号为n的题目带有该标签。多标签交集、按标签类型求并集、计数
+    都可以直接用位运算完成，无需逐个标签查询数据库。
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._path_to_ordinal: Dict[str, int] = {}
+        self._paths: List[str] = []
+        self._tag_bits: Dict[int, int] = {}
+        self._tag_type: Dict[int, Optional[int]] = {}
+        self._loaded = False
+        self._version: Optional[int] = None
+
+    # ---------- 版本同步 ----------
+
+    @staticmethod
+    def _remote_version() -> Optional[int]:
+        """读取Redis中的索引版本号，Redis不可用时返回None"""
+        try:
+            value = redis_client.get(TAG_INDEX_VERSION_KEY)
+            return int(value) if value is not None else 0
+        except Exception as e:
+            logger.warning(f"读取标签索引版本失败: {e}")
+            return None
+
+    def _bump_version(self) -> None:
+        """本地写入后递增版本号，通知其他worker重新加载"""
+        try:
+            new_version = redis_client.incr(TAG_INDEX_VERSION_KEY)
+            # 只有在本地索引与远端同步的情况下才能直接跟随新版本
+            if self._version is not None and new_version == self._version + 1:
+                self._version = new_version
+            else:
+                self._loaded = False
+        except Exception as e:
+            logger.warning(f"更新标签索引版本失败: {e}")
+
+    # ---------- 加载 ----------
+
+    def _ordinal(self, data_path: str) -> int:
+        """获取题目序号，不存在则分配新序号"""
+        ordinal = self._path_to_ordinal.get(data_path)
+        if ordinal is None:
+            ordinal = len(self._paths)
+            self._paths.append(data_path)
+            self._path_to_ordinal[data_path] = ordinal
+        return ordinal
+
+    def load(self, db: Session) -> None:
+        """
+        从数据库全量构建索引（两条查询）
+
+        新索引先在局部变量中构建，再在锁内整体替换，重新加载期间读者看到的仍是完整的旧索引。
+        版本号在查询之前读取，查询期间其他写入递增的版本会使下一次ensure_loaded重新加载
+        """
+        version = self._remote_version()
+
+        path_to_ordinal: Dict[str, int] = {}
+        paths: List[str] = []
+        tag_bits: Dict[int, int] = {}
+        tag_type: Dict[int, Optional[int]] = {}
+
+        for tag_id, tag_type_id in db.query(Tag.id, Tag.tag_type_id).all():
+            tag_bits[tag_id] = 0
+            tag_type[tag_id] = tag_type_id
+
+        rows = db.query(Problem.data_path, problem_tag.c.tag_id).join(
+            problem_tag, Problem.id == problem_tag.c.problem_id
+        ).filter(Problem.data_path.isnot(None)).all()
+
+        for data_path, tag_id in rows:
+            ordinal = path_to_ordinal.get(data_path)
+            if ordinal is None:
+                ordinal = path_to_ordinal[data_path] = len(paths)
+                paths.append(data_path)
+            tag_bits[tag_id] = tag_bits.get(tag_id, 0) | (1 << ordinal)
+
+        with self._lock:
+            self._path_to_ordinal = path_to_ordinal
+            self._paths = paths
+            self._tag_bits = tag_bits
+            self._tag_type = tag_type
+            self._version = version
+            self._loaded = True
+        logger.info(f"标签位图索引已加载: {len(tag_bits)} 个标签, {len(paths)} 个题目")
+
+    def ensure_loaded(self, db: Session) -> None:
+        """确保索引已加载且与其他worker的写入保持一致"""
+        if self._loaded:
+            version = self._remote_version()
+            if version is None or version == self._version:
+                return
+        self.load(db)
+
+    def invalidate(self) -> None:
+        """使所有worker的索引失效，下次使用时重新加载"""
+        with self._lock:
+            self._loaded = False
+            try:
+                redis_client.incr(TAG_INDEX_VERSION_KEY)
+            except Exception as e:
+                logger.warning(f"更新标签索引版本失败: {e}")
+
+    # ---------- 增量维护（与problem_tag写入同步） ----------
+
+    def add(self, data_path: str, tag_id: int, tag_type_id: Optional[int] = None) -> None:
+        """为题目添加一个标签"""
+        if not data_path:
+            return
+        with self._lock:
+            if self._loaded:
+                self._tag_bits[tag_id] = self._tag_bits.get(tag_id, 0) | (1 << self._ordinal(data_path))
+                self._tag_type.setdefault(tag_id, tag_type_id)
+            self._bump_version()
+
+    def remove(self, data_path: str, tag_id: int) -> None:
+        """移除题目的一个标签"""
+        if not data_path:
+            return
+        with self._lock:
+            if self._loaded:
+                ordinal = self._path_to_ordinal.get(data_path)
+                if ordinal is not None and tag_id in self._tag_bits:
+                    self._tag_bits[tag_id] &= ~(1 << ordinal)
+            self._bump_version()
+
+    def set_tags(self, data_path: str, tags: Iterable[Tag]) -> None:
+        """覆盖设置题目的全部标签"""
+        if not data_path:
+            return
+        with self._lock:
+            if self._loaded:
+                bit = 1 << self._ordinal(data_path)
+                for tag_id in self._tag_bits:
+                    self._tag_bits[tag_id] &= ~bit
+                for tag in tags:
+                    self._tag_bits[tag.id] = self._tag_bits.get(tag.id, 0) | bit
+                    self._tag_type[tag.id] = tag.tag_type_id
+            self._bump_version()
+
+    def drop_problem(self, data_path: str) -> None:
+        """题目被删除时清除其所有标签位"""
+        if not data_path:
+            return
+        with self._lock:
+            if self._loaded:
+                ordinal = self._path_to_ordinal.get(data_path)
+                if ordinal is not None:
+                    mask = ~(1 << ordinal)
+                    for tag_id in self._tag_bits:
+                        self._tag_bits[tag_id] &= mask
+            self._bump_version()
+
+    # ---------- 查询 ----------
+
+    def intersect(self, tag_ids: List[int]) -> int:
+        """返回同时具有所有标签的题目位图"""
+        if not tag_ids:
+            return 0
+        result = self._tag_bits.get(tag_ids[0], 0)
+        for tag_id in tag_ids[1:]:
+            if not result:
+                break
+            result &= self._tag_bits.get(tag_id, 0)
+        return result
+
+    def union_by_type(self, tag_type_id: int) -> int:
+        """返回具有该标签类型下任一标签的题目位图"""
+        result = 0
+        for tag_id, type_id in self._tag_type.items():
+            if type_id == tag_type_id:
+                result |= self._tag_bits.get(tag_id, 0)
+        return result
+
+    def tag_bitmap(self, tag_id: int) -> int:
+        """返回单个标签的题目位图"""
+        return self._tag_bits.get(tag_id, 0)
+
+    def contains(self, bitmap: int, data_path: str) -> bool:
+        """判断题目是否在位图中"""
+        ordinal = self._path_to_ordinal.get(data_path)
+        return ordinal is not None and bool((bitmap >> ordinal) & 1)
+
+    def paths(self, bitmap: int) -> Set[str]:
+        """将位图还原为题目路径集合"""
+        result = set()
+        ordinal = 0
+        while bitmap:
+            if bitmap & 1:
+                result.add(self._paths[ordinal])
+            bitmap >>= 1
+            ordinal += 1
+        return result
+
+    @staticmethod
+    def count(bitmap: int) -> int:
+        """位图中的题目数量"""
+        return bin(bitmap).count("1")
+
+    def tag_counts(self) -> Dict[int, int]:
+        """每个标签下的题目数量"""
+        with self._lock:
+            return {tag_id: self.count(bits) for tag_id, bits in self._tag_bits.items()}
+
+    def filter_problems(
+        self,
+        db: Session,
+        problems: list,
+        tag_id: Optional[int] = None,
+        tag_ids: Optional[List[int]] = None,
+        tag_type_id: Optional[int] = None
+    ) -> list:
+        """
+        按标签条件过滤题目列表（元素需有data_path属性）
+
+        优先级与原有接口保持一致：tag_ids > tag_id > tag_type_id
+        """
+        if not tag_ids and tag_id is None and tag_type_id is None:
+            return problems
+        self.ensure_loaded(db)
+
+        # 位图与题目序号必须来自同一份索引，在锁内计算（增量维护和重新加载都在锁内修改索引）
+        with self._lock:
+            if tag_ids:
+                bitmap = self.intersect(tag_ids)
+            elif tag_id is not None:
+                bitmap = self.tag_bitmap(tag_id)
+            else:
+                bitmap = self.union_by_type(tag_type_id)
+
+            if not bitmap:
+                return []
+            return [p for p in problems if p.data_path and self.contains(bitmap, p.data_path)]
+
+
+# 进程内单例
+tag_bitmap_index = TagBitmapIndex()
@@ -4,6 +4,8 @@ from sqlalchemy import and_
 from datetime import datetime
 from app.models import Tag, TagType, Problem, TagApprovalRequest, User
 from app.schemas.tag import TagCreate, TagUpdate, TagTypeCreate, TagTypeUpdate, TagApprovalRequestCreate, TagApprovalRequestUpdate
+from app.services.tag_index_service import tag_bitmap_index
+from app.services.problem_resolver_service import problem_path_resolver
 import logging
 
 # 配置日志
@@ -52,6 +54,7 @@ class TagService:
         
         db.delete(db_tag_type)
         db.commit()
+        tag_bitmap_index.invalidate()
         return True
     
     @staticmethod
@@ -88,6 +91,8 @@ class TagService:
         
         db.commit()
         db.refresh(db_tag)
+        # 标签类型可能改变，按类型求并集的结果需要重建
+        tag_bitmap_index.invalidate()
         return db_tag
     
     @staticmethod
@@ -99,43 +104,16 @@ class TagService:
         
         db.delete(db_tag)
         db.commit()
+        tag_bitmap_index.invalidate()
         return True
     
     @staticmethod
     def get_problem_by_path(db: Session, problem_path: str) -> Optional[Problem]:
-        """通过data_path获取问题"""
-        logger.info(f"查找问题路径: {problem_path}")
-        
-        # 尝试使用原始路径和URL解码后的路径
-        from urllib.parse import unquote
-        
-        # 尝试直接匹配
-        problem = db.query(Problem).filter(Problem.data_path == problem_path).first()
-        if problem:
-            logger.info(f"直接匹配成功: {problem_path}")
-            return problem
-            
-        # 尝试URL解码后再查询
-        decoded_path = unquote(problem_path)
-        if decoded_path != problem_path:
-            problem = db.query(Problem).filter(Problem.data_path == decoded_path).first()
-            if problem:
-                return problem
-        
-        # 避免进行昂贵的模糊匹配，除非绝对必要
-        # 如果路径中包含'/'，可能是完整路径，尝试使用最后一部分进行匹配
-        if '/' in decoded_path:
-            # 尝试使用路径的最后一部分进行匹配
-            last_part = decoded_path.split('/')[-1]
-            if last_part:
-                # 使用精确匹配最后部分，而不是模糊匹配
-                problems = db.query(Problem).filter(Problem.data_path.endswith(last_part)).limit(5).all()
-                for p in problems:
-                    if p.data_path and (decoded_path.endswith(p.data_path) or p.data_path.endswith(decoded_path)):
-                        return p
-        
-        logger.warning(f"问题路径未找到: {problem_path}")
-        return None
+        """通过data_path获取问题（按规范化的path_key走唯一索引或进程内缓存）"""
+        problem = problem_path_resolver.resolve(db, problem_path)
+        if not problem:
+            logger.warning(f"问题路径未找到: {problem_path}")
+        return problem
     
     @staticmethod
     def _create_problem_from_filesystem(db: Session, problem_path: str) -> Optional[Problem]:
@@ -182,17 +160,9 @@ class TagService:
                 problem_name = problem_info.name
                 chinese_name = problem_info.chinese_name
                 
-                # 解析时间限制（从"1000ms"中提取数字）
-                time_limit_str = problem_info.time_limit or "1000ms"
-                import re
-                time_match = re.search(r'(\d+)', time_limit_str)
-                time_limit = int(time_match.group(1)) if time_match else 1000
-                
-                # 解析内存限制（从"256M"中提取数字，转换为字节）
-                memory_limit_str = problem_info.memory_limit or "256M"
-                memory_match = re.search(r'(\d+)', memory_limit_str)
-                memory_mb = int(memory_match.group(1)) if memory_match else 256
-                memory_limit = memory_mb * 1024 * 1024  # 转换为字节
+                # 解析时间、内存限制（与题库对账任务使用相同规则）
+                from app.services.problem_reconcile_service import parse_limits
+                time_limit, memory_limit = parse_limits(problem_info)
                 
             except Exception as e:
                 logger.error(f"解析Question.INF文件失败: {e}")
@@ -256,6 +226,7 @@ class TagService:
         if tag not in problem.tags:
             problem.tags.append(tag)
             db.commit()
+            tag_bitmap_index.add(problem.data_path, tag.id, tag.tag_type_id)
         
         return True
     
@@ -278,6 +249,7 @@ class TagService:
         if tag in problem.tags:
             problem.tags.remove(tag)
             db.commit()
+            tag_bitmap_index.remove(problem.data_path, tag.id)
         
         return True
     
@@ -316,6 +288,7 @@ class TagService:
                 problem.tags.append(tag)
         
         db.commit()
+        tag_bitmap_index.set_tags(problem.data_path, problem.tags)
         logger.info(f"成功为题目 {problem.name} 设置了 {len(tag_ids)} 个标签")
         return True
     
@@ -334,49 +307,13 @@ class TagService:
         if not problem_paths:
             return {}
         
-        result = {}
-        
-        # 创建一个集合来存储已处理的路径，避免重复处理
-        unique_paths = set(problem_paths)
+        # 所有路径规范化后通过path_key一次查询
+        path_to_problem = problem_path_resolver.resolve_many(db, set(problem_paths))
         
-        # 首先尝试直接匹配所有路径
-        problems = db.query(Problem).filter(Problem.data_path.in_(unique_paths)).all()
-        
-        # 创建路径到问题的映射
-        path_to_problem = {p.data_path: p for p in problems if p.data_path}
-        
-        # 处理已找到的问题
+        result = {}
         for path in problem_paths:
-            if path in path_to_problem:
-                result[path] = path_to_problem[path].tags
-        
-        # 处理未找到的路径
-        missing_paths = [p for p in unique_paths if p not in path_to_problem]
-        
-        if missing_paths:
-            # 对于未找到的路径，尝试URL解码后再查询
-            from urllib.parse import unquote
-            
-            for path in missing_paths:
-                decoded_path = unquote(path)
-                if decoded_path != path:
-                    # 尝试使用解码后的路径查询
-                    problem = db.query(Problem).filter(Problem.data_path == decoded_path).first()
-                    if problem:
-                        result[path] = problem.tags
-                        continue
-                
-                # 如果仍未找到，尝试最后的模糊匹配
-                if '/' in decoded_path:
-                    last_part = decoded_path.split('/')[-1]
-                    if last_part:
-                        problem = TagService.get_problem_by_path(db, path)
-                        if problem:
-                            result[path] = problem.tags
-                            continue
-                
-                # 如果所有尝试都失败，设置为空列表
-                result[path] = []
+            problem = path_to_problem.get(path)
+            result[path] = problem.tags if problem else []
         
         return result
     
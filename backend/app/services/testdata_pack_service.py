@@ -0,0 +1,315 @@
+import os
+import re
+import mmap
+import struct
+import hashlib
+import threading
+import logging
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from app.services.encoding_service import BankEncodingService, detect_encoding
+from app.utils.path_utils import normalize_problem_path
+
+logger = logging.getLogger(__name__)
+
+# 测试数据包目录（backend容器中挂载到宿主机的data目录）
+PACK_ROOT = os.getenv("TESTDATA_PACK_ROOT", "/app/data/testdata_packs")
+PACK_SUFFIX = ".pack"
+
+# 文件格式：
+#   文件头   magic(4) version(2) 保留(2) 用例数(4) 题目目录mtime_ns(8) 测试文件最大mtime_ns(8)
+#   索引     每个用例一条记录：用例号(4) 输入偏移(8) 输入长度(8) 输出偏移(8) 输出长度(8)
+#            输入MD5(16) 输出MD5(16) 去除末尾空白后的输出MD5(16)
+#            输入编码(1) 输入BOM长度(1) 输出编码(1) 输出BOM长度(1)
+#   数据区   各用例的输入、输出原始字节依次排列
+PACK_MAGIC = b"CJTP"
+PACK_VERSION = 2
+HEADER = struct.Struct("<4sHHIqq")
+RECORD = struct.Struct("<IQQQQ16s16s16sBBBB")
+
+# 编码表（索引写入记录中）
+ENCODINGS = ["utf-8", "gb18030", "utf-16-le", "utf-16-be", "latin1"]
+
+# 同时保持打开的数据包数量
+MAX_OPEN_PACKS = 128
+
+_CASE_RE = re.compile(r"^(\d+)\.in$")
+
+
+class PackCase:
+    """数据包中的一个测试用例"""
+
+    __slots__ = ("number", "in_offset", "in_length", "out_offset", "out_length",
+                 "in_md5", "out_md5", "out_stripped_md5", "in_encoding", "in_bom", "out_encoding", "out_bom")
+
+    def __init__(self, number, in_offset, in_length, out_offset, out_length,
+                 in_md5, out_md5, out_stripped_md5, in_encoding, in_bom, out_encoding, out_bom):
+        self.number = number
+        self.in_offset = in_offset
+        self.in_length = in_length
+        self.out_offset = out_offset
+        self.out_length = out_length
+        self.in_md5 = in_md5.hex()
+        self.out_md5 = out_md5.hex()
+        self.out_stripped_md5 = out_stripped_md5.hex()  # 评测机info文件使用
+        self.in_encoding = ENCODINGS[in_encoding]
+        self.in_bom = in_bom
+        self.out_encoding = ENCODINGS[out_encoding]
+        self.out_bom = out_bom
+
+
+class TestDataPack:
+    """
+    只读的测试数据包
+
+    通过mmap映射整个文件，input()/output()返回指向映射区域的memoryview，不复制数据。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            stat = os.fstat(self._file.fileno())
+            self.pack_mtime_ns = stat.st_mtime_ns
+            self.pack_inode = stat.st_ino
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self._file.close()
+            raise
+        self._view = memoryview(self._mmap)
+
+        magic, version, _, count, self.dir_mtime_ns, self.files_mtime_ns = HEADER.unpack_from(self._mmap, 0)
+        if magic != PACK_MAGIC or version != PACK_VERSION:
+            self.close()
+            raise ValueError(f"无效的测试数据包: {path}")
+
+        self.cases: Dict[int, PackCase] = {}
+        offset = HEADER.size
+        for _ in range(count):
+            case = PackCase(*RECORD.unpack_from(self._mmap, offset))
+            self.cases[case.number] = case
+            offset += RECORD.size
+
+    def numbers(self) -> List[int]:
+        return sorted(self.cases)
+
+    def input(self, number: int) -> memoryview:
+        case = self.cases[number]
+        return self._view[case.in_offset:case.in_offset + case.in_length]
+
+    def output(self, number: int) -> memoryview:
+        case = self.cases[number]
+        return self._view[case.out_offset:case.out_offset + case.out_length]
+
+    def input_text(self, number: int) -> str:
+        case = self.cases[number]
+        return str(self.input(number)[case.in_bom:], case.in_encoding, "replace")
+
+    def output_text(self, number: int) -> str:
+        case = self.cases[number]
+        return str(self.output(number)[case.out_bom:], case.out_encoding, "replace")
+
+    def close(self) -> None:
+        try:
+            self._view.release()
+        except Exception:
+            pass
+        try:
+            self._mmap.close()
+        except Exception:
+            pass
+        self._file.close()
+
+
+def pack_path(data_path: str) -> str:
+    """题目对应的数据包文件路径"""
+    return os.path.join(PACK_ROOT, normalize_problem_path(data_path) + PACK_SUFFIX)
+
+
+def _file_encoding(path: str, raw_data: bytes, stat: os.stat_result) -> Tuple[int, int]:
+    """文件编码在编码表中的索引和BOM长度，优先使用编码清单"""
+    entry = BankEncodingService.lookup(path)
+    if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+        encoding, bom = entry["encoding"], entry["bom"]
+    else:
+        encoding, bom, _, _ = detect_encoding(raw_data)
+    if encoding not in ENCODINGS:
+        encoding = "latin1"
+    return ENCODINGS.index(encoding), bom
+
+
+class TestDataPackService:
+    """测试数据包的构建与读取"""
+
+    _lock = threading.Lock()
+    _open: "OrderedDict[str, TestDataPack]" = OrderedDict()
+
+    @staticmethod
+    def _scan(problem_dir: str) -> Tuple[List[Tuple[int, str, str]], int]:
+        """列出题目目录中成对的N.in/N.out文件，返回用例列表和这些文件的最大修改时间"""
+        cases = []
+        files_mtime_ns = 0
+        for name in os.listdir(problem_dir):
+            match = _CASE_RE.match(name)
+            if not match:
+                continue
+            in_path = os.path.join(problem_dir, name)
+            out_path = os.path.join(problem_dir, f"{match.group(1)}.out")
+            try:
+                files_mtime_ns = max(files_mtime_ns, os.stat(in_path).st_mtime_ns, os.stat(out_path).st_mtime_ns)
+            except OSError:
+                continue
+            cases.append((int(match.group(1)), in_path, out_path))
+        cases.sort()
+        return cases, files_mtime_ns
+
+    @staticmethod
+    def build(problem_dir: str, data_path: str) -> Optional[str]:
+        """从题目目录中的测试文件构建数据包，没有测试用例时返回None"""
+        dir_mtime_ns = os.stat(problem_dir).st_mtime_ns
+        cases, files_mtime_ns = TestDataPackService._scan(problem_dir)
+        if not cases:
+            return None
+
+        target = pack_path(data_path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        staged = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+        records = []
+        data_offset = HEADER.size + RECORD.size * len(cases)
+        try:
+            with open(staged, "wb") as f:
+                f.seek(data_offset)
+                offset = data_offset
+                for number, in_path, out_path in cases:
+                    entry = [number]
+                    digests = []
+                    encodings = []
+                    for path in (in_path, out_path):
+                        with open(path, "rb") as source:
+                            stat = os.fstat(source.fileno())
+                            raw_data = source.read()
+                        f.write(raw_data)
+                        entry.extend([offset, len(raw_data)])
+                        digests.append(hashlib.md5(raw_data).digest())
+                        encodings.extend(_file_encoding(path, raw_data, stat))
+                        offset += len(raw_data)
+                    # 评测机比较输出时使用去除末尾空白后的MD5，构建时一并算好
+                    digests.append(hashlib.md5(raw_data.rstrip()).digest())
+                    records.append(RECORD.pack(*entry, *digests, *encodings))
+
+                f.seek(0)
+                f.write(HEADER.pack(PACK_MAGIC, PACK_VERSION, 0, len(cases), dir_mtime_ns, files_mtime_ns))
+                f.write(b"".join(records))
+            os.replace(staged, target)
+        except Exception:
+            if os.path.exists(staged):
+                os.remove(staged)
+            raise
+
+        logger.info(f"已构建测试数据包: {target} ({len(cases)} 组用例)")
+        return target
+
+    @staticmethod
+    def is_fresh(pack: TestDataPack, problem_dir: str, deep: bool = False) -> bool:
+        """
+        判断数据包是否与题目目录一致
+
+        题目目录的修改时间反映新增、删除、替换文件；原地修改N.in/N.out不会改变目录mtime，
+        所以还要逐个stat数据包中各用例的文件，比较大小和最大修改时间（每个用例两次stat，不读取内容）。
+        deep为True时重新扫描整个目录，用于离线刷新。
+        """
+        try:
+            if os.stat(problem_dir).st_mtime_ns != pack.dir_mtime_ns:
+                return False
+        except OSError:
+            return False
+        if deep:
+            _, files_mtime_ns = TestDataPackService._scan(problem_dir)
+            return files_mtime_ns == pack.files_mtime_ns
+
+        files_mtime_ns = 0
+        try:
+            for number, case in pack.cases.items():
+                in_stat = os.stat(os.path.join(problem_dir, f"{number}.in"))
+                out_stat = os.stat(os.path.join(problem_dir, f"{number}.out"))
+                if in_stat.st_size != case.in_length or out_stat.st_size != case.out_length:
+                    return False
+                files_mtime_ns = max(files_mtime_ns, in_stat.st_mtime_ns, out_stat.st_mtime_ns)
+        except OSError:
+            return False
+        return files_mtime_ns == pack.files_mtime_ns
+
+    @staticmethod
+    def _open_pack(path: str) -> Optional[TestDataPack]:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+
+        with TestDataPackService._lock:
+            pack = TestDataPackService._open.get(path)
+            if pack is not None:
+                if pack.pack_inode == stat.st_ino and pack.pack_mtime_ns == stat.st_mtime_ns:
+                    TestDataPackService._open.move_to_end(path)
+                    return pack
+                # 数据包已被重建，旧映射在引用释放后由垃圾回收关闭
+                del TestDataPackService._open[path]
+
+        pack = TestDataPack(path)
+        with TestDataPackService._lock:
+            TestDataPackService._open[path] = pack
+            while len(TestDataPackService._open) > MAX_OPEN_PACKS:
+                TestDataPackService._open.popitem(last=False)
+        return pack
+
+    @staticmethod
+    def get(problem_dir: str, data_path: str, build: bool = True) -> Optional[TestDataPack]:
+        """
+        获取题目的测试数据包
+
+        数据包不存在或已过期时，build为True则同步重建，否则返回None
+        """
+        path = pack_path(data_path)
+        try:
+            pack = TestDataPackService._open_pack(path)
+        except Exception as e:
+            logger.warning(f"打开测试数据包失败 {path}: {e}")
+            pack = None
+
+        if pack is not None and TestDataPackService.is_fresh(pack, problem_dir):
+            return pack
+        if not build:
+            return None
+
+        try:
+            if TestDataPackService.build(problem_dir, data_path) is None:
+                return None
+            return TestDataPackService._open_pack(path)
+        except Exception as e:
+            logger.warning(f"构建测试数据包失败 {problem_dir}: {e}")
+            return None
+
+    @staticmethod
+    def refresh_bank(problems_root: str, force: bool = False) -> Dict:
+        """重建题库中所有过期（或全部）的数据包"""
+        stats = {"built": 0, "fresh": 0, "empty": 0, "errors": []}
+        for problem_dir in BankEncodingService.find_problem_dirs(problems_root):
+            data_path = os.path.relpath(problem_dir, problems_root)
+            try:
+                if not force:
+                    try:
+                        pack = TestDataPackService._open_pack(pack_path(data_path))
+                    except Exception:
+                        pack = None  # 旧版本或损坏的数据包，重新构建
+                    if pack is not None and TestDataPackService.is_fresh(pack, problem_dir, deep=True):
+                        stats["fresh"] += 1
+                        continue
+                if TestDataPackService.build(problem_dir, data_path):
+                    stats["built"] += 1
+                else:
+                    stats["empty"] += 1
+            except Exception as e:
+                stats["errors"].append({"path": data_path, "error": str(e)})
+        return stats
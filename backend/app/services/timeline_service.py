@@ -0,0 +1,315 @@
+import calendar
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.models import Submission, SubmissionSummary, SubmissionTimeline
+from app.utils.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+# 每个练习每分钟一个计数哈希（total和各评测状态）和一个提交人HyperLogLog
+COUNTS_KEY = "timeline:counts:{exercise_id}:{minute}"
+USERS_KEY = "timeline:users:{exercise_id}:{minute}"
+# 练习尚未压缩的分钟（有序集合，分数为分钟的时间戳）及有待压缩数据的练习
+BUCKETS_KEY = "timeline:buckets:{exercise_id}"
+EXERCISES_KEY = "timeline:exercises"
+
+# 计数器的保留时间，压缩任务长时间未运行时避免Redis中堆积
+KEY_EXPIRE = 3 * 24 * 3600
+
+# 分钟结束后超过该时间才压缩，评测排队较久的提交仍能计入原来的分钟
+SETTLE_MINUTES = 30
+
+# 卡住的学生：在某题上已提交多次仍未通过，且最近仍在提交
+STUCK_ATTEMPTS = 3
+STUCK_WINDOW_MINUTES = 20
+
+TOTAL_FIELD = "total"
+
+BACKFILL_SQL = """
+INSERT INTO submission_timeline (exercise_id, bucket_start, submission_count, distinct_users, status_counts)
+SELECT s.exercise_id, s.bucket_start, sum(s.n), u.distinct_users, jsonb_object_agg(s.status, s.n)
+FROM (
+    SELECT exercise_id, date_trunc('minute', submitted_at) AS bucket_start,
+           COALESCE(status, 'Pending') AS status, count(*) AS n
+    FROM submissions
+    WHERE exercise_id IS NOT NULL AND submitted_at < :before {exercise_filter}
+    GROUP BY 1, 2, 3
+) s
+JOIN (
+    SELECT exercise_id, date_trunc('minute', submitted_at) AS bucket_start, count(DISTINCT user_id) AS distinct_users
+    FROM submissions
+    WHERE exercise_id IS NOT NULL AND submitted_at < :before {exercise_filter}
+    GROUP BY 1, 2
+) u USING (exercise_id, bucket_start)
+GROUP BY s.exercise_id, s.bucket_start, u.distinct_users
+ON CONFLICT (exercise_id, bucket_start) DO UPDATE SET
+    submission_count = EXCLUDED.submission_count,
+    distinct_users = EXCLUDED.distinct_users,
+    status_counts = EXCLUDED.status_counts
+"""
+
+
+def _naive(value: datetime) -> datetime:
+    """提交时间统一为本地naive时间（与submissions.submitted_at一致）"""
+    if value.tzinfo is not None:
+        return value.astimezone().replace(tzinfo=None)
+    return value
+
+
+def _minute(value: datetime) -> int:
+    """分钟桶的编号：把naive时间当作UTC换算的时间戳，只用于排序和换算，不表示时区"""
+    return calendar.timegm(_naive(value).replace(second=0, microsecond=0).timetuple())
+
+
+def _minute_start(minute: int) -> datetime:
+    return datetime(1970, 1, 1) + timedelta(seconds=minute)
+
+
+class TimelineService:
+    """
+    练习的提交时间线（教师上课时查看每分钟提交数、评测状态构成和卡住的学生）
+
+    每次评测结束时在Redis中按分钟累加计数（HINCRBY）并记录提交人（PFADD），
+    读取时不扫描提交记录；超过沉淀时间的分钟由压缩任务写入submission_timeline表。
+    """
+
+    @staticmethod
+    def record(submission: Submission) -> None:
+        """评测结束后累加计数，Redis不可用时只记录日志"""
+        if not submission.exercise_id or submission.submitted_at is None:
+            return
+        try:
+            minute = _minute(submission.submitted_at)
+            counts_key = COUNTS_KEY.format(exercise_id=submission.exercise_id, minute=minute)
+            users_key = USERS_KEY.format(exercise_id=submission.exercise_id, minute=minute)
+            buckets_key = BUCKETS_KEY.format(exercise_id=submission.exercise_id)
+            pipe = redis_client.pipeline(transaction=False)
+            pipe.hincrby(counts_key, TOTAL_FIELD, 1)
+            pipe.hincrby(counts_key, submission.status or "Pending", 1)
+            pipe.pfadd(users_key, submission.user_id)
+            pipe.zadd(buckets_key, {minute: minute})
+            pipe.sadd(EXERCISES_KEY, submission.exercise_id)
+            for key in (counts_key, users_key, buckets_key):
+                pipe.expire(key, KEY_EXPIRE)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"更新提交时间线失败: {e}")
+
+    # ---------- 读取 ----------
+
+    @staticmethod
+    def _redis_minutes(exercise_id: int, since: int) -> Dict[int, Dict[str, Any]]:
+        """Redis中尚未压缩的分钟：{分钟: {"counts", "distinct_users"}}"""
+        minutes = [int(m) for m in redis_client.zrangebyscore(BUCKETS_KEY.format(exercise_id=exercise_id), since, "+inf")]
+        if not minutes:
+            return {}
+        pipe = redis_client.pipeline(transaction=False)
+        for minute in minutes:
+            pipe.hgetall(COUNTS_KEY.format(exercise_id=exercise_id, minute=minute))
+            pipe.pfcount(USERS_KEY.format(exercise_id=exercise_id, minute=minute))
+        values = pipe.execute()
+        result = {}
+        for index, minute in enumerate(minutes):
+            counts = {field: int(value) for field, value in values[2 * index].items()}
+            if counts:
+                result[minute] = {"counts": counts, "distinct_users": values[2 * index + 1]}
+        return result
+
+    @staticmethod
+    def get_timeline(db: Session, exercise_id: int, minutes: int = 90, bucket_minutes: int = 1) -> Dict[str, Any]:
+        """
+        最近一段时间的提交时间线
+
+        Args:
+            minutes: 时间范围（分钟）
+            bucket_minutes: 每个时间桶的长度（分钟）
+
+        多分钟合并的时间桶中，Redis里的分钟按HyperLogLog合并去重；
+        已压缩的分钟只保留了各自的人数，合并时取最大值（下界估计）
+        """
+        bucket_seconds = bucket_minutes * 60
+        now = _minute(datetime.now())
+        first_bucket = (now - (minutes - 1) * 60) // bucket_seconds * bucket_seconds
+
+        # 已压缩的分钟
+        per_minute: Dict[int, Dict[str, Any]] = {}
+        rows = db.query(SubmissionTimeline).filter(
+            SubmissionTimeline.exercise_id == exercise_id,
+            SubmissionTimeline.bucket_start >= _minute_start(first_bucket)
+        )
+        for row in rows:
+            counts = dict(row.status_counts or {})
+            counts[TOTAL_FIELD] = row.submission_count
+            per_minute[_minute(row.bucket_start)] = {"counts": counts, "distinct_users": row.distinct_users, "redis": False}
+
+        # Redis中的分钟（与已压缩的同一分钟相加：压缩后才到达的评测结果）
+        try:
+            live = TimelineService._redis_minutes(exercise_id, first_bucket)
+        except Exception as e:
+            logger.warning(f"读取提交时间线计数失败: {e}")
+            live = {}
+        for minute, data in live.items():
+            entry = per_minute.setdefault(minute, {"counts": {}, "distinct_users": 0})
+            for field, value in data["counts"].items():
+                entry["counts"][field] = entry["counts"].get(field, 0) + value
+            entry["distinct_users"] = max(entry["distinct_users"], data["distinct_users"])
+            entry["redis"] = True
+
+        # 合并到时间桶
+        buckets: Dict[int, Dict[str, Any]] = {
+            start: {"counts": {}, "distinct_users": 0, "redis_minutes": []}
+            for start in range(first_bucket, now + 1, bucket_seconds)
+        }
+        for minute, data in per_minute.items():
+            bucket = buckets.get(minute // bucket_seconds * bucket_seconds)
+            if bucket is None:
+                continue
+            for field, value in data["counts"].items():
+                bucket["counts"][field] = bucket["counts"].get(field, 0) + value
+            bucket["distinct_users"] = max(bucket["distinct_users"], data["distinct_users"])
+            if data.get("redis"):
+                bucket["redis_minutes"].append(minute)
+
+        if bucket_minutes > 1:
+            merged = [(start, b["redis_minutes"]) for start, b in buckets.items() if len(b["redis_minutes"]) > 1]
+            if merged:
+                try:
+                    pipe = redis_client.pipeline(transaction=False)
+                    for _, redis_minutes in merged:
+                        pipe.pfcount(*[USERS_KEY.format(exercise_id=exercise_id, minute=m) for m in redis_minutes])
+                    for (start, _), count in zip(merged, pipe.execute()):
+                        buckets[start]["distinct_users"] = max(buckets[start]["distinct_users"], count)
+                except Exception as e:
+                    logger.warning(f"合并提交人数失败: {e}")
+
+        statuses = sorted({field for b in buckets.values() for field in b["counts"] if field != TOTAL_FIELD})
+        return {
+            "exercise_id": exercise_id,
+            "bucket_minutes": bucket_minutes,
+            "statuses": statuses,
+            "buckets": [
+                {
+                    "start": _minute_start(start),
+                    "submission_count": b["counts"].get(TOTAL_FIELD, 0),
+                    "distinct_users": b["distinct_users"],
+                    "status_counts": {status: b["counts"].get(status, 0) for status in statuses},
+                }
+                for start, b in sorted(buckets.items())
+            ],
+            **TimelineService.get_stuck_students(db, exercise_id),
+        }
+
+    @staticmethod
+    def get_stuck_students(db: Session, exercise_id: int) -> Dict[str, Any]:
+        """卡住的学生（从提交汇总表按练习主键前缀读取，不扫描提交记录）"""
+        since = datetime.now() - timedelta(minutes=STUCK_WINDOW_MINUTES)
+        rows = db.query(SubmissionSummary.problem_id, SubmissionSummary.user_id).filter(
+            SubmissionSummary.exercise_id == exercise_id,
+            SubmissionSummary.first_ac_at.is_(None),
+            SubmissionSummary.attempt_count >= STUCK_ATTEMPTS,
+            SubmissionSummary.last_submitted_at >= since
+        ).all()
+        stuck_by_problem: Dict[int, int] = {}
+        for problem_id, _ in rows:
+            stuck_by_problem[problem_id] = stuck_by_problem.get(problem_id, 0) + 1
+        return {
+            "stuck_students": len({user_id for _, user_id in rows}),
+            "stuck_by_problem": stuck_by_problem,
+        }
+
+    # ---------- 压缩 ----------
+
+    @staticmethod
+    def compact(db: Session, settle_minutes: int = SETTLE_MINUTES) -> Dict[str, int]:
+        """
+        把超过沉淀时间的分钟从Redis写入submission_timeline表
+
+        同一分钟已有数据时计数相加（压缩后才到达的评测结果），写入数据库后再删除Redis中的计数
+        """
+        cutoff = _minute(datetime.now()) - settle_minutes * 60
+        stats = {"exercises": 0, "buckets": 0}
+        for exercise_id in [int(e) for e in redis_client.smembers(EXERCISES_KEY)]:
+            buckets_key = BUCKETS_KEY.format(exercise_id=exercise_id)
+            minutes = [int(m) for m in redis_client.zrangebyscore(buckets_key, "-inf", cutoff)]
+            if minutes:
+                live = TimelineService._redis_minutes(exercise_id, minutes[0])
+                live = {minute: data for minute, data in live.items() if minute <= cutoff}
+                existing = {
+                    _minute(row.bucket_start): row
+                    for row in db.query(SubmissionTimeline).filter(
+                        SubmissionTimeline.exercise_id == exercise_id,
+                        SubmissionTimeline.bucket_start.in_([_minute_start(m) for m in live])
+                    )
+                } if live else {}
+                for minute, data in live.items():
+                    counts = dict(data["counts"])
+                    total = counts.pop(TOTAL_FIELD, 0)
+                    row = existing.get(minute)
+                    if row is None:
+                        db.add(SubmissionTimeline(
+                            exercise_id=exercise_id,
+                            bucket_start=_minute_start(minute),
+                            submission_count=total,
+                            distinct_users=data["distinct_users"],
+                            status_counts=counts
+                        ))
+                    else:
+                        merged = dict(row.status_counts or {})
+                        for status, value in counts.items():
+                            merged[status] = merged.get(status, 0) + value
+                        row.status_counts = merged
+                        row.submission_count += total
+                        row.distinct_users = max(row.distinct_users, data["distinct_users"])
+                try:
+                    db.commit()
+                except Exception:
+                    db.rollback()
+                    raise
+
+                pipe = redis_client.pipeline(transaction=True)
+                for minute in minutes:
+                    pipe.delete(COUNTS_KEY.format(exercise_id=exercise_id, minute=minute),
+                                USERS_KEY.format(exercise_id=exercise_id, minute=minute))
+                pipe.zremrangebyscore(buckets_key, "-inf", cutoff)
+                pipe.execute()
+                stats["exercises"] += 1
+                stats["buckets"] += len(live)
+
+            if not redis_client.zcard(buckets_key):
+                redis_client.srem(EXERCISES_KEY, exercise_id)
+        logger.info(f"提交时间线压缩完成: {stats['exercises']} 个练习, {stats['buckets']} 个分钟")
+        return stats
+
+    @staticmethod
+    def backfill(db: Session, before: Optional[datetime] = None, exercise_id: Optional[int] = None) -> Dict[str, int]:
+        """
+        从提交记录按date_trunc('minute')生成before之前的历史数据（覆盖表中已有的分钟），
+        并丢弃Redis中这些分钟的计数，避免压缩时重复累加
+        """
+        before = _naive(before or datetime.now() - timedelta(minutes=SETTLE_MINUTES)).replace(second=0, microsecond=0)
+        exercise_filter = "AND exercise_id = :exercise_id" if exercise_id else ""
+        params = {"before": before, "exercise_id": exercise_id}
+        try:
+            result = db.execute(text(BACKFILL_SQL.format(exercise_filter=exercise_filter)), params)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+        cutoff = _minute(before) - 60
+        exercise_ids = [exercise_id] if exercise_id else [int(e) for e in redis_client.smembers(EXERCISES_KEY)]
+        for e in exercise_ids:
+            buckets_key = BUCKETS_KEY.format(exercise_id=e)
+            minutes = [int(m) for m in redis_client.zrangebyscore(buckets_key, "-inf", cutoff)]
+            if minutes:
+                pipe = redis_client.pipeline(transaction=True)
+                for minute in minutes:
+                    pipe.delete(COUNTS_KEY.format(exercise_id=e, minute=minute), USERS_KEY.format(exercise_id=e, minute=minute))
+                pipe.zremrangebyscore(buckets_key, "-inf", cutoff)
+                pipe.execute()
+        return {"buckets": result.rowcount}
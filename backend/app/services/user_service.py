@@ -178,6 +178,11 @@ class UserService:
         db.commit()
         db.refresh(student)
         
+        # 班级关系变化后排行榜需要重建
+        if class_ids is not None:
+            from app.services.leaderboard_service import LeaderboardService
+            LeaderboardService.bump_membership_version()
+        
         return student
     
     @staticmethod
@@ -210,6 +215,10 @@ class UserService:
         db.delete(student)
         db.commit()
         
+        # 学生删除后需要从排行榜中移除
+        from app.services.leaderboard_service import LeaderboardService
+        LeaderboardService.bump_membership_version()
+        
         return True
     
     @staticmethod
@@ -360,6 +369,10 @@ class UserService:
         
         db.commit()
         
+        # 学生删除后需要从排行榜中移除
+        from app.services.leaderboard_service import LeaderboardService
+        LeaderboardService.bump_membership_version()
+        
         return count
     
     @staticmethod
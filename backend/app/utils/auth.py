@@ -63,6 +63,20 @@ def get_current_user(db: Session = Depends(get_db), token: str = Depends(oauth2_
     
     return user
 
+def get_user_from_token(db: Session, token: str) -> Optional[User]:
+    """
+    解析令牌对应的用户，令牌无效时返回None
+    用于无法设置Authorization请求头的场景（如EventSource通过查询参数传递令牌）
+    """
+    try:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    except JWTError:
+        return None
+    username = payload.get("sub")
+    if username is None:
+        return None
+    return db.query(User).filter(User.username == username).first()
+
 def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
     """获取当前活跃用户"""
     # 我们可以使用 is_online 字段来检查用户是否活跃
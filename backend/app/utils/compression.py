@@ -0,0 +1,50 @@
+import zlib
+from typing import Optional
+
+try:
+    import zstandard
+except ImportError:  # zstandard为可选依赖，缺失时使用zlib压缩
+    zstandard = None
+
+# 压缩数据的第一个字节标明压缩方式，以后更换算法时旧数据仍可解压
+CODEC_ZLIB = b"z"
+CODEC_ZSTD = b"s"
+
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 10
+
+
+def compress(data: bytes) -> bytes:
+    """压缩字节数据，有zstandard时使用zstd，否则使用zlib"""
+    if zstandard is not None:
+        return CODEC_ZSTD + zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    return CODEC_ZLIB + zlib.compress(data, ZLIB_LEVEL)
+
+
+def decompress(blob: bytes) -> bytes:
+    """
+    解压compress()的结果
+
+    Raises:
+        ValueError: 未知的压缩方式，或数据为zstd压缩但未安装zstandard
+    """
+    blob = bytes(blob)
+    codec, payload = blob[:1], blob[1:]
+    if codec == CODEC_ZLIB:
+        return zlib.decompress(payload)
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise ValueError("数据使用zstd压缩，服务器未安装zstandard")
+        # 压缩时写入了原始长度，一次解压即可
+        return zstandard.ZstdDecompressor().decompress(payload)
+    raise ValueError(f"未知的压缩方式: {codec!r}")
+
+
+def compress_text(text: str) -> bytes:
+    return compress(text.encode("utf-8"))
+
+
+def decompress_text(blob: Optional[bytes]) -> Optional[str]:
+    if blob is None:
+        return None
+    return decompress(blob).decode("utf-8", "replace")
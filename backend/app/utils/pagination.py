@@ -0,0 +1,50 @@
+import json
+import base64
+import binascii
+from datetime import datetime
+from typing import Any, List, Optional, Sequence
+
+# 游标分页的默认和最大每页条数
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(*values: Any) -> str:
+    """把上一页最后一行的排序键编码为不透明的游标字符串（datetime按ISO格式保存）"""
+    payload = [{"dt": v.isoformat()} if isinstance(v, datetime) else v for v in values]
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str], size: int) -> Optional[List[Any]]:
+    """
+    解析游标，cursor为空时返回None
+
+    Raises:
+        ValueError: 游标格式不正确
+    """
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw.decode("utf-8"))
+    except (binascii.Error, UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise ValueError("无效的分页游标") from e
+    if not isinstance(payload, list) or len(payload) != size:
+        raise ValueError("无效的分页游标")
+    values = []
+    for value in payload:
+        if isinstance(value, dict) and "dt" in value:
+            value = datetime.fromisoformat(value["dt"])
+        values.append(value)
+    return values
+
+
+def next_cursor(rows: Sequence[Any], limit: int, key) -> Optional[str]:
+    """
+    多取一行判断是否还有下一页：rows最多为limit + 1行，key(row)返回排序键元组
+
+    调用方在返回前去掉多取的一行
+    """
+    if len(rows) <= limit:
+        return None
+    return encode_cursor(*key(rows[limit - 1]))
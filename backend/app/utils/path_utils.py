@@ -0,0 +1,30 @@
+import re
+import unicodedata
+from typing import Optional
+from urllib.parse import unquote
+
+_SLASHES_RE = re.compile(r"/+")
+_BANK_PREFIX_RE = re.compile(r"^(app_root/)?题库(/|$)")
+
+
+def normalize_problem_path(path: Optional[str]) -> Optional[str]:
+    """
+    生成题目路径的规范化键
+
+    统一为NFC形式、使用/作为分隔符、去除首尾分隔符以及"题库/"前缀，
+    使同一道题的不同写法（URL编码、Windows分隔符、绝对路径等）得到相同的键。
+    与docker/database_history/problem_path_key.sql中的SQL表达式保持一致。
+    """
+    if not path:
+        return None
+    path = unicodedata.normalize("NFC", path.replace("\\", "/"))
+    path = _SLASHES_RE.sub("/", path).strip("/")
+    path = _BANK_PREFIX_RE.sub("", path)
+    return path.strip("/") or None
+
+
+def problem_path_key(raw_path: Optional[str]) -> Optional[str]:
+    """对接口传入的（可能经过URL编码的）路径生成规范化键"""
+    if not raw_path:
+        return None
+    return normalize_problem_path(unquote(raw_path))
@@ -0,0 +1,24 @@
+import os
+import sys
+import time
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.models.database import SessionLocal
+from app.services.submission_summary_service import SubmissionSummaryService
+
+
+def main():
+    """根据已有提交记录重建submission_summary表"""
+    started = time.time()
+    db = SessionLocal()
+    try:
+        result = SubmissionSummaryService.rebuild(db)
+    finally:
+        db.close()
+    print(f"提交汇总表重建完成: {result['rows']} 行, 耗时 {time.time() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+import os
+import sys
+import time
+import argparse
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.services.testdata_pack_service import TestDataPackService, PACK_ROOT
+
+# 题库根目录，与problem_service.py中保持一致
+PROBLEMS_ROOT = "/app_root/题库"
+
+
+def main():
+    """为题库中的每道题构建（或刷新）测试数据包"""
+    parser = argparse.ArgumentParser(description="构建测试数据包")
+    parser.add_argument("--root", default=PROBLEMS_ROOT, help="题库根目录")
+    parser.add_argument("--force", action="store_true", help="忽略修改时间，重建全部数据包")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.root):
+        print(f"题库目录不存在: {args.root}")
+        sys.exit(1)
+
+    started = time.time()
+    stats = TestDataPackService.refresh_bank(args.root, force=args.force)
+    print(f"数据包目录: {PACK_ROOT}")
+    print(f"重建 {stats['built']} 个, 未变化 {stats['fresh']} 个, 无测试用例 {stats['empty']} 个, "
+          f"耗时 {time.time() - started:.2f}s")
+    if stats["errors"]:
+        print(f"以下 {len(stats['errors'])} 道题构建失败:")
+        for item in stats["errors"]:
+            print(f"  {item['path']}: {item['error']}")
+
+
+if __name__ == "__main__":
+    main()
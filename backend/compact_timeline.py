@@ -0,0 +1,37 @@
+import os
+import sys
+import time
+import argparse
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.models.database import SessionLocal
+from app.services.timeline_service import TimelineService, SETTLE_MINUTES
+
+
+def main():
+    """把Redis中的提交时间线计数压缩写入数据库（可由定时任务每隔几分钟执行）"""
+    parser = argparse.ArgumentParser(description="压缩提交时间线")
+    parser.add_argument("--settle-minutes", type=int, default=SETTLE_MINUTES,
+                        help=f"只压缩结束超过N分钟的时间桶，默认{SETTLE_MINUTES}")
+    parser.add_argument("--backfill", action="store_true", help="从已有提交记录重新生成历史数据")
+    parser.add_argument("--exercise", type=int, dest="exercise_id", help="与--backfill一起使用，只处理指定练习")
+    args = parser.parse_args()
+
+    started = time.time()
+    db = SessionLocal()
+    try:
+        if args.backfill:
+            stats = TimelineService.backfill(db, exercise_id=args.exercise_id)
+            print(f"已从提交记录生成 {stats['buckets']} 个分钟的历史数据")
+        else:
+            stats = TimelineService.compact(db, args.settle_minutes)
+            print(f"已压缩 {stats['exercises']} 个练习的 {stats['buckets']} 个分钟")
+    finally:
+        db.close()
+    print(f"耗时 {time.time() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
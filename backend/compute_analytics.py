@@ -0,0 +1,41 @@
+import os
+import sys
+import time
+import argparse
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.models.database import SessionLocal
+from app.services.analytics_service import AnalyticsService, RECENT_DAYS
+
+
+def main():
+    """计算练习的题目分析数据并写入缓存（可由定时任务定期执行）"""
+    parser = argparse.ArgumentParser(description="计算练习分析数据")
+    parser.add_argument("--exercise", type=int, action="append", dest="exercise_ids", help="只计算指定练习（可重复）")
+    parser.add_argument("--days", type=int, default=RECENT_DAYS, help=f"计算最近N天内仍在进行或结束的练习，默认{RECENT_DAYS}")
+    args = parser.parse_args()
+
+    started = time.time()
+    db = SessionLocal()
+    try:
+        if args.exercise_ids:
+            for exercise_id in args.exercise_ids:
+                result = AnalyticsService.compute(db, exercise_id)
+                if result is None:
+                    print(f"练习 {exercise_id} 不存在")
+                    continue
+                overview = result["exercise"]
+                print(f"练习 {exercise_id} {result['exercise_name']}: {overview['submission_count']} 次提交, "
+                      f"{overview['active_students']} 名学生, 耗时 {result['elapsed']}s")
+        else:
+            stats = AnalyticsService.compute_recent(db, args.days)
+            print(f"已计算 {stats['exercises']} 个练习" + (f", 失败: {stats['failed']}" if stats["failed"] else ""))
+    finally:
+        db.close()
+    print(f"总耗时 {time.time() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,9 @@ class Settings:
     # 评测服务配置
     JUDGE_SERVER_URL = os.getenv("JUDGE_SERVER_URL", "http://oj-judge:8080")
     JUDGE_SERVER_TOKEN = os.getenv("JUDGE_SERVER_TOKEN", "12345678")
+    # 评测节点的测试用例目录，格式为"名称=目录"，多个节点用逗号分隔
+    # 默认目录即宿主机的data/test_case，评测机容器将其挂载为/test_case
+    JUDGE_TEST_CASE_TARGETS = os.getenv("JUDGE_TEST_CASE_TARGETS", "oj-judge=/app/data/test_case")
     
     # 应用配置
     SECRET_KEY = os.getenv("SECRET_KEY", "supersecretkey")
@@ -1,3 +1,6 @@
+import time
+import threading
+
 import uvicorn
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
@@ -8,6 +11,34 @@ from app.api import api_router
 # 创建数据库表
 Base.metadata.create_all(bind=engine)
 
+# 检查并创建分区的间隔（秒）
+PARTITION_CHECK_INTERVAL = 6 * 3600
+
+# 提前创建提交记录和操作日志后几个月的分区（多个worker同时执行时由咨询锁串行执行）
+def ensure_partitions():
+    from app.models.database import SessionLocal
+    from app.services.partition_service import PartitionService
+    db = SessionLocal()
+    try:
+        PartitionService.ensure_partitions(db)
+    except Exception as e:
+        print(f"创建分区失败: {e}")
+    finally:
+        db.close()
+
+# 启动时创建一次，之后在后台线程中定期检查，长时间不重启时也不会写入DEFAULT分区
+def schedule_partitions():
+    while True:
+        time.sleep(PARTITION_CHECK_INTERVAL)
+        ensure_partitions()
+
+ensure_partitions()
+threading.Thread(target=schedule_partitions, name="partition-maintenance", daemon=True).start()
+
+# 在后台线程中构建题目检索索引（需要读取整个题库的题面），构建完成前检索返回空结果
+from app.services.search_service import problem_search_index
+problem_search_index.ensure_fresh()
+
 # 创建FastAPI应用
 app = FastAPI(
     title="Just For Fun API",
@@ -22,7 +53,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
     allow_headers=["*"],
-    expose_headers=["Content-Type", "Authorization", "Content-Length"]
+    expose_headers=["Content-Type", "Authorization", "Content-Length", "Content-Range", "ETag", "X-Total-Length", "X-Truncated"]
 )
 
 # 包含API路由
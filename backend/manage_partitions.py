@@ -0,0 +1,86 @@
+import os
+import sys
+import csv
+import time
+import argparse
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.models.database import SessionLocal
+from app.services.partition_service import PartitionService, MONTHS_AHEAD, KEEP_MONTHS, ARCHIVE_ROOT
+from app.utils.compression import decompress_text
+
+
+def _print_rows(rows, show_code: bool) -> int:
+    writer = None
+    count = 0
+    for row in rows:
+        # 导出文件中的代码为压缩后bytea的十六进制形式（\x...）
+        blob = row.pop("code_blob", None)
+        if show_code:
+            row["code"] = decompress_text(bytes.fromhex(blob[2:])) if blob else row.get("code", "")
+        if writer is None:
+            writer = csv.DictWriter(sys.stdout, fieldnames=list(row.keys()))
+            writer.writeheader()
+        writer.writerow(row)
+        count += 1
+    return count
+
+
+def main():
+    """按月分区的维护：创建分区、归档旧分区、导出归档、检索导出文件（可由定时任务每月执行 ensure 和 archive）"""
+    parser = argparse.ArgumentParser(description="提交记录和操作日志的分区维护")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    ensure = sub.add_parser("ensure", help="创建缺少的分区")
+    ensure.add_argument("--months-ahead", type=int, default=MONTHS_AHEAD, help=f"从当月起创建N个月的分区，默认{MONTHS_AHEAD}")
+
+    archive = sub.add_parser("archive", help="把超过保留期的分区移到archive schema")
+    archive.add_argument("--keep-months", type=int, default=KEEP_MONTHS, help=f"保留最近N个月，默认{KEEP_MONTHS}")
+
+    sub.add_parser("list", help="列出archive schema中的分区")
+
+    export = sub.add_parser("export", help="把archive schema中的分区导出为csv.gz并删除")
+    export.add_argument("partitions", nargs="*", help="分区名，不指定则导出全部")
+    export.add_argument("--dir", default=ARCHIVE_ROOT, help=f"导出目录，默认{ARCHIVE_ROOT}")
+
+    query = sub.add_parser("query", help="按条件检索导出的csv.gz，结果以CSV输出")
+    query.add_argument("file", help="导出文件路径")
+    query.add_argument("--where", action="append", default=[], metavar="列=值", help="过滤条件，可重复")
+    query.add_argument("--show-code", action="store_true", help="解压并输出提交的代码")
+
+    args = parser.parse_args()
+
+    if args.command == "query":
+        filters = dict(condition.split("=", 1) for condition in args.where)
+        count = _print_rows(PartitionService.query_export(args.file, filters), args.show_code)
+        print(f"共 {count} 行", file=sys.stderr)
+        return
+
+    started = time.time()
+    db = SessionLocal()
+    try:
+        if args.command == "ensure":
+            created = PartitionService.ensure_partitions(db, args.months_ahead)
+            print(f"新建 {len(created)} 个分区: {', '.join(created) or '无'}")
+        elif args.command == "archive":
+            archived = PartitionService.archive(db, args.keep_months)
+            print(f"已移入archive schema {len(archived)} 个分区: {', '.join(archived) or '无'}")
+        elif args.command == "list":
+            for name, comment in PartitionService.list_archived(db):
+                print(f"{name}\t{comment or ''}")
+        elif args.command == "export":
+            names = args.partitions or [name for name, _ in PartitionService.list_archived(db)]
+            for name in names:
+                manifest = PartitionService.export(db, name, args.dir)
+                print(f"{name}: 已导出 {manifest['rows']} 行 -> {', '.join(manifest['files'])}")
+            if names:
+                print("代码引用计数已减少，可运行 migrate_code_blobs.py --gc 删除不再被引用的代码")
+    finally:
+        db.close()
+    print(f"耗时 {time.time() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+import os
+import sys
+import time
+import argparse
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.models.database import SessionLocal
+from app.services.case_result_service import CaseResultService
+
+
+def main():
+    """把已有提交result中的测试点详情迁移到submission_case_results表（可重复执行）"""
+    parser = argparse.ArgumentParser(description="迁移提交的测试点详情")
+    parser.add_argument("--batch-size", type=int, default=200, help="每批处理的提交数，默认200")
+    args = parser.parse_args()
+
+    started = time.time()
+    db = SessionLocal()
+    try:
+        stats = CaseResultService.migrate_inline(db, args.batch_size)
+    finally:
+        db.close()
+    print(f"已迁移 {stats['submissions']} 条提交、{stats['cases']} 个测试点，耗时 {time.time() - started:.2f}s")
+    print("如需立即回收空间，可在数据库中执行 VACUUM FULL submissions")
+
+
+if __name__ == "__main__":
+    main()
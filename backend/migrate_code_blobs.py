@@ -0,0 +1,41 @@
+import os
+import sys
+import time
+import argparse
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.models.database import SessionLocal
+from app.services.code_blob_service import CodeBlobService
+
+
+def main():
+    """把submissions.code中的代码移入code_blobs（按SHA-256去重并压缩），可重复执行"""
+    parser = argparse.ArgumentParser(description="迁移提交代码到code_blobs")
+    parser.add_argument("--batch-size", type=int, default=500, help="每批处理的提交数，默认500")
+    parser.add_argument("--recount", action="store_true", help="按提交记录重新统计引用计数")
+    parser.add_argument("--gc", action="store_true", help="删除不再被引用的代码")
+    args = parser.parse_args()
+
+    started = time.time()
+    db = SessionLocal()
+    try:
+        if args.recount:
+            CodeBlobService.recount(db)
+            print("引用计数已重新统计")
+        if args.gc:
+            removed = CodeBlobService.collect_garbage(db)
+            print(f"已删除 {removed} 份不再被引用的代码")
+        if not args.recount and not args.gc:
+            stats = CodeBlobService.migrate(db, args.batch_size)
+            print(f"已迁移 {stats['submissions']} 条提交（原始代码 {stats['bytes']} 字节）")
+            print(f"code_blobs 共 {stats['blobs']} 份代码，压缩后 {stats['stored_bytes']} 字节")
+            print("如需立即回收空间，可在数据库中执行 VACUUM FULL submissions")
+    finally:
+        db.close()
+    print(f"耗时 {time.time() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
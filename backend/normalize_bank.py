@@ -0,0 +1,47 @@
+import os
+import sys
+import json
+import argparse
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.services.encoding_service import BankEncodingService
+
+# 题库根目录，与problem_service.py中保持一致
+PROBLEMS_ROOT = "/app_root/题库"
+
+
+def main():
+    """检测题库文件编码，为每个题目目录生成编码清单"""
+    parser = argparse.ArgumentParser(description="题库编码规范化")
+    parser.add_argument("--root", default=PROBLEMS_ROOT, help="题库根目录")
+    parser.add_argument("--transcode", action="store_true", help="为非UTF-8文件生成UTF-8副本（写入.utf8目录）")
+    parser.add_argument("--workers", type=int, default=8, help="并发线程数")
+    parser.add_argument("--report", help="将完整报告写入指定的JSON文件")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.root):
+        print(f"题库目录不存在: {args.root}")
+        sys.exit(1)
+
+    report = BankEncodingService.normalize_bank(args.root, transcode=args.transcode, workers=args.workers)
+
+    print(f"已处理 {report['problems']} 个题目, {report['files']} 个文件")
+    if report["ambiguous"]:
+        print(f"以下 {len(report['ambiguous'])} 个文件编码判定存在歧义，请人工确认:")
+        for item in report["ambiguous"]:
+            print(f"  [{item['encoding']}] ({item['reason']}) {item['path']}")
+    if report["errors"]:
+        print(f"以下 {len(report['errors'])} 个题目处理失败:")
+        for item in report["errors"]:
+            print(f"  {item['path']}: {item['error']}")
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"报告已写入: {args.report}")
+
+
+if __name__ == "__main__":
+    main()
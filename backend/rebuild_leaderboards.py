@@ -0,0 +1,35 @@
+import os
+import sys
+import time
+import argparse
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.models.database import SessionLocal
+from app.services.leaderboard_service import LeaderboardService
+
+
+def main():
+    """从提交汇总表重建Redis排行榜"""
+    parser = argparse.ArgumentParser(description="重建排行榜")
+    parser.add_argument("--exercise", type=int, action="append", dest="exercise_ids", help="只重建指定练习（可重复）")
+    args = parser.parse_args()
+
+    started = time.time()
+    db = SessionLocal()
+    try:
+        if args.exercise_ids:
+            boards = 0
+            for exercise_id in args.exercise_ids:
+                boards += LeaderboardService.rebuild_exercise(db, exercise_id)["boards"]
+            stats = {"exercises": len(args.exercise_ids), "boards": boards}
+        else:
+            stats = LeaderboardService.rebuild_all(db)
+    finally:
+        db.close()
+    print(f"已重建 {stats['exercises']} 个练习的 {stats['boards']} 个排行榜, 耗时 {time.time() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+import os
+import sys
+import json
+import argparse
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.models.database import SessionLocal
+from app.services.problem_reconcile_service import ProblemReconcileService
+
+
+def main():
+    """题库与problems表对账"""
+    parser = argparse.ArgumentParser(description="题库与数据库题目记录对账")
+    parser.add_argument("--dry-run", action="store_true", help="只报告差异，不写入数据库")
+    parser.add_argument("--report", help="将完整报告写入指定的JSON文件")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        report = ProblemReconcileService.reconcile(db, dry_run=args.dry_run)
+    finally:
+        db.close()
+
+    action = "待新增" if args.dry_run else "新增"
+    print(f"题库题目 {report['catalog_problems']} 个, 数据库记录 {report['db_problems']} 条")
+    print(f"{action} {report['inserted']} 条, 更新 {report['updated']} 条, 耗时 {report['elapsed']}s")
+    if report["db_orphans"]:
+        print(f"以下 {len(report['db_orphans'])} 条数据库记录在题库中已不存在:")
+        for item in report["db_orphans"]:
+            print(f"  [{item['id']}] {item['data_path']}")
+    if report["duplicates"]:
+        print(f"以下 {len(report['duplicates'])} 个路径存在重复记录:")
+        for data_path, ids in report["duplicates"].items():
+            print(f"  {data_path}: {ids}")
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"报告已写入: {args.report}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+import os
+import sys
+import argparse
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.services.judge_sync_service import JudgeSyncService, SYNC_WORKERS, load_targets
+
+
+def main():
+    """把题库测试数据增量同步到各评测节点"""
+    parser = argparse.ArgumentParser(description="同步评测机测试数据")
+    parser.add_argument("--path", action="append", dest="paths", help="只同步指定题目（可重复）")
+    parser.add_argument("--workers", type=int, default=SYNC_WORKERS, help="并行传输的线程数")
+    parser.add_argument("--status", action="store_true", help="只查看各节点的同步状态")
+    args = parser.parse_args()
+
+    targets = load_targets()
+    if not targets:
+        print("未配置评测节点（JUDGE_TEST_CASE_TARGETS）")
+        sys.exit(1)
+
+    if args.status:
+        status = JudgeSyncService.status()
+        print(f"题库共 {status['problems']} 道有测试数据的题目")
+        for node in status["nodes"]:
+            print(f"{node['name']} ({node['root']}): 最新 {node['fresh']}, "
+                  f"过期 {node['stale_count']}, 缺失 {node['missing_count']}")
+        return
+
+    report = JudgeSyncService.sync_all(args.paths, workers=args.workers)
+    for name, node in report.items():
+        print(f"{name}: 检查 {node['problems']} 题, 更新 {node['changed']} 题, "
+              f"上传 {node['uploaded']} 个文件 ({node['bytes']} 字节), 删除 {node['deleted']} 个文件, "
+              f"耗时 {node['elapsed']}s")
+        for item in node["errors"]:
+            print(f"  失败 {item['path']}: {item['error']}")
+
+
+if __name__ == "__main__":
+    main()
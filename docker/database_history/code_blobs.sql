@@ -0,0 +1,15 @@
+-- 创建代码存储表（提交的源代码按SHA-256去重，data为压缩后的代码，ref_count为引用的提交数）
+CREATE TABLE IF NOT EXISTS code_blobs (
+    hash VARCHAR(64) PRIMARY KEY,
+    data BYTEA NOT NULL,
+    size INTEGER NOT NULL, -- 原始代码的字节数
+    ref_count INTEGER NOT NULL DEFAULT 1,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+ALTER TABLE submissions ADD COLUMN IF NOT EXISTS code_hash VARCHAR(64) REFERENCES code_blobs(hash);
+ALTER TABLE submissions ALTER COLUMN code DROP NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_submissions_code_hash ON submissions(code_hash);
+
+-- 执行后运行 backend/migrate_code_blobs.py 把已有代码移入code_blobs，
+-- 完成后执行 VACUUM FULL submissions 归还空间
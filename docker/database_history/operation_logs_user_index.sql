@@ -0,0 +1,2 @@
+-- 按用户查询最近的操作（活跃学生统计按用户聚合最后操作时间）
+CREATE INDEX IF NOT EXISTS idx_operation_logs_user_created ON operation_logs(user_id, created_at);
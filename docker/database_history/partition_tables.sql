@@ -0,0 +1,72 @@
+-- 把已有的submissions和operation_logs改为按月分区的表（在code_blobs.sql之后执行）
+-- 原表整体挂为一个分区（<表>_legacy，范围到下个月初为止），之后的月份由backend启动时或
+-- backend/manage_partitions.py ensure 创建；原表超过保留期后可与其他分区一样归档。
+-- 请在维护窗口中执行：执行期间两张表被锁定，挂载原表时要为 (id, 分区键) 建立唯一索引。
+
+BEGIN;
+
+-- submissions改为分区表后主键为(id, submitted_at)，不能再被按id引用
+ALTER TABLE submission_case_results DROP CONSTRAINT IF EXISTS submission_case_results_submission_id_fkey;
+
+DO $$
+DECLARE
+    spec RECORD;
+    idx RECORD;
+    fk RECORD;
+    legacy TEXT;
+    cutover TIMESTAMP := date_trunc('month', now()) + INTERVAL '1 month';
+BEGIN
+    FOR spec IN SELECT * FROM (VALUES ('submissions', 'submitted_at'), ('operation_logs', 'created_at')) AS t(tbl, key) LOOP
+        -- 已经是分区表则跳过（可重复执行）
+        IF EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(spec.tbl)) THEN
+            CONTINUE;
+        END IF;
+        legacy := spec.tbl || '_legacy';
+
+        EXECUTE format('LOCK TABLE %I IN ACCESS EXCLUSIVE MODE', spec.tbl);
+        EXECUTE format('ALTER TABLE %I RENAME TO %I', spec.tbl, legacy);
+        -- 原表上的索引改名，名称留给分区表
+        FOR idx IN SELECT indexname FROM pg_indexes WHERE schemaname = 'public' AND tablename = legacy LOOP
+            EXECUTE format('ALTER INDEX %I RENAME TO %I', idx.indexname, idx.indexname || '_legacy');
+        END LOOP;
+
+        -- 去掉原表自带的外键，挂载后由分区表上的外键统一约束（分离归档时由PartitionService.archive()去掉）
+        FOR fk IN SELECT conname FROM pg_constraint WHERE conrelid = to_regclass(legacy) AND contype = 'f' LOOP
+            EXECUTE format('ALTER TABLE %I DROP CONSTRAINT %I', legacy, fk.conname);
+        END LOOP;
+
+        -- 分区键不能为空，时间未知的旧记录记为1970-01-01
+        EXECUTE format('UPDATE %I SET %I = %L WHERE %I IS NULL', legacy, spec.key, '1970-01-01', spec.key);
+        EXECUTE format('ALTER TABLE %I ALTER COLUMN %I SET NOT NULL', legacy, spec.key);
+        -- 先加CHECK约束，挂载分区时不再逐行检查范围
+        EXECUTE format('ALTER TABLE %I ADD CONSTRAINT %I CHECK (%I < %L)', legacy, legacy || '_range', spec.key, cutover);
+
+        EXECUTE format('CREATE TABLE %I (LIKE %I INCLUDING DEFAULTS) PARTITION BY RANGE (%I)', spec.tbl, legacy, spec.key);
+        EXECUTE format('ALTER TABLE %I ADD PRIMARY KEY (id, %I)', spec.tbl, spec.key);
+        -- 序列归分区表所有，原表以后被归档删除时不会连带删除序列
+        EXECUTE format('ALTER SEQUENCE %I OWNED BY %I.id', spec.tbl || '_id_seq', spec.tbl);
+        EXECUTE format('ALTER TABLE %I ATTACH PARTITION %I FOR VALUES FROM (MINVALUE) TO (%L)', spec.tbl, legacy, cutover);
+        EXECUTE format('ALTER TABLE %I DROP CONSTRAINT %I', legacy, legacy || '_range');
+        EXECUTE format('CREATE TABLE %I PARTITION OF %I DEFAULT', spec.tbl || '_default', spec.tbl);
+
+        IF spec.tbl = 'submissions' THEN
+            ALTER TABLE submissions ADD FOREIGN KEY (user_id) REFERENCES users(id);
+            ALTER TABLE submissions ADD FOREIGN KEY (problem_id) REFERENCES problems(id);
+            ALTER TABLE submissions ADD FOREIGN KEY (exercise_id) REFERENCES exercises(id);
+            ALTER TABLE submissions ADD FOREIGN KEY (code_hash) REFERENCES code_blobs(hash);
+        ELSE
+            ALTER TABLE operation_logs ADD FOREIGN KEY (user_id) REFERENCES users(id);
+        END IF;
+    END LOOP;
+END $$;
+
+-- 分区表上的索引（各分区自动创建）
+CREATE INDEX IF NOT EXISTS idx_submissions_submitted_at_id ON submissions(submitted_at, id);
+CREATE INDEX IF NOT EXISTS idx_submissions_user_submitted_at ON submissions(user_id, submitted_at, id);
+CREATE INDEX IF NOT EXISTS idx_submissions_exercise_submitted_at ON submissions(exercise_id, submitted_at, id);
+CREATE INDEX IF NOT EXISTS idx_submissions_code_hash ON submissions(code_hash);
+CREATE INDEX IF NOT EXISTS idx_operation_logs_user_created ON operation_logs(user_id, created_at);
+
+COMMIT;
+
+-- 执行后运行 backend/manage_partitions.py ensure 创建当月之后的分区
@@ -0,0 +1,25 @@
+-- 题目路径规范化键：按路径查找题目时走唯一索引，不再使用 data_path LIKE '%x' 扫描
+-- 规范化规则与 backend/app/utils/path_utils.py 中的 normalize_problem_path 保持一致：
+-- NFC规范化、\ 替换为 /、合并连续的 /、去除首尾 / 以及 "题库/" 前缀
+ALTER TABLE problems ADD COLUMN IF NOT EXISTS path_key VARCHAR(255);
+
+-- 同一路径存在多条记录时，只有ID最小的一条持有path_key（可用 reconcile_problems.py 查看重复记录）
+UPDATE problems p
+SET path_key = k.path_key
+FROM (
+    SELECT DISTINCT ON (path_key) id, path_key
+    FROM (
+        SELECT id,
+               NULLIF(trim(BOTH '/' FROM regexp_replace(
+                   trim(BOTH '/' FROM regexp_replace(normalize(replace(data_path, E'\\', '/'), NFC), '/+', '/', 'g')),
+                   '^(app_root/)?题库(/|$)', ''
+               )), '') AS path_key
+        FROM problems
+        WHERE data_path IS NOT NULL
+    ) normalized
+    WHERE path_key IS NOT NULL
+    ORDER BY path_key, id
+) k
+WHERE p.id = k.id AND p.path_key IS NULL;
+
+CREATE UNIQUE INDEX IF NOT EXISTS ix_problems_path_key ON problems(path_key);
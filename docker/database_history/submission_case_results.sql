@@ -0,0 +1,24 @@
+-- 创建提交测试点详情表（输入、期望输出、实际输出只保存开头和结尾，提交记录的result列只保留摘要）
+CREATE TABLE IF NOT EXISTS submission_case_results (
+    submission_id INTEGER REFERENCES submissions(id) ON DELETE CASCADE,
+    test_case INTEGER NOT NULL,
+    result INTEGER NOT NULL, -- 0通过 -1输出不匹配 1超时 2运行错误 3其他错误
+    message VARCHAR(255),
+    input_preview TEXT,
+    input_size INTEGER,
+    input_md5 VARCHAR(32),
+    expected_preview TEXT,
+    expected_size INTEGER,
+    expected_md5 VARCHAR(32),
+    actual_preview TEXT,
+    actual_size INTEGER,
+    actual_md5 VARCHAR(32),
+    actual_output BYTEA, -- 压缩的完整实际输出，仅未通过的测试点
+    extra JSONB, -- 其他字段，如远程评测的cpu_time、memory、exit_code等
+    PRIMARY KEY (submission_id, test_case)
+);
+
+-- 已建表的数据库补充extra列
+ALTER TABLE submission_case_results ADD COLUMN IF NOT EXISTS extra JSONB;
+
+-- 建表后运行 backend/migrate_case_results.py 把已有提交result中的测试点详情迁移到本表
@@ -0,0 +1,20 @@
+-- 创建提交汇总表（每个练习、题目、用户一行，exercise_id为0表示不属于任何练习）
+CREATE TABLE IF NOT EXISTS submission_summary (
+    exercise_id INTEGER NOT NULL DEFAULT 0,
+    problem_id INTEGER REFERENCES problems(id) ON DELETE CASCADE,
+    user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+    best_score INTEGER NOT NULL DEFAULT 0,
+    best_submission_id INTEGER,
+    best_status VARCHAR(20),
+    latest_submission_id INTEGER NOT NULL,
+    latest_score INTEGER NOT NULL DEFAULT 0,
+    latest_status VARCHAR(20),
+    attempt_count INTEGER NOT NULL DEFAULT 0,
+    first_ac_at TIMESTAMP,
+    last_submitted_at TIMESTAMP,
+    PRIMARY KEY (exercise_id, problem_id, user_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_submission_summary_user_id ON submission_summary(user_id);
+
+-- 建表后运行 backend/backfill_submission_summary.py 从已有提交记录生成汇总数据
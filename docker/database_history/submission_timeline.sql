@@ -0,0 +1,11 @@
+-- 创建提交时间线表（练习每分钟的提交数、提交人数和各评测状态的数量，由Redis计数器定期压缩写入）
+CREATE TABLE IF NOT EXISTS submission_timeline (
+    exercise_id INTEGER REFERENCES exercises(id) ON DELETE CASCADE,
+    bucket_start TIMESTAMP NOT NULL,
+    submission_count INTEGER NOT NULL DEFAULT 0,
+    distinct_users INTEGER NOT NULL DEFAULT 0,
+    status_counts JSONB NOT NULL DEFAULT '{}',
+    PRIMARY KEY (exercise_id, bucket_start)
+);
+
+-- 建表后运行 backend/compact_timeline.py --backfill 从已有提交记录生成历史数据
@@ -0,0 +1,4 @@
+-- 提交列表按(提交时间, ID)键集分页
+CREATE INDEX IF NOT EXISTS idx_submissions_submitted_at_id ON submissions(submitted_at, id);
+CREATE INDEX IF NOT EXISTS idx_submissions_user_submitted_at ON submissions(user_id, submitted_at, id);
+CREATE INDEX IF NOT EXISTS idx_submissions_exercise_submitted_at ON submissions(exercise_id, submitted_at, id);
@@ -90,10 +90,13 @@ CREATE TABLE problems (
     runtime_score INTEGER DEFAULT 80,
     score_method VARCHAR(20) DEFAULT 'sum', -- 'sum' or 'max'
     data_path VARCHAR(255),
+    path_key VARCHAR(255), -- 规范化后的data_path，用于按路径查找题目
     reference_answer TEXT, -- 新增：参考答案（可为空）
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+CREATE UNIQUE INDEX ix_problems_path_key ON problems(path_key);
+
 -- 创建问题-标签关联表
 CREATE TABLE problem_tag (
     problem_id INTEGER REFERENCES problems(id) ON DELETE CASCADE,
@@ -109,30 +112,105 @@ CREATE TABLE exercise_problem (
     PRIMARY KEY (exercise_id, problem_id)
 );
 
--- 创建提交记录表
+-- 创建代码存储表（提交的源代码按SHA-256去重，data为压缩后的代码，ref_count为引用的提交数）
+CREATE TABLE code_blobs (
+    hash VARCHAR(64) PRIMARY KEY,
+    data BYTEA NOT NULL,
+    size INTEGER NOT NULL, -- 原始代码的字节数
+    ref_count INTEGER NOT NULL DEFAULT 1,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- 创建提交记录表（按submitted_at每月一个分区，backend启动时和定时任务提前创建后几个月的分区，
+-- 没有对应分区的行进入DEFAULT分区；超过保留期的分区由 backend/manage_partitions.py 归档）
 CREATE TABLE submissions (
-    id SERIAL PRIMARY KEY,
+    id SERIAL,
     user_id INTEGER REFERENCES users(id),
     problem_id INTEGER REFERENCES problems(id),
     exercise_id INTEGER REFERENCES exercises(id),
-    code TEXT NOT NULL,
+    code_hash VARCHAR(64) REFERENCES code_blobs(hash),
+    code TEXT, -- 迁移到code_blobs之前的旧代码
     language VARCHAR(20) DEFAULT 'c',
     status VARCHAR(20),
     code_check_score INTEGER,
     runtime_score INTEGER,
     total_score INTEGER,
-    result JSONB, -- 评测结果详情
-    submitted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    result JSONB, -- 评测结果摘要
+    submitted_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, submitted_at)
+) PARTITION BY RANGE (submitted_at);
+
+CREATE TABLE submissions_default PARTITION OF submissions DEFAULT;
+
+-- 提交列表按(提交时间, ID)键集分页
+CREATE INDEX idx_submissions_submitted_at_id ON submissions(submitted_at, id);
+CREATE INDEX idx_submissions_user_submitted_at ON submissions(user_id, submitted_at, id);
+CREATE INDEX idx_submissions_exercise_submitted_at ON submissions(exercise_id, submitted_at, id);
+CREATE INDEX idx_submissions_code_hash ON submissions(code_hash);
+
+-- 创建提交测试点详情表（输入、期望输出、实际输出只保存开头和结尾，提交记录的result列只保留摘要）
+CREATE TABLE submission_case_results (
+    submission_id INTEGER NOT NULL, -- submissions为分区表，不建外键，删除提交时由应用一并删除
+    test_case INTEGER NOT NULL,
+    result INTEGER NOT NULL, -- 0通过 -1输出不匹配 1超时 2运行错误 3其他错误
+    message VARCHAR(255),
+    input_preview TEXT,
+    input_size INTEGER,
+    input_md5 VARCHAR(32),
+    expected_preview TEXT,
+    expected_size INTEGER,
+    expected_md5 VARCHAR(32),
+    actual_preview TEXT,
+    actual_size INTEGER,
+    actual_md5 VARCHAR(32),
+    actual_output BYTEA, -- 压缩的完整实际输出，仅未通过的测试点
+    extra JSONB, -- 其他字段，如远程评测的cpu_time、memory、exit_code等
+    PRIMARY KEY (submission_id, test_case)
 );
 
--- 创建操作记录表
+-- 创建提交汇总表（每个练习、题目、用户一行，exercise_id为0表示不属于任何练习）
+CREATE TABLE submission_summary (
+    exercise_id INTEGER NOT NULL DEFAULT 0,
+    problem_id INTEGER REFERENCES problems(id) ON DELETE CASCADE,
+    user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+    best_score INTEGER NOT NULL DEFAULT 0,
+    best_submission_id INTEGER,
+    best_status VARCHAR(20),
+    latest_submission_id INTEGER NOT NULL,
+    latest_score INTEGER NOT NULL DEFAULT 0,
+    latest_status VARCHAR(20),
+    attempt_count INTEGER NOT NULL DEFAULT 0,
+    first_ac_at TIMESTAMP,
+    last_submitted_at TIMESTAMP,
+    PRIMARY KEY (exercise_id, problem_id, user_id)
+);
+
+CREATE INDEX idx_submission_summary_user_id ON submission_summary(user_id);
+
+-- 创建提交时间线表（练习每分钟的提交数、提交人数和各评测状态的数量，由Redis计数器定期压缩写入）
+CREATE TABLE submission_timeline (
+    exercise_id INTEGER REFERENCES exercises(id) ON DELETE CASCADE,
+    bucket_start TIMESTAMP NOT NULL,
+    submission_count INTEGER NOT NULL DEFAULT 0,
+    distinct_users INTEGER NOT NULL DEFAULT 0,
+    status_counts JSONB NOT NULL DEFAULT '{}',
+    PRIMARY KEY (exercise_id, bucket_start)
+);
+
+-- 创建操作记录表（按created_at每月一个分区，与提交记录表相同）
 CREATE TABLE operation_logs (
-    id SERIAL PRIMARY KEY,
+    id SERIAL,
     user_id INTEGER REFERENCES users(id),
     operation VARCHAR(100) NOT NULL,
     target VARCHAR(255), -- 操作对象，如练习名称、题目名称等
-    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
-);
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+CREATE TABLE operation_logs_default PARTITION OF operation_logs DEFAULT;
+
+-- 按用户查询最近的操作（活跃学生统计）
+CREATE INDEX idx_operation_logs_user_created ON operation_logs(user_id, created_at);
 
 -- 创建系统设置表
 CREATE TABLE system_settings (
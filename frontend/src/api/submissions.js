@@ -30,6 +30,33 @@ export const submitCode = (userId, problemId, exerciseId, code, language) => {
     });
 }
 
+/**
+ * 自测运行：用自定义输入运行代码并与参考答案对比（不产生提交记录）
+ * @param {Number} problemId - 题目ID
+ * @param {String} code - 代码内容
+ * @param {String} input - 自定义输入
+ * @param {String} language - 编程语言
+ * @returns {Promise} - 编译结果、程序输出和参考答案输出
+ */
+export const testRun = (problemId, code, input, language = 'c') => {
+  const data = {
+    problem_id: problemId,
+    code: code,
+    input: input,
+    language: language
+  };
+  
+  return axios.post('/api/submissions/test-run', data)
+    .then(response => {
+      return response.data;
+    })
+    .catch(error => {
+      console.error('自测运行失败:', error);
+      const errorMsg = error.response?.data?.detail || '运行失败，请稍后重试';
+      throw new Error(errorMsg);
+    });
+}
+
 /**
  * 获取提交记录详情
  * @param {Number} submissionId - 提交记录ID
@@ -45,31 +72,135 @@ export const getSubmissionDetail = async (submissionId) => {
   }
 }
 
+/**
+ * 按需读取提交所属题目的单个测试用例内容（提交详情中只包含用例的元数据）
+ * @param {Number} submissionId - 提交记录ID
+ * @param {Number} testCase - 用例号
+ * @param {Object} options - 可选参数
+ * @param {String} options.kind - input（输入数据）或output（期望输出），默认input
+ * @param {Number} options.start - 起始字节（分段读取大文件时传入）
+ * @param {Number} options.maxBytes - 最多读取的字节数
+ * @returns {Promise<Object>} - { text, start, end, totalLength, truncated }
+ */
+export const getSubmissionTestCase = async (submissionId, testCase, options = {}) => {
+  const { kind = 'input', start = null, maxBytes = null } = options;
+  try {
+    const response = await axios.get(`/api/submissions/${submissionId}/test-cases/${testCase}`, {
+      params: { kind, ...(maxBytes ? { max_bytes: maxBytes } : {}) },
+      headers: start !== null ? { Range: `bytes=${start}-` } : {},
+      responseType: 'arraybuffer'
+    });
+    const charset = /charset=([^;]+)/.exec(response.headers['content-type'] || '')?.[1] || 'utf-8';
+    const totalLength = Number(response.headers['x-total-length'] || response.data.byteLength);
+    let begin = 0;
+    let end = response.data.byteLength - 1;
+    const range = /bytes (\d+)-(\d+)\//.exec(response.headers['content-range'] || '');
+    if (range) {
+      begin = Number(range[1]);
+      end = Number(range[2]);
+    }
+    return {
+      text: new TextDecoder(charset).decode(response.data),
+      start: begin,
+      end,
+      totalLength,
+      truncated: end + 1 < totalLength
+    };
+  } catch (error) {
+    console.error('获取测试用例内容失败:', error);
+    throw error;
+  }
+}
+
+// 跟随游标读取多页时最多读取的记录数，避免一次下载全部提交记录
+export const MAX_FOLLOW_ITEMS = 2000;
+
+/**
+ * 读取一页提交记录
+ * @param {Object} params - 查询参数（user_id、problem_id、exercise_id等）
+ * @param {String} cursor - 上一页返回的nextCursor，不传则从最新的提交开始
+ * @param {Number} limit - 每页记录数
+ * @returns {Promise<Object>} - { items, nextCursor }，nextCursor为null表示已经是最后一页
+ */
+export const getSubmissionsPage = async (params = {}, cursor = null, limit = 50) => {
+  const response = await axios.get('/api/submissions/', {
+    params: { ...params, limit, ...(cursor ? { cursor } : {}) }
+  });
+  return { items: response.data.items || [], nextCursor: response.data.next_cursor || null };
+};
+
+/**
+ * 按游标逐页读取提交记录列表
+ * @param {Object} params - 查询参数（user_id、problem_id、exercise_id等）
+ * @param {Number} limit - 最多返回的记录数，不超过MAX_FOLLOW_ITEMS
+ * @param {Function} done - 可选，传入已读取的记录，返回true时提前停止
+ * @returns {Promise<Array>} - 提交记录列表（按提交时间从新到旧）
+ */
+const fetchSubmissionPages = async (params = {}, limit = null, done = null) => {
+  const max = Math.min(limit || MAX_FOLLOW_ITEMS, MAX_FOLLOW_ITEMS);
+  const items = [];
+  let cursor = null;
+  do {
+    const page = await getSubmissionsPage(params, cursor, Math.min(max - items.length, 500));
+    items.push(...page.items);
+    cursor = page.nextCursor;
+  } while (cursor && items.length < max && !(done && done(items)));
+  return items;
+};
+
 /**
  * 获取提交记录列表
  * @param {Object} filters - 筛选条件
  * @param {Number} filters.userId - 用户ID
  * @param {Number} filters.problemId - 问题ID
  * @param {Number} filters.exerciseId - 练习ID
+ * @param {Number} filters.limit - 最多返回的记录数（可选，不传则最多返回MAX_FOLLOW_ITEMS条）
  * @returns {Promise} - 提交记录列表
  */
 export const getSubmissions = async (filters = {}) => {
   try {
-    const { userId, problemId, exerciseId } = filters;
+    const { userId, problemId, exerciseId, limit } = filters;
     
-    let url = '/api/submissions?';
-    if (userId) url += `user_id=${userId}&`;
-    if (problemId) url += `problem_id=${problemId}&`;
-    if (exerciseId) url += `exercise_id=${exerciseId}&`;
+    const params = {};
+    if (userId) params.user_id = userId;
+    if (problemId) params.problem_id = problemId;
+    if (exerciseId) params.exercise_id = exerciseId;
     
-    const response = await axios.get(url);
-    return response.data;
+    return await fetchSubmissionPages(params, limit);
   } catch (error) {
     console.error('获取提交记录列表失败:', error);
     throw error;
   }
 } 
 
+/**
+ * 获取用户在练习中每道题的最新提交
+ * 提交记录按时间从新到旧返回，逐页读取直到每道题都找到提交（或没有更多记录）
+ * @param {Number} userId - 用户ID
+ * @param {Number} exerciseId - 练习ID
+ * @param {Array<Number>} problemIds - 练习中的题目ID
+ * @returns {Promise<Object>} - 题目ID到最新提交记录的映射
+ */
+export const getLatestSubmissions = async (userId, exerciseId, problemIds = []) => {
+  try {
+    const latest = {};
+    const remember = (items) => {
+      items.forEach(submission => {
+        if (!latest[submission.problem_id]) latest[submission.problem_id] = submission;
+      });
+    };
+    const items = await fetchSubmissionPages({ user_id: userId, exercise_id: exerciseId }, null, (loaded) => {
+      remember(loaded);
+      return problemIds.length > 0 && problemIds.every(id => latest[id]);
+    });
+    remember(items);
+    return latest;
+  } catch (error) {
+    console.error('获取最新提交记录失败:', error);
+    throw error;
+  }
+}
+
 /**
  * 获取题目在班级中的排名
  * @param {number} problemId - 题目ID
@@ -93,17 +224,24 @@ export const getProblemRanking = async (problemId, exerciseId, classId = null) =
 }; 
 
 /**
- * 获取当前用户的所有答题记录
+ * 获取当前用户的答题记录（每题最后一次提交，按游标逐页读取，最多MAX_FOLLOW_ITEMS条）
  * @param {Object} params - 查询参数
- * @param {number} params.limit - 返回记录数量限制
- * @param {number} params.offset - 偏移量，用于分页
+ * @param {number} params.limit - 每页记录数
  * @param {string} params.sort - 排序方式：asc（升序）或desc（降序）
  * @returns {Promise<Array>} - 答题记录列表，包含题目、练习、课程、班级名称
  */
 export const getMySubmissions = async (params = {}) => {
   try {
-    const response = await axios.get('/api/submissions/my-submissions', { params });
-    return Array.isArray(response.data) ? response.data : [];
+    const items = [];
+    let cursor = null;
+    do {
+      const response = await axios.get('/api/submissions/my-submissions', {
+        params: { ...params, ...(cursor ? { cursor } : {}) }
+      });
+      items.push(...(response.data.items || []));
+      cursor = response.data.next_cursor;
+    } while (cursor && items.length < MAX_FOLLOW_ITEMS);
+    return items;
   } catch (error) {
     console.error('获取我的答题记录失败:', error);
     throw error;
@@ -111,21 +249,15 @@ export const getMySubmissions = async (params = {}) => {
 }; 
 
 /**
- * 获取所有提交记录（管理员/教师权限）
+ * 获取一页提交记录（管理员/教师权限），用于监控列表的"加载更多"
  * @param {Object} params - 查询参数
- * @returns {Promise<Array>} - 提交记录列表，包含完整的关联信息
+ * @param {String} cursor - 上一页返回的nextCursor，不传则从最新的提交开始
+ * @param {Number} limit - 每页记录数
+ * @returns {Promise<Object>} - { items, nextCursor }，记录包含完整的关联信息
  */
-export const getAllSubmissions = async (params = {}) => {
+export const getAllSubmissions = async (params = {}, cursor = null, limit = 100) => {
   try {
-    const response = await axios.get('/api/submissions/', { params });
-    const data = response.data;
-    
-    // 确保返回的数据是数组格式
-    if (Array.isArray(data)) {
-      return data; // 直接返回后端处理好的数据
-    }
-    
-    return [];
+    return await getSubmissionsPage(params, cursor, limit);
   } catch (error) {
     console.error('获取所有提交记录失败:', error);
     throw error;
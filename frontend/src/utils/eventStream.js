@@ -0,0 +1,47 @@
+/**
+ * 服务端事件推送（Server-Sent Events）
+ * 后端通过Redis pub/sub在多个worker之间分发事件，页面订阅后无需轮询评测结果和排名
+ */
+
+/**
+ * 打开事件流
+ * @param {Object} options
+ * @param {number} [options.exerciseId] - 同时订阅该练习的成绩变化
+ * @param {Function} [options.onVerdict] - 当前用户的提交出结果时调用
+ * @param {Function} [options.onScore] - 练习中有学生成绩或名次变化时调用
+ * @param {Function} [options.onStatusChange] - 连接状态变化时调用，参数为是否已连接
+ * @returns {Function} 关闭事件流的函数；浏览器不支持或未登录时返回空函数
+ */
+export const openEventStream = ({ exerciseId, onVerdict, onScore, onStatusChange } = {}) => {
+  const token = sessionStorage.getItem('token') || localStorage.getItem('token');
+  if (!token || typeof EventSource === 'undefined') {
+    return () => {};
+  }
+
+  const params = new URLSearchParams({ token });
+  if (exerciseId) {
+    params.append('exercise_id', exerciseId);
+  }
+
+  // EventSource断开后会自动重连
+  const source = new EventSource(`/api/events/stream?${params.toString()}`);
+
+  const parse = (handler) => (event) => {
+    if (!handler) return;
+    try {
+      handler(JSON.parse(event.data));
+    } catch (error) {
+      console.error('解析推送事件失败:', error);
+    }
+  };
+
+  source.addEventListener('ready', () => onStatusChange && onStatusChange(true));
+  source.addEventListener('verdict', parse(onVerdict));
+  source.addEventListener('score', parse(onScore));
+  source.onerror = () => onStatusChange && onStatusChange(false);
+
+  return () => {
+    source.close();
+    onStatusChange && onStatusChange(false);
+  };
+};